@@ -13,6 +13,30 @@ def create_app():
     
     migrate = Migrate(app, db, render_as_batch=True) 
 
+    from .llm import llm
+    llm.init_app(app)
+
+    from .limites import limitador
+    limitador.init_app(app)
+
+    from .cache import cache_respostas
+    cache_respostas.init_app(app)
+
+    from .youtube import youtube
+    youtube.init_app(app)
+
+    from .indexador import indexador
+    indexador.init_app(app)
+
+    from .contextos import contextos
+    contextos.init_app(app)
+
+    from .painel import painel
+    painel.init_app(app)
+
+    from .reconciliador import reconciliador
+    reconciliador.init_app(app)
+
     if not app.config['OPENAI_API_KEY']:
         print("AVISO: Chave da API do OpenAi não encontrada.")
         
@@ -31,6 +55,12 @@ def create_app():
     app.register_blueprint(tutorial_bp)
     app.register_blueprint(admin_bp) 
 
+    from .comandos import vetores_cli, indice_cli, busca_cli, armazenamento_cli
+    app.cli.add_command(vetores_cli)
+    app.cli.add_command(indice_cli)
+    app.cli.add_command(busca_cli)
+    app.cli.add_command(armazenamento_cli)
+
     @app.context_processor
     def inject_static_version():
         def get_version(filename):
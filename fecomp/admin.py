@@ -1,10 +1,16 @@
 import os # <<< 1. ADICIONA ESSE IMPORT LÁ NO TOPO
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session, current_app # <<< 2. ADICIONA 'current_app' AQUI
 import datetime
-from .models import User, Course, Subject, Task, Announcement, Submission
+from werkzeug.utils import secure_filename
+from .models import User, Course, Subject, Task, Announcement, Submission, File, membership
 from .extensions import db
 from .forms import EmptyForm
 from .visoes import login_required, role_required 
+from .permissoes import permissoes_atuais
+from .paginacao import paginar, quer_json, resposta_pagina
+from .downloads import servir_zip
+from .indice import remover_pasta_do_indice, pastas_do_utilizador
+from .armazenamento import caminho_upload, nome_armazenado
 
 admin_bp = Blueprint('admin_bp', __name__, url_prefix='/admin')
     
@@ -13,13 +19,13 @@ def get_task_or_404_with_permission(task_id):
     """ Busca uma tarefa e verifica se o usuário (admin/professor) tem permissão. """
     task = Task.query.get_or_404(task_id)
     course = task.course
-    user = User.query.get(session['user_id'])
+    permissoes = permissoes_atuais()
 
-    if user.role == 'professor' and course not in user.courses:
+    if permissoes.role == 'professor' and not permissoes.membro(course.id):
         flash('Sem permissão para acessar esta tarefa.', 'error')
         return None, redirect(url_for('visoes.pagina_inicio'))
     
-    if user.role == 'admin' and course.admin_id != user.id:
+    if permissoes.role == 'admin' and not permissoes.administra(course.id):
         flash('Sem permissão para acessar esta tarefa.', 'error')
         return None, redirect(url_for('admin_bp.index'))
         
@@ -29,10 +35,10 @@ def get_announcement_or_404_with_permission(announcement_id):
     """ Busca um aviso e verifica se o usuário (admin/autor) tem permissão. """
     announcement = Announcement.query.get_or_404(announcement_id)
     course = announcement.course
-    user = User.query.get(session['user_id'])
+    permissoes = permissoes_atuais()
 
-    is_admin = (user.role == 'admin' and course.admin_id == user.id)
-    is_author = (user.role == 'professor' and announcement.professor_id == user.id)
+    is_admin = (permissoes.role == 'admin' and permissoes.administra(course.id))
+    is_author = (permissoes.role == 'professor' and announcement.professor_id == permissoes.user_id)
 
     if not is_admin and not is_author:
         flash('Sem permissão para gerir este aviso.', 'error')
@@ -48,10 +54,10 @@ def get_subject_or_404_with_permission(subject_id):
         return None, redirect(url_for('visoes.pagina_materias'))
         
     course = subject.course
-    user = User.query.get(session['user_id'])
+    permissoes = permissoes_atuais()
 
-    is_admin = (user.role == 'admin' and course.admin_id == user.id)
-    is_professor_member = (user.role == 'professor' and course in user.courses)
+    is_admin = (permissoes.role == 'admin' and permissoes.administra(course.id))
+    is_professor_member = (permissoes.role == 'professor' and permissoes.membro(course.id))
 
     if not is_admin and not is_professor_member:
         flash('Sem permissão para gerir esta matéria.', 'error')
@@ -112,24 +118,53 @@ def create_course():
 @role_required(['admin', 'professor']) 
 def manage_course(course_id):
     course = Course.query.get_or_404(course_id)
-    user = User.query.get(session['user_id'])
+    permissoes = permissoes_atuais()
     
-    if user.role == 'professor' and course not in user.courses:
+    if permissoes.role == 'professor' and not permissoes.membro(course.id):
         flash('Você não tem permissão para gerir esta turma.', 'error')
         return redirect(url_for('visoes.pagina_inicio'))
-    if user.role == 'admin' and course.admin_id != user.id:
+    if permissoes.role == 'admin' and not permissoes.administra(course.id):
         flash('Você não é o admin desta turma.', 'error')
         return redirect(url_for('admin_bp.index'))
         
     form = EmptyForm()
-    
+    secao = request.args.get('secao')
+
+    # Avisos, tarefas e membros crescem com os anos da turma: cada lista tem a sua página
+    if quer_json():
+        if secao == 'tarefas':
+            return resposta_pagina('admin/_tarefas_turma.html', _tarefas_da_turma(course.id), form=form, course=course)
+        if secao == 'membros':
+            return resposta_pagina('admin/_membros_turma.html', _membros_da_turma(course.id), form=form, course=course)
+        return resposta_pagina('admin/_avisos_turma.html', _avisos_da_turma(course.id), form=form, course=course)
+
     non_members = User.query.filter(User.role != 'admin', ~User.courses.any(id=course_id)).all()
+    total_membros = db.session.scalar(db.select(db.func.count()).select_from(membership)
+                                        .where(membership.c.course_id == course.id))
 
     return render_template('admin/admin_cursos.html', 
                          course=course, 
+                         avisos=_avisos_da_turma(course.id),
+                         tarefas=_tarefas_da_turma(course.id),
+                         membros=_membros_da_turma(course.id),
+                         total_membros=total_membros,
                          non_members=non_members,
                          form=form)
 
+def _avisos_da_turma(course_id):
+    return paginar(db.select(Announcement).options(db.joinedload(Announcement.professor))
+                     .where(Announcement.course_id == course_id),
+                   [Announcement.timestamp, Announcement.id], secao='avisos', decrescente=True)
+
+def _tarefas_da_turma(course_id):
+    return paginar(db.select(Task).where(Task.course_id == course_id),
+                   [Task.created_at, Task.id], secao='tarefas', decrescente=True)
+
+def _membros_da_turma(course_id):
+    return paginar(db.select(User).join(membership, membership.c.user_id == User.id)
+                     .where(membership.c.course_id == course_id),
+                   [User.name, User.id], secao='membros')
+
 # --- Gestão de Matérias da Turma (NÍVEL 2.3) ---
 
 @admin_bp.route('/course/<int:course_id>/add_subject', methods=['POST'])
@@ -182,6 +217,8 @@ def delete_course_subject(subject_id):
     
     if form.validate_on_submit():
         try:
+            for folder in subject.folders:
+                remover_pasta_do_indice(folder.id)
             db.session.delete(subject)
             db.session.commit()
             flash('Matéria da turma excluída com sucesso.', 'success')
@@ -237,9 +274,12 @@ def remove_member(course_id, user_id):
 @login_required
 @role_required(['admin'])
 def manage_users():
-    users = User.query.filter(User.id != session['user_id']).all()
     form = EmptyForm()
-    return render_template('admin/admin_permissao.html', users=users, form=form)
+    pagina = paginar(db.select(User).where(User.id != session['user_id']), [User.id])
+
+    if quer_json():
+        return resposta_pagina('admin/_utilizadores.html', pagina, form=form)
+    return render_template('admin/admin_permissao.html', pagina=pagina, form=form)
 
 @admin_bp.route('/user/<int:user_id>/set_role', methods=['POST'])
 @login_required
@@ -412,10 +452,32 @@ def view_submissions(task_id):
     if not task:
         return course 
 
-    submissions = Submission.query.filter_by(task_id=task.id).all()
     form = EmptyForm()
-    
-    return render_template('admin/admin_entregas.html', task=task, submissions=submissions, form=form)
+    pagina = paginar(db.select(Submission)
+                       .options(db.joinedload(Submission.student), db.joinedload(Submission.file))
+                       .where(Submission.task_id == task.id),
+                     [Submission.submitted_at, Submission.id])
+
+    if quer_json():
+        return resposta_pagina('admin/_entregas.html', pagina, form=form)
+    return render_template('admin/admin_entregas.html', task=task, pagina=pagina, form=form)
+
+@admin_bp.route('/task/<int:task_id>/submissions/zip')
+@login_required
+@role_required(['professor', 'admin'])
+def download_submissions_zip(task_id):
+    task, course = get_task_or_404_with_permission(task_id)
+    if not task:
+        return course
+
+    # Um ficheiro por aluno, com o nome do aluno à frente: "Maria Silva - trabalho.pdf"
+    linhas = db.session.execute(
+        db.select(User.name, File.original_filename, File.blob_hash, File.filename)
+        .join(Submission.student).join(Submission.file)
+        .where(Submission.task_id == task.id).order_by(User.name, Submission.id)).all()
+    itens = ((f"{aluno} - {original}", caminho_upload(nome_armazenado(blob_hash, filename)))
+             for aluno, original, blob_hash, filename in linhas)
+    return servir_zip(itens, f"entregas_{secure_filename(task.title) or task.id}.zip")
 
 @admin_bp.route('/submission/<int:submission_id>/grade', methods=['POST'])
 @login_required
@@ -504,7 +566,11 @@ def delete_user(user_id):
         # 3. Apaga Avisos (Announcements) órfãos
         Announcement.query.filter_by(professor_id=user_to_delete.id).delete()
         
-        # 4. Apaga o Usuário
+        # 4. Limpa o índice de busca das pastas pessoais (o SQLite não aplica o ON DELETE CASCADE)
+        for folder_id in pastas_do_utilizador(user_to_delete.id):
+            remover_pasta_do_indice(folder_id)
+
+        # 5. Apaga o Usuário
         db.session.delete(user_to_delete)
         db.session.commit()
         
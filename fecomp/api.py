@@ -1,15 +1,25 @@
-import os
-from flask import Blueprint, request, jsonify, session, url_for, current_app
+import json
+import time
+from datetime import datetime, timedelta
+from flask import Blueprint, request, jsonify, session, url_for, current_app, Response, stream_with_context
 from functools import wraps
+from werkzeug.utils import secure_filename
 import random
-import PyPDF2
-import docx
 import openai
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-from .models import Subject, User, Folder
+from .models import Subject, Folder, File, UploadSession
 from .extensions import db, csrf 
-from .visoes import check_permission, login_required
+from .visoes import login_required, role_required, anunciar_ficheiros
+from .indice import indexar_pendentes, garantir_vetores_pasta, recuperar_trechos, empacotar_contexto, MIN_TOKENS_TRECHO
+from .indexador import indexador
+from .escopos import ESCOPOS, pastas_do_escopo
+from .busca import buscar_ficheiros
+from .llm import llm, PROMPTS, PromptGrandeDemais
+from .cache import cache_respostas, chave_resposta
+from .limites import limitador, LimiteExcedido
+from .youtube import youtube
+from .contextos import contextos
+from .permissoes import can_edit
+from .envios import EnvioInvalido, criar_envio, estado_envio, receber_parte, concluir_envios, cancelar_envio
 
 api_bp = Blueprint('api', __name__)
 
@@ -267,6 +277,97 @@ DICAS = [
 ]
 
 
+# --- STREAMING (SERVER-SENT EVENTS) ---
+def _evento_sse(dados, evento=None):
+    linha_evento = f"event: {evento}\n" if evento else ""
+    return f"{linha_evento}data: {json.dumps(dados, ensure_ascii=False)}\n\n"
+
+
+def _resposta_stream(messages, extras=None, rotulo="chat", ao_terminar=None, vez=None):
+    """
+    Envia a resposta do GPT token a token (eventos 'data' com {"delta": ...}).
+    No fim manda o evento 'done' com o tempo até o primeiro token (a métrica principal do chat).
+    `ao_terminar` recebe o texto completo quando a resposta chega inteira (ex: para o cache).
+    `vez` é a espera pela fila do GPT (ver _chamar_llm); uma recusa da fila chega como evento 'error'.
+    Os tempos só vão para o stdout acima de LLM_SLOW_LOG_MS (o cliente recebe-os sempre no 'done').
+    """
+    lento_ms = current_app.config['LLM_SLOW_LOG_MS']
+
+    def gerar():
+        inicio = time.perf_counter()
+        primeiro_token = None
+        partes = []
+        try:
+            for delta in llm.stream(messages, vez):
+                if primeiro_token is None:
+                    primeiro_token = (time.perf_counter() - inicio) * 1000
+                partes.append(delta)
+                yield _evento_sse({"delta": delta})
+
+            if ao_terminar:
+                ao_terminar(''.join(partes))
+            total = (time.perf_counter() - inicio) * 1000
+            if total >= lento_ms:
+                print(f"[{rotulo}] resposta lenta: primeiro token: {primeiro_token or total:.0f} ms | total: {total:.0f} ms")
+            yield _evento_sse(dict(extras or {}, ttft_ms=round(primeiro_token or total), total_ms=round(total)), "done")
+
+        except LimiteExcedido as e:
+            _anotar_recusa(e)
+            yield _evento_sse({"error": e.mensagem, "motivo": e.motivo,
+                               "retry_after": max(1, round(e.retry_after))}, "error")
+        except PromptGrandeDemais as e:
+            print(f"Pedido bloqueado ({rotulo}): {e}")
+            yield _evento_sse({"error": "A mensagem é grande demais para a IA. Tente resumir a pergunta."}, "error")
+        except openai.RateLimitError:
+            print(f"Erro na API OpenAI ({rotulo}): Rate Limit (limite estourado)")
+            limitador.rate_limit_provedor()
+            yield _evento_sse({"error": "Limite de uso da API de texto atingido."}, "error")
+        except Exception as e:
+            print(f"Erro na API OpenAI ({rotulo}): {e}")
+            yield _evento_sse({"error": "Ocorreu um erro ao processar sua solicitação com a IA."}, "error")
+
+    return _resposta_sse(gerar())
+
+
+def _anotar_recusa(e):
+    # Numa sobrecarga cada pedido seria uma linha: por omissão só contam (ver limitador.estatisticas)
+    if current_app.config['LLM_LOG_REFUSALS']:
+        print(f"Pedido recusado pelo limitador ({e.motivo}) para o usuário {session.get('user_id')}")
+
+
+def _resposta_limite(e):
+    _anotar_recusa(e)
+    resposta = jsonify({"error": e.mensagem, "motivo": e.motivo})
+    resposta.status_code = 429
+    resposta.headers['Retry-After'] = str(max(1, round(e.retry_after)))
+    return resposta
+
+
+def _chamar_llm(messages, stream, **kwargs):
+    """
+    Confere o limite do aluno e faz a chamada. A vaga na fila do GPT só é pedida por quem vai mesmo
+    ao provedor (o líder do voo único) e fica com ele até a chamada terminar; no streaming isso é
+    quando o provedor acaba de mandar a resposta, mesmo que o aluno já tenha desconectado.
+    """
+    user_id = session['user_id']
+    limitador.verificar_usuario(user_id)
+    vez = lambda: limitador.entrar(user_id)
+    if stream:
+        return _resposta_stream(messages, vez=vez, **kwargs)
+    return llm.completar(messages, vez=vez)
+
+
+def _resposta_sse(eventos):
+    return Response(stream_with_context(eventos), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def _stream_do_cache(texto):
+    """Resposta já guardada: vai num único evento, no mesmo formato do streaming."""
+    yield _evento_sse({"delta": texto})
+    yield _evento_sse({"ttft_ms": 0, "total_ms": 0, "cache": True}, "done")
+
+
 # --- ROTA DE CHAT GERAL (AGORA COM GPT) ---
 @api_bp.route('/chat', methods=['POST'])
 @csrf.exempt
@@ -277,61 +378,48 @@ def chat_api():
         return jsonify({"error": "Mensagem ausente"}), 400
     
     try:
-        # 1. Pega a chave do config
-        api_key = current_app.config['OPENAI_API_KEY']
-        if not api_key:
+        if not llm.configurado:
             return jsonify({"error": "API da OpenAI não configurada."}), 500
-            
-        client = openai.OpenAI(api_key=api_key)
-        
-        # 2. Define o "system prompt" (personalidade)
-        system_prompt = (
-            "Você é o 'Educa AI', um assistente de estudos inteligente e amigável. "
-            "Seu público são estudantes de pré-vestibular (ENEM e SSA). "
-            "Responda às suas dúvidas de forma didática, clara e encorajadora. "
-            "Use formatação markdown (como **negrito** e *itálico*) para organizar a resposta. "
-            "Seja direto e foque no conteúdo acadêmico."
-        )
-        
-        # 3. Faz a chamada para o GPT
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo", # Ou "gpt-4", "gpt-4o", etc.
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_message}
-            ]
-        )
-        
-        # 4. Retorna a resposta
-        return jsonify(response=response.choices[0].message.content)
 
+        chave = chave_resposta(user_message, PROMPTS['geral'], llm.model)
+        em_cache = cache_respostas.obter(chave)
+        if request.json.get('stream'):
+            if em_cache is not None:
+                return _resposta_sse(_stream_do_cache(em_cache))
+            return _chamar_llm(llm.mensagens('geral', user_message), True, rotulo="chat",
+                               ao_terminar=lambda texto: cache_respostas.guardar(chave, texto))
+
+        if em_cache is not None:
+            return jsonify(response=em_cache, cache=True)
+        resposta = _chamar_llm(llm.mensagens('geral', user_message), False)
+        cache_respostas.guardar(chave, resposta)
+        return jsonify(response=resposta)
+
+    except LimiteExcedido as e:
+        return _resposta_limite(e)
+
+    except PromptGrandeDemais as e:
+        print(f"Pedido bloqueado (chat): {e}")
+        return jsonify({"error": "A mensagem é grande demais para a IA. Tente resumir a pergunta."}), 413
     except openai.RateLimitError:
         print("Erro na API OpenAI: Rate Limit (limite estourado)")
+        limitador.rate_limit_provedor()
         return jsonify({"error": "Limite de uso da API de texto atingido."}), 429
     except Exception as e:
         print(f"Erro na API OpenAI: {e}")
         return jsonify({"error": "Ocorreu um erro ao processar sua solicitação com a IA.", "details": str(e)}), 500
 
-# --- FUNÇÃO HELPER DE RAG (Mantida) ---
-def extract_text_from_file(file_path, original_filename):
-    text = ""
-    try:
-        if original_filename.lower().endswith('.pdf'):
-            with open(file_path, 'rb') as f:
-                reader = PyPDF2.PdfReader(f)
-                for page in reader.pages:
-                    text += page.extract_text() + "\n"
-        elif original_filename.lower().endswith('.docx'):
-            doc = docx.Document(file_path)
-            for para in doc.paragraphs:
-                text += para.text + "\n"
-        elif original_filename.lower().endswith('.txt'):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                text = f.read()
-    except Exception as e:
-        print(f"Erro ao extrair texto do arquivo {original_filename}: {e}")
-        return f"[Erro ao ler o arquivo {original_filename}]\n"
-    return text
+@api_bp.route('/cache/estatisticas')
+@role_required(['admin'])
+def cache_estatisticas():
+    """Acertos e falhas do cache de respostas (contados neste processo)."""
+    return jsonify(cache_respostas.estatisticas())
+
+@api_bp.route('/llm/estatisticas')
+@role_required(['admin'])
+def llm_estatisticas():
+    """Fila do GPT neste processo: profundidade, tempos de espera e pedidos recusados por motivo."""
+    return jsonify(limitador.estatisticas())
 
 # --- ROTA DE CHAT CONTEXTUAL (RAG/GPT) [MODIFICADA] ---
 @api_bp.route('/chat_contextual', methods=['POST'])
@@ -340,73 +428,169 @@ def extract_text_from_file(file_path, original_filename):
 def chat_contextual_api():
     data = request.json
     user_message = data.get('message')
-    folder_id = data.get('folder_id')
-    if not user_message or not folder_id:
+    # Escopo: 'folder' (padrão, com folder_id), 'subject', 'course' ou 'all' (tudo o que o aluno pode ler)
+    scope = data.get('scope') or 'folder'
+    scope_id = data.get('scope_id') or data.get('folder_id')
+    if not user_message or (scope != 'all' and not scope_id):
         return jsonify({"error": "Mensagem ou ID da pasta ausente"}), 400
+    if scope not in ESCOPOS:
+        return jsonify({"error": "Escopo inválido."}), 400
 
-    folder = Folder.query.get_or_404(folder_id)
-    subject = folder.subject
+    if scope == 'folder':
+        Folder.query.get_or_404(scope_id)
 
-    if not check_permission(subject): # ... (Lógica de permissão mantida)
-        user = User.query.get(session['user_id'])
-        is_member = False
-        if subject.course_id:
-            is_member = user.courses.filter_by(id=subject.course_id).first() is not None
-        if not is_member:
+    # A permissão (matéria pessoal, membro ou admin da turma) vai dentro da consulta
+    pastas = pastas_do_escopo(session['user_id'], scope, scope_id)
+    if not db.session.scalars(pastas.limit(1)).first():
+        if scope == 'folder':
             return jsonify({"error": "Você não tem permissão para acessar esta pasta."}), 403
+        return jsonify(response="Não encontrei pastas que você possa consultar neste escopo.")
 
-    # 2. Extrair contexto (Lógica mantida)
-    context = ""
-    upload_folder_abs = os.path.join(current_app.root_path, current_app.config['UPLOAD_FOLDER'].split('/')[-1])
-    files_in_folder = folder.files
-    if not files_in_folder:
+    # 2. Buscar os trechos relevantes no índice das pastas
+    files_in_scope = File.query.filter(File.folder_id.in_(pastas)).all()
+    if not files_in_scope:
          return jsonify(response="Esta pasta está vazia. Não há conteúdo para eu analisar.")
 
-    for file_db in files_in_folder:
-        file_path = os.path.join(upload_folder_abs, file_db.filename)
-        if os.path.exists(file_path):
-            context += f"--- Início do Documento: {file_db.original_filename} ---\n"
-            context += extract_text_from_file(file_path, file_db.original_filename)
-            context += f"--- Fim do Documento: {file_db.original_filename} ---\n\n"
+    # A indexação normal acontece em segundo plano logo depois do upload (ver indexador.py)
+    # A fila só existe na memória do processo: um 'pending' antigo perdeu-se num reinício e é tratado
+    # como os ficheiros enviados antes da fila existir (volta para a fila)
+    limite_fila = datetime.utcnow() - timedelta(seconds=current_app.config['INDEXER_STALE_AFTER'])
+    def perdido(f):
+        return f.index_status == 'pending' and (f.index_requested_at is None or f.index_requested_at < limite_fila)
+
+    prontos = [f for f in files_in_scope if f.index_status == 'ready']
+    pendentes = [f for f in files_in_scope if f.index_status == 'pending' and not perdido(f)]
+    antigos = [f for f in files_in_scope if f.index_status is None or perdido(f)]
+
+    if antigos and (prontos or pendentes or scope != 'folder'):
+        # Já há conteúdo para responder (ou o escopo é grande demais para esperar): antigos vão para a fila
+        for file_db in antigos:
+            file_db.index_status = 'pending'
+            file_db.index_requested_at = datetime.utcnow()
+        db.session.commit()
+        indexador.enfileirar([f.id for f in antigos])
+        pendentes += antigos
+    elif antigos:
+        # Pasta "fria": nada pronto nem na fila, então não há alternativa a extrair agora
+        try:
+            indexar_pendentes(antigos)
+            db.session.commit()
+        except Exception as e:
+            print(f"Erro ao indexar a pasta {scope_id}: {e}")
+            db.session.rollback()
+        prontos = [f for f in files_in_scope if f.index_status == 'ready']
+
+    if not prontos and pendentes:
+        return jsonify(response="Os arquivos desta pasta ainda estão sendo processados. Tente novamente em alguns instantes.",
+                       pendentes=len(pendentes))
+
+    for folder_id in sorted({f.folder_id for f in prontos}):
+        garantir_vetores_pasta(folder_id)
+    trechos = recuperar_trechos(user_message, pastas, current_app.config['RAG_TOP_K'])
+    # O contexto ocupa o que sobrar da janela do modelo depois do prompt de sistema e da pergunta
+    moldura = f"CONTEXTO:\n\n\nDÚVIDA DO ALUNO: {user_message}"
+    disponivel = llm.limite_prompt - llm.tokens_mensagens(llm.mensagens('contextual', moldura))
+    orcamento = min(current_app.config['RAG_CONTEXT_TOKENS'], disponivel)
+    context, relatorio = empacotar_contexto(trechos, orcamento, llm.contar_tokens)
+    if relatorio['trechos_descartados'] or relatorio['trechos_truncados']:
+        print(f"[RAG] {scope} {scope_id or ''}: {relatorio['trechos']} trechos em {relatorio['tokens']} tokens, "
+              f"{relatorio['trechos_truncados']} cortados, {relatorio['trechos_descartados']} descartados "
+              f"({relatorio['documentos_descartados']} documentos de fora)")
 
     if not context.strip():
+        if trechos and orcamento < MIN_TOKENS_TRECHO:
+            return jsonify({"error": "A mensagem é grande demais para a IA. Tente resumir a pergunta."}), 413
         return jsonify(response="Não consegui extrair texto legível dos arquivos nesta pasta...")
 
     # 3. Chamar a IA (RAG com GPT)
     try:
-        api_key = current_app.config['OPENAI_API_KEY']
-        if not api_key:
+        if not llm.configurado:
             return jsonify({"error": "API da OpenAI não configurada."}), 500
-            
-        client = openai.OpenAI(api_key=api_key)
-        
-        system_prompt = (
-            "Você é um assistente de estudos focado. Responda à pergunta do aluno usando **única e exclusivamente** as informações fornecidas no 'CONTEXTO' abaixo. "
-            "Não use nenhum conhecimento externo."
-            "Se a resposta não estiver no contexto, diga: 'Não encontrei essa informação nos documentos desta pasta.' "
-            "Seja direto e organize a resposta com markdown."
-        )
-        
+
         # Montamos o prompt final para o GPT
         full_prompt = f"CONTEXTO:\n{context}\n\nDÚVIDA DO ALUNO: {user_message}"
+        messages = llm.mensagens('contextual', full_prompt)
+        extras = {"pendentes": len(pendentes), "escopo": scope, "contexto": relatorio}
+        if data.get('stream'):
+            return _chamar_llm(messages, True, extras=extras, rotulo="RAG")
+
+        return jsonify(response=_chamar_llm(messages, False), **extras)
 
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo", # Ou o modelo que preferir
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": full_prompt}
-            ]
-        )
-        return jsonify(response=response.choices[0].message.content)
+    except LimiteExcedido as e:
+        return _resposta_limite(e)
 
+    except PromptGrandeDemais as e:
+        print(f"Pedido bloqueado (RAG): {e}")
+        return jsonify({"error": "A mensagem é grande demais para a IA. Tente resumir a pergunta."}), 413
     except openai.RateLimitError:
         print("Erro na API OpenAI (RAG): Rate Limit (limite estourado)")
+        limitador.rate_limit_provedor()
         return jsonify({"error": "Limite de uso da API de texto atingido."}), 429
     except Exception as e:
         print(f"Erro na API OpenAI (RAG): {e}")
         return jsonify({"error": "Ocorreu um erro ao processar sua solicitação com a IA.", "details": str(e)}), 500
 
 
+# --- ROTA DE BUSCA DE TRECHOS (LEXICAL + SEMÂNTICA) ---
+@api_bp.route('/buscar_trechos', methods=['POST'])
+@csrf.exempt
+@login_required
+def buscar_trechos_api():
+    data = request.json
+    query = data.get('query')
+    scope = data.get('scope') or 'folder'
+    scope_id = data.get('scope_id') or data.get('folder_id')
+    if not query or (scope != 'all' and not scope_id):
+        return jsonify({"error": "Termo de busca ou ID da pasta ausente"}), 400
+    if scope not in ESCOPOS:
+        return jsonify({"error": "Escopo inválido."}), 400
+
+    if scope == 'folder':
+        Folder.query.get_or_404(scope_id)
+
+    pastas = pastas_do_escopo(session['user_id'], scope, scope_id)
+    if scope == 'folder' and not db.session.scalars(pastas.limit(1)).first():
+        return jsonify({"error": "Você não tem permissão para acessar esta pasta."}), 403
+
+    k = min(int(data.get('k') or current_app.config['RAG_TOP_K']), 20)
+    indexadas = db.select(File.folder_id).where(File.folder_id.in_(pastas), File.index_status == 'ready').distinct()
+    for folder_id in db.session.scalars(indexadas):
+        garantir_vetores_pasta(folder_id)
+    trechos = recuperar_trechos(query, pastas, k)
+    return jsonify(trechos=[{
+        'file_id': chunk.file_id,
+        'folder_id': chunk.folder_id,
+        'arquivo': chunk.file.original_filename,
+        'posicao': chunk.position,
+        'texto': chunk.text
+    } for chunk in trechos])
+
+
+# --- BUSCA DE TEXTO COMPLETO (NOMES E CONTEÚDO DOS FICHEIROS) ---
+@api_bp.route('/search')
+@login_required
+def search_api():
+    query = (request.args.get('q') or '').strip()
+    if not query:
+        return jsonify({"error": "Termo de busca ausente"}), 400
+    scope = request.args.get('scope') or 'all'
+    scope_id = request.args.get('scope_id', type=int)
+    if scope not in ESCOPOS or (scope != 'all' and not scope_id):
+        return jsonify({"error": "Escopo inválido."}), 400
+
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), 50)
+
+    inicio = time.perf_counter()
+    pastas = pastas_do_escopo(session['user_id'], scope, scope_id)
+    results, has_more = buscar_ficheiros(query, pastas, page, per_page)
+    for item in results:
+        item['url'] = url_for('visoes.folders', folder_id=item['folder_id'])
+
+    return jsonify(results=results, page=page, per_page=per_page, has_more=has_more,
+                   took_ms=round((time.perf_counter() - inicio) * 1000, 1))
+
+
 # <<< ROTA DO YOUTUBE (MANTIDA) >>>
 @api_bp.route('/buscar_videos', methods=['POST'])
 @csrf.exempt
@@ -416,31 +600,11 @@ def buscar_videos_api():
     if not query:
         return jsonify({"error": "Termo de busca ausente"}), 400
         
-    api_key = current_app.config['YOUTUBE_API_KEY']
-    if not api_key:
+    if not youtube.configurado:
         return jsonify({"error": "API do YouTube não configurada no servidor."}), 500
 
     try:
-        youtube = build('youtube', 'v3', developerKey=api_key)
-        search_response = youtube.search().list(
-            q=query,
-            part='snippet',
-            maxResults=3,
-            type='video',
-            relevanceLanguage='pt',
-            regionCode='BR'
-        ).execute()
-        
-        videos = []
-        for item in search_response.get('items', []):
-            videos.append({
-                'title': item['snippet']['title'],
-                'video_id': item['id']['videoId'],
-                'thumbnail': item['snippet']['thumbnails']['medium']['url'],
-                'channel': item['snippet']['channelTitle']
-            })
-            
-        return jsonify(videos=videos)
+        return jsonify(videos=youtube.buscar(query))
 
     except Exception as e:
         print(f"Erro na busca de vídeo: {e}")
@@ -456,26 +620,7 @@ def dica_do_dia():
 @api_bp.route('/user_contexts')
 @login_required
 def get_user_contexts():
-    user = User.query.get(session['user_id'])
-    contexts = []
-    # Pessoais
-    personal_subjects = Subject.query.filter_by(user_id=user.id).order_by(Subject.name).all()
-    for subject in personal_subjects:
-        for folder in subject.folders:
-            contexts.append({
-                'id': folder.id,
-                'name': f"Pessoal: {subject.name} / {folder.name}"
-            })
-    # Turmas
-    user_course_ids = [c.id for c in user.courses]
-    course_subjects = Subject.query.filter(Subject.course_id.in_(user_course_ids)).order_by(Subject.course_id, Subject.name).all()
-    for subject in course_subjects:
-        for folder in subject.folders:
-            contexts.append({
-                'id': folder.id,
-                'name': f"{subject.course.name}: {subject.name} / {folder.name}"
-            })
-    return jsonify(contexts=contexts)
+    return jsonify(contextos.obter(session['user_id']))
 
 @api_bp.route('/add_subject', methods=['POST'])
 @csrf.exempt
@@ -498,4 +643,85 @@ def add_subject_api():
             "update_color": url_for('visoes.update_subject_color', subject_id=new_subject.id)
         }
     }
-    return jsonify({"subject": subject_data}), 201
\ No newline at end of file
+    return jsonify({"subject": subject_data}), 201
+
+
+# --- ENVIO EM PARTES (RETOMÁVEL), ver envios.py ---
+
+def _envio_do_usuario(upload_id):
+    envio = db.session.get(UploadSession, upload_id)
+    if envio is None or envio.user_id != session['user_id']:
+        raise EnvioInvalido("Envio não encontrado.", 404)
+    return envio
+
+
+@api_bp.errorhandler(EnvioInvalido)
+def _erro_envio(e):
+    return jsonify({"error": e.mensagem}), e.status
+
+
+@api_bp.route('/uploads', methods=['POST'])
+@csrf.exempt
+@login_required
+def criar_envio_api():
+    data = request.get_json(silent=True) or {}
+    folder = db.session.get(Folder, data.get('folder_id') or 0)
+    if folder is None or not can_edit(folder.subject):
+        return jsonify({"error": "Você não tem permissão para enviar arquivos para esta pasta."}), 403
+    original_filename = secure_filename(data.get('filename') or '')
+    if not original_filename or not isinstance(data.get('size'), int):
+        return jsonify({"error": "Informe o nome e o tamanho (em bytes) do ficheiro."}), 400
+
+    envio = criar_envio(session['user_id'], folder.id, original_filename, data['size'])
+    return jsonify(estado_envio(envio)), 201
+
+
+@api_bp.route('/uploads/<upload_id>')
+@login_required
+def estado_envio_api(upload_id):
+    return jsonify(estado_envio(_envio_do_usuario(upload_id)))
+
+
+@api_bp.route('/uploads/<upload_id>/<int:parte>', methods=['PUT'])
+@csrf.exempt
+@login_required
+def enviar_parte_api(upload_id, parte):
+    envio = _envio_do_usuario(upload_id)
+    # request.stream: o corpo vai para o disco à medida que chega, sem passar pelo parser de formulários
+    receber_parte(envio, parte, request.stream, request.headers.get('Upload-Checksum'))
+    return '', 204
+
+
+@api_bp.route('/uploads/complete', methods=['POST'])
+@csrf.exempt
+@login_required
+def concluir_envios_api():
+    data = request.get_json(silent=True) or {}
+    ids = data.get('ids') or []
+    envios = [_envio_do_usuario(upload_id) for upload_id in dict.fromkeys(ids)]
+    if not envios:
+        return jsonify({"error": "Nenhum envio para concluir."}), 400
+    for folder in {envio.folder_id: db.session.get(Folder, envio.folder_id) for envio in envios}.values():
+        if folder is None or not can_edit(folder.subject):
+            return jsonify({"error": "Você não tem permissão para enviar arquivos para esta pasta."}), 403
+
+    novos = concluir_envios(envios) # Todos os File num só commit
+    indexador.enfileirar([novo.id for novo in novos])
+
+    pastas = {}
+    for novo in novos:
+        pastas.setdefault(novo.folder_id, []).append(novo.original_filename)
+    for folder_id, nomes in pastas.items():
+        anunciar_ficheiros(db.session.get(Folder, folder_id).subject, nomes)
+
+    return jsonify({"files": [{"id": novo.id, "name": novo.original_filename,
+                               "url": url_for('visoes.uploaded_file', filename=novo.filename)}
+                              for novo in novos]}), 201
+
+
+@api_bp.route('/uploads/<upload_id>', methods=['DELETE'])
+@csrf.exempt
+@login_required
+def cancelar_envio_api(upload_id):
+    cancelar_envio(_envio_do_usuario(upload_id))
+    return '', 204
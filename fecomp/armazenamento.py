@@ -0,0 +1,314 @@
+import os
+import re
+import time
+import shutil
+from itertools import islice
+import hashlib
+import secrets
+from flask import current_app
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import object_session
+from .extensions import db
+from .models import File, Blob
+from .extracao import calcular_hash_arquivo
+
+# --- ARMAZENAMENTO DOS FICHEIROS ENVIADOS (POR CONTEÚDO) ---
+# Cada upload é gravado uma única vez com o nome igual ao seu SHA-256, calculado enquanto os
+# bytes chegam. A linha File continua a ser "o ficheiro da pasta" (nome original, URL própria),
+# mas só aponta para o conteúdo em File.blob_hash. A mesma apostila enviada para cinco turmas
+# ocupa o disco uma vez.
+#
+# Blob.ref_count conta os File que apontam para o conteúdo e é mantido pelos eventos do mapper
+# (inserções, exclusões diretas e em cascata). Um conteúdo com zero referências fica marcado
+# para remoção: o reconciliador (reconciliador.py) apaga a linha e o ficheiro em segundo plano.
+# Ficheiros antigos (blob_hash NULL) continuam com o nome em File.filename até
+# `flask armazenamento deduplicar`.
+#
+# Para a pasta não crescer para centenas de milhares de entradas, cada ficheiro vai para duas
+# subpastas tiradas do hash (do conteúdo, ou do nome nos antigos): uploads/ab/cd/abcd.... Os que
+# ainda estão no nível de cima (antes de `flask armazenamento fragmentar`) continuam a ser
+# encontrados por localizar(), por isso a migração corre com o site no ar.
+
+BLOCO = 1024 * 1024
+_RE_HASH = re.compile(r'[0-9a-f]{64}')
+
+
+def pasta_uploads():
+    pasta = current_app.config['UPLOAD_FOLDER']
+    if os.path.isabs(pasta):
+        return pasta # Ex: um volume próprio para os ficheiros
+    return os.path.join(current_app.root_path, pasta.split('/')[-1])
+
+
+def caminho_upload(nome):
+    return os.path.join(pasta_uploads(), nome)
+
+
+def fragmento(nome):
+    """Caminho fragmentado de `nome`, relativo à pasta de uploads: ab/cd/nome (256 x 256 subpastas)."""
+    chave = nome if _RE_HASH.fullmatch(nome) else hashlib.sha256(nome.encode('utf-8')).hexdigest()
+    return f"{chave[:2]}/{chave[2:4]}/{nome}"
+
+
+def localizar(nome):
+    """Caminho relativo onde `nome` está agora: fragmentado, ou ainda no nível de cima da pasta."""
+    fragmentado = fragmento(nome)
+    if os.path.exists(caminho_upload(fragmentado)):
+        return fragmentado
+    if os.path.exists(caminho_upload(nome)):
+        return nome
+    # Inexistente, ou movido pela migração entre as duas verificações
+    return fragmentado
+
+
+def caminho_novo(nome):
+    """Caminho absoluto (fragmentado) para gravar `nome`, com as subpastas já criadas."""
+    caminho = caminho_upload(fragmento(nome))
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    return caminho
+
+
+def nome_armazenado(blob_hash, filename):
+    """Caminho, relativo à pasta de uploads, onde estão os bytes de um File."""
+    return localizar(blob_hash or filename)
+
+
+def caminho_arquivo(file_db):
+    return caminho_upload(nome_armazenado(file_db.blob_hash, file_db.filename))
+
+
+def nome_unico(prefixo, original_filename):
+    """Nome público (URL) de um File novo; o sufixo aleatório evita colisões com envios do mesmo nome."""
+    return f"{prefixo}_{secrets.token_hex(4)}_{original_filename}"
+
+
+def garantir_blob(conteudo_hash, tamanho):
+    """
+    Cria a linha do conteúdo se ainda não existir (dois uploads iguais ao mesmo tempo não colidem).
+    Se já existir, a linha fica bloqueada até ao commit: a recolha não a apaga a meio do upload.
+    """
+    dialeto = db.session.get_bind().dialect.name
+    if dialeto == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialeto == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        if db.session.get(Blob, conteudo_hash) is None:
+            db.session.add(Blob(hash=conteudo_hash, size=tamanho, ref_count=0))
+            db.session.flush()
+        return
+    novo = insert(Blob).values(hash=conteudo_hash, size=tamanho, ref_count=0)
+    db.session.execute(novo.on_conflict_do_update(index_elements=['hash'], set_={'size': novo.excluded.size}))
+
+
+def colocar_no_lugar(temporario, conteudo_hash):
+    """Move o temporário para o nome do conteúdo; se o conteúdo já existe, o temporário é descartado."""
+    if os.path.exists(caminho_upload(localizar(conteudo_hash))):
+        os.remove(temporario)
+    else:
+        os.replace(temporario, caminho_novo(conteudo_hash))
+
+
+def ligar_no_lugar(origem, conteudo_hash):
+    """
+    Como colocar_no_lugar, mas `origem` fica onde está (ligação, ou cópia noutro sistema de ficheiros).
+    Devolve o caminho criado, ou None se o conteúdo já existia.
+    """
+    if os.path.exists(caminho_upload(localizar(conteudo_hash))):
+        return None
+    destino = caminho_novo(conteudo_hash)
+    _ligar_ou_copiar(origem, destino)
+    # A ligação herda o mtime antigo da origem: sem isto a varredura do reconciliador podia tomá-la
+    # por um órfão antigo antes de a linha Blob ser confirmada
+    os.utime(destino)
+    return destino
+
+
+def guardar_upload(storage):
+    """
+    Grava um FileStorage na pasta de uploads, calculando o SHA-256 em blocos durante a cópia.
+    Devolve (hash, tamanho). A linha Blob fica na sessão atual; o commit do File que a usa a confirma.
+    """
+    pasta = pasta_uploads()
+    os.makedirs(pasta, exist_ok=True)
+    temporario = os.path.join(pasta, f".upload-{secrets.token_hex(8)}")
+    sha256 = hashlib.sha256()
+    tamanho = 0
+    try:
+        with open(temporario, 'wb') as destino:
+            while True:
+                bloco = storage.stream.read(BLOCO)
+                if not bloco:
+                    break
+                sha256.update(bloco)
+                destino.write(bloco)
+                tamanho += len(bloco)
+        conteudo_hash = sha256.hexdigest()
+        # A linha vem antes do ficheiro: uma recolha concorrente do mesmo conteúdo espera por ela
+        garantir_blob(conteudo_hash, tamanho)
+        colocar_no_lugar(temporario, conteudo_hash)
+    except Exception:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+    return conteudo_hash, tamanho
+
+
+# --- CONTAGEM DE REFERÊNCIAS ---
+
+def _somar(conexao, conteudo_hash, delta):
+    conexao.execute(db.update(Blob).where(Blob.hash == conteudo_hash)
+                    .values(ref_count=Blob.ref_count + delta))
+
+
+def _marcar_solto(alvo, chave, nome):
+    # O reconciliador lê estas marcas depois do commit (ver reconciliador.py)
+    sessao = object_session(alvo)
+    if sessao is not None:
+        sessao.info.setdefault(chave, set()).add(nome)
+
+
+@event.listens_for(File, 'after_insert')
+def _file_inserido(mapper, conexao, alvo):
+    if alvo.blob_hash:
+        _somar(conexao, alvo.blob_hash, 1)
+
+
+@event.listens_for(File, 'after_update')
+def _file_alterado(mapper, conexao, alvo):
+    historico = inspect(alvo).attrs.blob_hash.history
+    for conteudo_hash in historico.added or ():
+        if conteudo_hash:
+            _somar(conexao, conteudo_hash, 1)
+    for conteudo_hash in historico.deleted or ():
+        if conteudo_hash:
+            _somar(conexao, conteudo_hash, -1)
+            _marcar_solto(alvo, 'blobs_soltos', conteudo_hash)
+
+
+@event.listens_for(File, 'after_delete')
+def _file_apagado(mapper, conexao, alvo):
+    if alvo.blob_hash:
+        _somar(conexao, alvo.blob_hash, -1)
+        _marcar_solto(alvo, 'blobs_soltos', alvo.blob_hash)
+    else:
+        _marcar_solto(alvo, 'legados_soltos', alvo.filename)
+
+
+def recolher_blobs(hashes=None, limite=None):
+    """
+    Apaga os conteúdos sem referências (linha e ficheiro): os de `hashes`, ou todos os marcados (até
+    `limite`). As linhas são apagadas e os ficheiros removidos dentro da mesma transação: um upload
+    do mesmo conteúdo que chegue entretanto espera pela linha e volta a gravar o ficheiro.
+    Devolve (quantidade, bytes libertados).
+    """
+    condicao = Blob.ref_count <= 0
+    if hashes is not None:
+        if not hashes:
+            return 0, 0
+        condicao = db.and_(condicao, Blob.hash.in_(list(hashes)))
+    quantidade = libertados = 0
+    with db.engine.begin() as conexao:
+        marcados = db.select(Blob.hash).where(condicao)
+        if limite:
+            marcados = marcados.limit(limite)
+        apagados = conexao.execute(
+            db.delete(Blob).where(Blob.hash.in_(marcados), Blob.ref_count <= 0)
+            .returning(Blob.hash, Blob.size)).all()
+        for conteudo_hash, tamanho in apagados:
+            caminho = caminho_upload(localizar(conteudo_hash))
+            if os.path.exists(caminho):
+                os.remove(caminho)
+                libertados += tamanho or 0
+            quantidade += 1
+    return quantidade, libertados
+
+
+def recolher_legados(nomes):
+    """Apaga do disco os ficheiros antigos (sem blob) de `nomes` a que já nenhum File se refere."""
+    quantidade = libertados = 0
+    for nome in nomes:
+        if db.session.scalar(db.select(db.exists().where(File.filename == nome, File.blob_hash.is_(None)))):
+            continue
+        caminho = caminho_upload(localizar(nome))
+        try:
+            tamanho = os.path.getsize(caminho)
+            os.remove(caminho)
+        except FileNotFoundError:
+            continue
+        quantidade += 1
+        libertados += tamanho
+    return quantidade, libertados
+
+
+# --- CONVERSÃO DOS FICHEIROS ANTIGOS ---
+
+def _ligar_ou_copiar(origem, destino):
+    try:
+        os.link(origem, destino)
+    except OSError:
+        shutil.copy2(origem, destino)
+
+
+def deduplicar_legado(lote=200):
+    """
+    Converte os File antigos (nome próprio no disco) em referências para o conteúdo.
+    Cada ficheiro é ligado ao nome do hash, a linha é confirmada e só então o nome antigo sai do
+    disco: pode ser interrompido e retomado a qualquer momento. Devolve um dicionário com contagens.
+    """
+    resumo = {'convertidos': 0, 'em_falta': 0, 'bytes_libertados': 0}
+    ultimo = ''
+    while True:
+        # Vários File antigos podem partilhar o mesmo nome (reenvio com o mesmo nome): um de cada vez
+        nomes = db.session.scalars(
+            db.select(File.filename).where(File.blob_hash.is_(None), File.filename > ultimo)
+            .group_by(File.filename).order_by(File.filename).limit(lote)).all()
+        if not nomes:
+            return resumo
+        for filename in nomes:
+            ultimo = filename
+            origem = caminho_upload(localizar(filename))
+            if not os.path.isfile(origem):
+                resumo['em_falta'] += 1
+                continue
+            conteudo_hash = calcular_hash_arquivo(origem)
+            tamanho = os.path.getsize(origem)
+            garantir_blob(conteudo_hash, tamanho)
+            ja_existia = ligar_no_lugar(origem, conteudo_hash) is None # Com mtime novo (ver varredura)
+            for file_db in File.query.filter_by(filename=filename, blob_hash=None):
+                file_db.blob_hash = conteudo_hash
+                file_db.content_hash = conteudo_hash
+                resumo['convertidos'] += 1
+            db.session.commit()
+            os.remove(origem)
+            if ja_existia:
+                resumo['bytes_libertados'] += tamanho
+
+
+# --- MIGRAÇÃO PARA A ESTRUTURA FRAGMENTADA ---
+
+def fragmentar_pasta(lote=1000, pausa=0.0, progresso=None):
+    """
+    Move os ficheiros do nível de cima da pasta de uploads para as subpastas do hash, `lote` de cada
+    vez (com `pausa` segundos entre lotes para não disputar o disco com o site). Cada mudança é um
+    rename atómico e localizar() procura nos dois sítios: pode correr com o site no ar, ser
+    interrompida e retomada. Temporários e envios em curso (nomes com ponto) ficam onde estão.
+    """
+    pasta = pasta_uploads()
+    movidos = 0
+    while True:
+        with os.scandir(pasta) as entradas:
+            nomes = [entrada.name for entrada in islice(
+                (e for e in entradas if not e.name.startswith('.') and e.is_file(follow_symlinks=False)), lote)]
+        if not nomes:
+            return movidos
+        for nome in nomes:
+            try:
+                os.replace(os.path.join(pasta, nome), caminho_novo(nome))
+                movidos += 1
+            except FileNotFoundError:
+                pass # Apagado entretanto
+        if progresso:
+            progresso(movidos)
+        if pausa:
+            time.sleep(pausa)
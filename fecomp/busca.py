@@ -0,0 +1,192 @@
+import re
+from sqlalchemy import event, text, bindparam
+from .extensions import db
+from .models import File, Folder, Subject
+from .texto import normalizar, STOPWORDS
+
+# --- BUSCA DE TEXTO COMPLETO (/api/search) ---
+# Índice do próprio banco sobre o texto dos trechos (text_chunk) e o nome original dos ficheiros:
+#   SQLite     -> tabelas FTS5 de conteúdo externo, mantidas por triggers
+#   PostgreSQL -> colunas tsvector geradas + índices GIN
+# As estruturas ficam fora dos models (o autogenerate ignora-as, ver migrations/env.py).
+# ATENÇÃO: no SQLite, migrações em modo batch recriam a tabela e perdem os triggers;
+# depois delas rode `flask --app run busca reconstruir`.
+
+TABELAS_FTS = ('text_chunk_fts', 'file_fts')
+COLUNAS_BUSCA = ('busca', 'busca_nome')
+PESO_NOME = 2.0 # Casar com o nome do ficheiro vale mais que casar com um trecho
+
+DDL_BUSCA = {
+    'sqlite': [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS text_chunk_fts USING fts5("
+        "text, content='text_chunk', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        "CREATE TRIGGER IF NOT EXISTS text_chunk_fts_ai AFTER INSERT ON text_chunk BEGIN "
+        "INSERT INTO text_chunk_fts(rowid, text) VALUES (new.id, new.text); END",
+        "CREATE TRIGGER IF NOT EXISTS text_chunk_fts_ad AFTER DELETE ON text_chunk BEGIN "
+        "INSERT INTO text_chunk_fts(text_chunk_fts, rowid, text) VALUES ('delete', old.id, old.text); END",
+        "CREATE TRIGGER IF NOT EXISTS text_chunk_fts_au AFTER UPDATE OF text ON text_chunk BEGIN "
+        "INSERT INTO text_chunk_fts(text_chunk_fts, rowid, text) VALUES ('delete', old.id, old.text); "
+        "INSERT INTO text_chunk_fts(rowid, text) VALUES (new.id, new.text); END",
+        "CREATE VIRTUAL TABLE IF NOT EXISTS file_fts USING fts5("
+        "original_filename, content='file', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        "CREATE TRIGGER IF NOT EXISTS file_fts_ai AFTER INSERT ON file BEGIN "
+        "INSERT INTO file_fts(rowid, original_filename) VALUES (new.id, new.original_filename); END",
+        "CREATE TRIGGER IF NOT EXISTS file_fts_ad AFTER DELETE ON file BEGIN "
+        "INSERT INTO file_fts(file_fts, rowid, original_filename) VALUES ('delete', old.id, old.original_filename); END",
+        "CREATE TRIGGER IF NOT EXISTS file_fts_au AFTER UPDATE OF original_filename ON file BEGIN "
+        "INSERT INTO file_fts(file_fts, rowid, original_filename) VALUES ('delete', old.id, old.original_filename); "
+        "INSERT INTO file_fts(rowid, original_filename) VALUES (new.id, new.original_filename); END",
+        # Relê o conteúdo das tabelas de origem (necessário na criação e depois de recriar triggers)
+        "INSERT INTO text_chunk_fts(text_chunk_fts) VALUES ('rebuild')",
+        "INSERT INTO file_fts(file_fts) VALUES ('rebuild')",
+    ],
+    'postgresql': [
+        "ALTER TABLE text_chunk ADD COLUMN IF NOT EXISTS busca tsvector "
+        "GENERATED ALWAYS AS (to_tsvector('portuguese', coalesce(text, ''))) STORED",
+        "CREATE INDEX IF NOT EXISTS ix_text_chunk_busca ON text_chunk USING GIN (busca)",
+        "ALTER TABLE file ADD COLUMN IF NOT EXISTS busca_nome tsvector "
+        "GENERATED ALWAYS AS (to_tsvector('simple', coalesce(original_filename, ''))) STORED",
+        "CREATE INDEX IF NOT EXISTS ix_file_busca_nome ON file USING GIN (busca_nome)",
+    ],
+}
+
+DDL_REMOCAO = {
+    'sqlite': ["DROP TABLE IF EXISTS text_chunk_fts", "DROP TABLE IF EXISTS file_fts"],
+    'postgresql': [],
+}
+
+
+def criar_indice_busca(conexao):
+    """Cria (ou completa) as estruturas de busca do dialeto em uso. Pode ser chamada mais de uma vez."""
+    for comando in DDL_BUSCA.get(conexao.dialect.name, []):
+        conexao.execute(text(comando))
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _apos_create_all(target, connection, **kw):
+    criar_indice_busca(connection) # Ex: .misc/resetdb.py
+
+
+@event.listens_for(db.metadata, 'before_drop')
+def _antes_drop_all(target, connection, **kw):
+    for comando in DDL_REMOCAO.get(connection.dialect.name, []):
+        connection.execute(text(comando))
+
+
+# --- CONSULTA ---
+
+_RE_TERMO = re.compile(r"\w+", re.UNICODE)
+
+
+def termos_da_busca(consulta):
+    """Palavras da busca sem stopwords, como o aluno escreveu (o banco trata acentos/radicais)."""
+    termos = [t.lower() for t in _RE_TERMO.findall(consulta)]
+    uteis = [t for t in termos if normalizar(t) not in STOPWORDS]
+    return (uteis or termos)[:12]
+
+
+def _consulta_sqlite(termos):
+    # Cada termo entre aspas (nada da sintaxe FTS5 vem do usuário) e como prefixo: "estequio" acha "estequiometria"
+    return ' '.join('"{}"*'.format(t.replace('"', '')) for t in termos)
+
+
+def _consulta_postgresql(termos):
+    # _RE_TERMO só deixa passar letras, dígitos e _, então nada da sintaxe do tsquery vem do usuário
+    return ' & '.join(t + ':*' for t in termos)
+
+
+def buscar_ficheiros(consulta, pastas, pagina=1, por_pagina=20):
+    """
+    Ficheiros das `pastas` (SELECT de ids, ver escopos.py) que casam com a busca, do mais relevante
+    para o menos. Retorna (resultados, tem_mais); cada resultado traz o melhor trecho destacado.
+    """
+    termos = termos_da_busca(consulta)
+    if not termos:
+        return [], False
+
+    folder_ids = db.session.scalars(pastas).all()
+    if not folder_ids:
+        return [], False
+
+    dialeto = db.session.get_bind().dialect.name
+    deslocamento = (pagina - 1) * por_pagina
+    # Pede um a mais para saber se existe próxima página sem contar o total
+    parametros = {'pastas': folder_ids, 'peso_nome': PESO_NOME, 'limite': por_pagina + 1, 'deslocamento': deslocamento}
+
+    if dialeto == 'postgresql':
+        parametros['q'] = _consulta_postgresql(termos)
+        ranking = text("""
+            SELECT file_id, MAX(score) AS score FROM (
+                SELECT c.file_id AS file_id, ts_rank(c.busca, q) AS score
+                FROM text_chunk c, to_tsquery('portuguese', :q) q
+                WHERE c.busca @@ q AND c.folder_id IN :pastas
+                UNION ALL
+                SELECT f.id, ts_rank(f.busca_nome, q) * :peso_nome
+                FROM file f, to_tsquery('simple', :q) q
+                WHERE f.busca_nome @@ q AND f.folder_id IN :pastas
+            ) t
+            GROUP BY file_id ORDER BY score DESC, file_id LIMIT :limite OFFSET :deslocamento
+        """)
+        trechos = text("""
+            SELECT DISTINCT ON (c.file_id) c.file_id,
+                   ts_headline('portuguese', c.text, q, 'StartSel=**, StopSel=**, MaxWords=30, MinWords=12')
+            FROM text_chunk c, to_tsquery('portuguese', :q) q
+            WHERE c.busca @@ q AND c.file_id IN :ids
+            ORDER BY c.file_id, ts_rank(c.busca, q) DESC
+        """)
+    else:
+        parametros['q'] = _consulta_sqlite(termos)
+        # bm25() do FTS5 é negativo: quanto menor, melhor. O CROSS JOIN obriga o SQLite a começar pelo
+        # índice FTS (senão ele pode percorrer a pasta e reavaliar o MATCH para cada linha)
+        ranking = text("""
+            SELECT file_id, MIN(score) AS score FROM (
+                SELECT c.file_id AS file_id, bm25(text_chunk_fts) AS score
+                FROM text_chunk_fts CROSS JOIN text_chunk c ON c.id = text_chunk_fts.rowid
+                WHERE text_chunk_fts MATCH :q AND c.folder_id IN :pastas
+                UNION ALL
+                SELECT f.id, bm25(file_fts) * :peso_nome
+                FROM file_fts CROSS JOIN file f ON f.id = file_fts.rowid
+                WHERE file_fts MATCH :q AND f.folder_id IN :pastas
+            )
+            GROUP BY file_id ORDER BY score, file_id LIMIT :limite OFFSET :deslocamento
+        """)
+        trechos = text("""
+            SELECT c.file_id, snippet(text_chunk_fts, 0, '**', '**', '…', 24)
+            FROM text_chunk_fts CROSS JOIN text_chunk c ON c.id = text_chunk_fts.rowid
+            WHERE text_chunk_fts MATCH :q AND c.file_id IN :ids
+            ORDER BY bm25(text_chunk_fts)
+        """)
+
+    ranking = ranking.bindparams(bindparam('pastas', expanding=True))
+    linhas = db.session.execute(ranking, parametros).all()
+    tem_mais = len(linhas) > por_pagina
+    linhas = linhas[:por_pagina]
+    if not linhas:
+        return [], False
+
+    # Destaques e metadados só para os ficheiros da página
+    ids = [file_id for file_id, _ in linhas]
+    melhores_trechos = {}
+    for file_id, trecho in db.session.execute(trechos.bindparams(bindparam('ids', expanding=True)),
+                                              {'q': parametros['q'], 'ids': ids}):
+        melhores_trechos.setdefault(file_id, trecho)
+
+    ficheiros = {f.id: (f, pasta, materia) for f, pasta, materia in
+                 db.session.query(File, Folder, Subject).join(Folder, Folder.id == File.folder_id)
+                                                      .join(Subject, Subject.id == Folder.subject_id)
+                                                      .filter(File.id.in_(ids))}
+    resultados = []
+    for file_id, score in linhas:
+        if file_id not in ficheiros:
+            continue
+        file_db, pasta, materia = ficheiros[file_id]
+        resultados.append({
+            'file_id': file_id,
+            'original_filename': file_db.original_filename,
+            'folder_id': pasta.id,
+            'folder_name': pasta.name,
+            'subject_name': materia.name,
+            'snippet': melhores_trechos.get(file_id),
+            'score': round(abs(float(score)), 4),
+        })
+    return resultados, tem_mais
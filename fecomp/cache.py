@@ -0,0 +1,213 @@
+import os
+import time
+import json
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from .texto import normalizar
+
+# --- CACHE DE RESPOSTAS DO CHAT GERAL ---
+# As mesmas perguntas ("o que é estequiometria?") chegam o dia inteiro. Guardamos a resposta
+# pela chave (pergunta normalizada + prompt de sistema + modelo) durante CHAT_CACHE_TTL segundos.
+
+
+def normalizar_pergunta(mensagem):
+    """Minúsculas, sem acentos, espaços colapsados e sem pontuação nas pontas."""
+    return ' '.join(normalizar(mensagem).split()).strip(' ?!.,;:')
+
+
+def chave_resposta(mensagem, prompt_sistema, modelo):
+    bruto = json.dumps([normalizar_pergunta(mensagem), prompt_sistema, modelo], ensure_ascii=False)
+    return hashlib.sha256(bruto.encode('utf-8')).hexdigest()
+
+
+class CacheMemoria:
+    """LRU com TTL dentro do processo (cada worker tem o seu)."""
+
+    def __init__(self, max_itens, ttl):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self._itens = OrderedDict() # chave -> (expira_em, valor)
+        self._lock = threading.Lock()
+
+    def obter(self, chave):
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                return None
+            if item[0] <= time.time():
+                del self._itens[chave]
+                return None
+            self._itens.move_to_end(chave)
+            return item[1]
+
+    def guardar(self, chave, valor):
+        with self._lock:
+            self._itens[chave] = (time.time() + self.ttl, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+    def tamanho(self):
+        return len(self._itens)
+
+
+class CacheSQLite:
+    """
+    LRU com TTL num ficheiro SQLite partilhado por todos os workers da máquina.
+    Cada thread abre a sua conexão; o modo WAL deixa leituras e escritas concorrerem.
+    """
+
+    def __init__(self, caminho, max_itens, ttl):
+        self.caminho = caminho
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self._local = threading.local()
+        with self._conexao() as con:
+            con.execute("CREATE TABLE IF NOT EXISTS respostas ("
+                        "chave TEXT PRIMARY KEY, valor TEXT NOT NULL, "
+                        "expira_em REAL NOT NULL, usado_em REAL NOT NULL)")
+            con.execute("CREATE INDEX IF NOT EXISTS ix_respostas_usado_em ON respostas (usado_em)")
+
+    def _conexao(self):
+        con = getattr(self._local, 'con', None)
+        if con is None or getattr(self._local, 'pid', None) != os.getpid():
+            con = sqlite3.connect(self.caminho, timeout=5, isolation_level=None, check_same_thread=False)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con, self._local.pid = con, os.getpid()
+        return con
+
+    def obter(self, chave):
+        agora = time.time()
+        con = self._conexao()
+        linha = con.execute("SELECT valor, expira_em FROM respostas WHERE chave = ?", (chave,)).fetchone()
+        if linha is None:
+            return None
+        if linha[1] <= agora:
+            con.execute("DELETE FROM respostas WHERE chave = ?", (chave,))
+            return None
+        con.execute("UPDATE respostas SET usado_em = ? WHERE chave = ?", (agora, chave))
+        return linha[0]
+
+    def guardar(self, chave, valor):
+        agora = time.time()
+        con = self._conexao()
+        con.execute("INSERT OR REPLACE INTO respostas (chave, valor, expira_em, usado_em) VALUES (?, ?, ?, ?)",
+                    (chave, valor, agora + self.ttl, agora))
+        # Remove os expirados e, se ainda passar do limite, os menos usados recentemente
+        con.execute("DELETE FROM respostas WHERE expira_em <= ?", (agora,))
+        con.execute("DELETE FROM respostas WHERE chave IN ("
+                    "SELECT chave FROM respostas ORDER BY usado_em DESC LIMIT -1 OFFSET ?)", (self.max_itens,))
+
+    def limpar(self):
+        self._conexao().execute("DELETE FROM respostas")
+
+    def tamanho(self):
+        return self._conexao().execute("SELECT COUNT(*) FROM respostas").fetchone()[0]
+
+
+class CacheRespostas:
+    """Escolhe o backend pela config (CHAT_CACHE_BACKEND) e conta acertos e falhas."""
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.acertos = 0
+        self.falhas = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        tipo = app.config['CHAT_CACHE_BACKEND']
+        max_itens = app.config['CHAT_CACHE_MAX_ITEMS']
+        ttl = app.config['CHAT_CACHE_TTL']
+        if tipo == 'sqlite':
+            os.makedirs(app.instance_path, exist_ok=True)
+            caminho = os.path.join(app.instance_path, app.config['CHAT_CACHE_SQLITE_FILE'])
+            self.backend = CacheSQLite(caminho, max_itens, ttl)
+        elif tipo == 'memoria':
+            self.backend = CacheMemoria(max_itens, ttl)
+        else:
+            self.backend = None # Cache desligado
+        app.extensions['cache_respostas'] = self
+
+    def obter(self, chave):
+        if self.backend is None:
+            return None
+        try:
+            valor = self.backend.obter(chave)
+        except sqlite3.Error as e:
+            print(f"Erro ao ler o cache de respostas: {e}")
+            valor = None
+        with self._lock:
+            if valor is None:
+                self.falhas += 1
+            else:
+                self.acertos += 1
+        return valor
+
+    def guardar(self, chave, valor):
+        if self.backend is None or not valor:
+            return
+        try:
+            self.backend.guardar(chave, valor)
+        except sqlite3.Error as e:
+            print(f"Erro ao gravar no cache de respostas: {e}")
+
+    def estatisticas(self):
+        total = self.acertos + self.falhas
+        try:
+            tamanho = self.backend.tamanho() if self.backend is not None else 0
+        except sqlite3.Error:
+            tamanho = None
+        return {
+            "backend": type(self.backend).__name__ if self.backend is not None else None,
+            "acertos": self.acertos,
+            "falhas": self.falhas,
+            "taxa_acerto": round(self.acertos / total, 3) if total else 0.0,
+            "itens": tamanho,
+        }
+
+
+cache_respostas = CacheRespostas()
+
+
+# --- INVALIDAÇÃO APÓS COMMIT ---
+# Caches de páginas (contextos do chat, painel inicial) registam aqui que modelos os afetam.
+# O flush marca a sessão; só o commit chama a limpeza (um rollback não muda nada no banco).
+
+_invalidacoes = {} # nome -> (muda(obj) -> bool, limpar())
+
+
+def invalidar_apos_commit(nome, muda, limpar):
+    """Chama `limpar()` depois de cada commit em que algum objeto novo/alterado/apagado satisfaz `muda(obj)`."""
+    _invalidacoes[nome] = (muda, limpar)
+
+
+@event.listens_for(Session, 'after_flush')
+def _apos_flush(sessao, contexto_flush):
+    objetos = (*sessao.new, *sessao.dirty, *sessao.deleted)
+    if not objetos:
+        return
+    for nome, (muda, _) in _invalidacoes.items():
+        if any(muda(obj) for obj in objetos):
+            sessao.info.setdefault('caches_invalidos', set()).add(nome)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apos_commit(sessao):
+    for nome in sessao.info.pop('caches_invalidos', ()):
+        _invalidacoes[nome][1]()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _apos_rollback(sessao):
+    sessao.info.pop('caches_invalidos', None)
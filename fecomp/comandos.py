@@ -0,0 +1,121 @@
+import os
+import time
+import click
+from flask.cli import AppGroup
+from .models import File, TextChunk
+from .extensions import db
+from .indice import indexar_arquivo
+from . import vetores
+from .busca import criar_indice_busca
+from .armazenamento import caminho_arquivo, deduplicar_legado, fragmentar_pasta
+from .reconciliador import reconciliador
+
+# Comandos de manutenção: `flask --app run vetores <comando>`
+vetores_cli = AppGroup('vetores', help='Índice vetorial do chat contextual.')
+
+
+@vetores_cli.command('reconstruir')
+@click.option('--pasta', type=int, default=None, help='ID de uma pasta (padrão: todas).')
+def reconstruir_vetores(pasta):
+    """Recria os vetores a partir dos trechos já indexados (ex: depois de trocar o provedor)."""
+    folder_ids = [pasta] if pasta else [fid for (fid,) in db.session.query(TextChunk.folder_id).distinct()]
+    inicio = time.perf_counter()
+    total = 0
+    for folder_id in folder_ids:
+        chunks = TextChunk.query.filter_by(folder_id=folder_id).all()
+        vetores.reconstruir_pasta(folder_id, chunks)
+        total += len(chunks)
+        click.echo(f"Pasta {folder_id}: {len(chunks)} trechos")
+    click.echo(f"{total} trechos em {len(folder_ids)} pastas ({time.perf_counter() - inicio:.1f}s)")
+
+
+@vetores_cli.command('benchmark')
+@click.option('--consultas', type=int, default=200, help='Número de buscas a medir.')
+@click.option('--k', type=int, default=8)
+def benchmark_vetores(consultas, k):
+    """Mede a latência da busca usando trechos do próprio índice como perguntas."""
+    amostra = TextChunk.query.order_by(db.func.random()).limit(consultas).all()
+    if not amostra:
+        click.echo("Nenhum trecho indexado.")
+        return
+
+    tempos = []
+    acertos = 0
+    for chunk in amostra:
+        pergunta = ' '.join(chunk.text.split()[:30])
+        inicio = time.perf_counter()
+        resultado = vetores.buscar_vetores(pergunta, [chunk.folder_id], k)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+        acertos += any(chunk_id == chunk.id for chunk_id, _ in resultado)
+
+    tempos.sort()
+    click.echo(f"Provedor: {vetores.obter_embedder().nome} | consultas: {len(tempos)}")
+    click.echo(f"Latência p50: {tempos[len(tempos) // 2]:.2f} ms | "
+               f"p95: {tempos[int(len(tempos) * 0.95) - 1]:.2f} ms | máx: {tempos[-1]:.2f} ms")
+    click.echo(f"Trecho de origem no top-{k}: {acertos / len(tempos):.0%}")
+
+
+indice_cli = AppGroup('indice', help='Índice de busca (RAG) dos ficheiros.')
+
+
+@indice_cli.command('reprocessar')
+@click.option('--falhados', is_flag=True, help="Inclui os ficheiros com estado 'failed'.")
+def reprocessar_indice(falhados):
+    """Indexa os ficheiros que ficaram na fila (ex: o servidor reiniciou antes de processá-los)."""
+    estados = ['pending', 'failed'] if falhados else ['pending']
+    files = File.query.filter(db.or_(File.index_status.in_(estados), File.index_status.is_(None))).all()
+    for file_db in files:
+        file_path = caminho_arquivo(file_db)
+        if os.path.exists(file_path):
+            indexar_arquivo(file_db, file_path)
+        else:
+            file_db.index_status = 'failed'
+        db.session.commit()
+        click.echo(f"{file_db.original_filename}: {file_db.index_status}")
+    click.echo(f"{len(files)} ficheiros processados.")
+
+
+busca_cli = AppGroup('busca', help='Índice de texto completo (/api/search).')
+
+
+@busca_cli.command('reconstruir')
+def reconstruir_busca():
+    """Recria triggers/índices da busca e relê todo o conteúdo (ex: depois de uma migração batch no SQLite)."""
+    inicio = time.perf_counter()
+    with db.engine.begin() as conexao:
+        criar_indice_busca(conexao)
+    click.echo(f"Índice de busca reconstruído ({time.perf_counter() - inicio:.1f}s)")
+
+
+armazenamento_cli = AppGroup('armazenamento', help='Ficheiros enviados (armazenamento por conteúdo).')
+
+
+@armazenamento_cli.command('deduplicar')
+@click.option('--lote', type=int, default=200, help='Nomes lidos do banco por consulta.')
+def deduplicar_armazenamento(lote):
+    """Passa os ficheiros antigos para o armazenamento por hash (pode ser interrompido e retomado)."""
+    inicio = time.perf_counter()
+    resumo = deduplicar_legado(lote)
+    click.echo(f"{resumo['convertidos']} ficheiros convertidos, {resumo['em_falta']} em falta no disco, "
+               f"{resumo['bytes_libertados'] / (1024 * 1024):.1f} MB libertados "
+               f"({time.perf_counter() - inicio:.1f}s)")
+
+
+@armazenamento_cli.command('fragmentar')
+@click.option('--lote', type=int, default=1000, help='Ficheiros movidos entre pausas.')
+@click.option('--pausa', type=float, default=0.0, help='Segundos de espera entre lotes.')
+def fragmentar_armazenamento(lote, pausa):
+    """Move os ficheiros do nível de cima de uploads/ para as subpastas ab/cd/ (com o site no ar, retomável)."""
+    inicio = time.perf_counter()
+    total = fragmentar_pasta(lote, pausa, progresso=lambda movidos: click.echo(f"{movidos} ficheiros movidos..."))
+    click.echo(f"{total} ficheiros movidos ({time.perf_counter() - inicio:.1f}s)")
+
+
+@armazenamento_cli.command('reconciliar')
+@click.option('--so-relatorio', is_flag=True, help='Só conta; não apaga nada.')
+def reconciliar_armazenamento(so_relatorio):
+    """Apaga os conteúdos sem referências e os ficheiros órfãos, e compara o disco com o banco."""
+    relatorio = reconciliador.reconciliar(varrer=True, apagar=not so_relatorio)
+    for chave, valor in relatorio.items():
+        click.echo(f"{chave}: {valor}")
+    click.echo(f"{relatorio['bytes_libertados'] / (1024 * 1024):.1f} MB libertados")
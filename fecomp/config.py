@@ -14,4 +14,75 @@ class Config:
     OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
     YOUTUBE_API_KEY = os.environ.get('YOUTUBE_API_KEY')
     DEBUG = True
-    MAX_CONTENT_LENGTH = 100 * 1024 * 1024
\ No newline at end of file
+    MAX_CONTENT_LENGTH = 100 * 1024 * 1024
+    # Quem envia os bytes de /uploads: 'flask', 'x-sendfile' (Apache) ou 'x-accel' (nginx), ver fecomp/downloads.py
+    FILE_DELIVERY = os.environ.get('FILE_DELIVERY', 'flask')
+    X_ACCEL_PREFIX = '/_uploads/'        # location interno do nginx que aponta para a pasta de uploads
+    # Envio em partes retomável (fecomp/envios.py, /api/uploads)
+    UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024  # Bytes por parte (cada PUT fica bem abaixo de MAX_CONTENT_LENGTH)
+    UPLOAD_MAX_SIZE = 2 * 1024 * 1024 * 1024 # Tamanho máximo de um ficheiro enviado em partes
+    UPLOAD_SESSION_TTL = 24 * 60 * 60    # Segundos até um envio por concluir ser descartado
+    UPLOAD_MAX_OPEN = 10                 # Envios por concluir de cada utilizador ao mesmo tempo
+    # Limpeza do armazenamento em segundo plano (fecomp/reconciliador.py)
+    STORAGE_GC_INTERVAL = 60             # Segundos entre recolhas de ficheiros sem referências (0 = thread desligada)
+    STORAGE_SCAN_INTERVAL = 6 * 60 * 60  # Segundos entre varreduras da pasta à procura de órfãos (0 = nunca)
+    STORAGE_ORPHAN_GRACE = 60 * 60       # Idade mínima (s) de um ficheiro sem linha no banco para ser apagado
+    STORAGE_GC_BATCH = 500               # Blobs apagados por transação
+
+    # Gateway do GPT (fecomp/llm.py)
+    LLM_MODEL = os.environ.get('LLM_MODEL') or 'gpt-3.5-turbo'
+    LLM_TIMEOUT = 60.0       # Segundos por chamada
+    LLM_MAX_RETRIES = 2      # Novas tentativas automáticas (erros de rede, 429, 5xx)
+    LLM_CONTEXT_TOKENS = int(os.environ.get('LLM_CONTEXT_TOKENS') or 16385) # Janela do modelo (gpt-3.5-turbo)
+    LLM_MAX_OUTPUT_TOKENS = 1500 # Reservados para a resposta
+    LLM_SLOW_LOG_MS = 10000  # Respostas do chat mais lentas que isto vão para o stdout (0 = todas)
+
+    # Limites de uso do GPT (fecomp/limites.py), por processo
+    LLM_MAX_CONCURRENT = 8   # Chamadas simultâneas ao provedor
+    LLM_QUEUE_MAX = 50       # Pedidos esperando a vez; acima disso responde 429
+    LLM_QUEUE_TIMEOUT = 30   # Segundos máximos de espera na fila
+    LLM_USER_RATE = 10       # Perguntas por minuto por aluno...
+    LLM_USER_BURST = 5       # ...com esta rajada permitida
+    LLM_GLOBAL_RATE = int(os.environ.get('LLM_GLOBAL_RATE') or 300) # Pedidos por minuto do plano contratado
+    LLM_GLOBAL_BURST = 20
+    LLM_LOG_REFUSALS = False # Uma linha no stdout por pedido recusado; as contagens estão sempre em /api/llm/estatisticas
+
+    # Cache de respostas do chat geral. 'memoria' = por processo, 'sqlite' = partilhado entre workers, '' = desligado
+    CHAT_CACHE_BACKEND = os.environ.get('CHAT_CACHE_BACKEND', 'memoria')
+    CHAT_CACHE_TTL = 24 * 60 * 60          # Segundos até uma resposta expirar
+    CHAT_CACHE_MAX_ITEMS = 2000            # Acima disso, sai a menos usada recentemente
+    CHAT_CACHE_SQLITE_FILE = 'chat_cache.db' # Dentro da pasta instance/
+
+    # Busca de vídeos (fecomp/youtube.py)
+    YOUTUBE_TIMEOUT = 10                 # Segundos por busca
+    YOUTUBE_CACHE_TTL = 6 * 60 * 60      # Resultados de uma busca valem por 6 horas
+    YOUTUBE_CACHE_MAX_ITEMS = 1000
+
+    # Lista de matérias/pastas/turmas do chat (fecomp/contextos.py), limpa a cada mudança nelas
+    USER_CONTEXTS_CACHE_TTL = 5 * 60     # Limite de atraso nos outros workers
+    USER_CONTEXTS_CACHE_MAX_ITEMS = 5000
+
+    # Página inicial (fecomp/painel.py)
+    DASHBOARD_CACHE_TTL = 60             # Segundos; avisos, tarefas e entregas novas limpam antes
+    DASHBOARD_CACHE_MAX_ITEMS = 5000
+    DASHBOARD_FEATURED_LIMIT = 12        # Matérias em destaque mostradas
+
+    # Listas paginadas por cursor (fecomp/paginacao.py)
+    PAGE_SIZE = 50                       # Itens por página (tarefas, entregas, avisos, membros, utilizadores)
+    PAGE_SIZE_FILES = 60                 # Ficheiros por página dentro de uma pasta
+
+    # Índice de busca do chat contextual (RAG)
+    RAG_CHUNK_WORDS = 200    # Tamanho de cada trecho, em palavras
+    RAG_CHUNK_OVERLAP = 40   # Palavras repetidas entre trechos vizinhos
+    RAG_TOP_K = 8            # Trechos enviados à IA por pergunta
+    RAG_CONTEXT_TOKENS = 4000 # Orçamento do CONTEXTO no prompt; os trechos menos relevantes ficam de fora
+    INDEXER_WORKERS = 2      # Threads que indexam os ficheiros depois do upload
+    INDEXER_STALE_AFTER = 10 * 60 # Segundos; um 'pending' mais antigo ficou na fila de um processo que reiniciou
+    EXTRACTION_PROCESSES = min(4, os.cpu_count() or 1) # Processos para extrair pastas inteiras de uma vez
+    EXTRACTION_MAX_CHARS = 2_000_000 # Texto máximo lido por ficheiro (~500 mil tokens); o resto do PDF não é lido
+
+    # Índice vetorial (busca semântica). 'local' = embeddings determinísticos, sem rede
+    EMBEDDING_PROVIDER = os.environ.get('EMBEDDING_PROVIDER') or 'local'
+    EMBEDDING_MODEL = 'text-embedding-3-small'
+    EMBEDDING_DIM = 256
+    VECTOR_STORE_FOLDER = 'vetores' # Dentro da pasta instance/
@@ -0,0 +1,75 @@
+from sqlalchemy import inspect
+from .extensions import db
+from .models import Subject, Folder, Course, User, membership
+from .cache import CacheMemoria, invalidar_apos_commit
+
+# --- CONTEXTOS DO CHAT (/api/user_contexts) ---
+# Matérias, pastas e turmas que o aluno pode escolher no chat, montadas com duas consultas fixas
+# (matérias+pastas num só JOIN, e as turmas) seja qual for o número de matérias.
+# O resultado fica em cache por usuário e é descartado quando um commit mexe em matérias,
+# pastas, turmas ou membros. Cada worker tem o seu cache; nos outros vale o TTL.
+
+
+def _montar_contextos(user_id):
+    turmas = db.select(membership.c.course_id).where(membership.c.user_id == user_id)
+    linhas = db.session.execute(
+        db.select(Subject.id, Subject.name, Course.name, Folder.id, Folder.name)
+        .outerjoin(Course, Course.id == Subject.course_id)
+        .outerjoin(Folder, Folder.subject_id == Subject.id)
+        .where(db.or_(Subject.user_id == user_id, Subject.course_id.in_(turmas)))
+        # Pessoais primeiro (course_id nulo), depois por turma; dentro de cada grupo por nome
+        .order_by(Subject.course_id.is_not(None), Subject.course_id, Subject.name, Subject.id, Folder.id)
+    ).all()
+
+    contexts = []
+    subjects = []
+    ultima_materia = None
+    for subject_id, subject_name, course_name, folder_id, folder_name in linhas:
+        prefixo = f"{course_name}: {subject_name}" if course_name else f"Pessoal: {subject_name}"
+        if subject_id != ultima_materia:
+            subjects.append({'id': subject_id, 'name': prefixo})
+            ultima_materia = subject_id
+        if folder_id is not None:
+            contexts.append({'id': folder_id, 'name': f"{prefixo} / {folder_name}"})
+
+    courses = [{'id': course_id, 'name': nome} for course_id, nome in db.session.execute(
+        db.select(Course.id, Course.name).join(membership, membership.c.course_id == Course.id)
+        .where(membership.c.user_id == user_id).order_by(Course.name))]
+    return {'contexts': contexts, 'subjects': subjects, 'courses': courses}
+
+
+class ContextosUsuario:
+    """Cache por usuário da lista de contextos do chat."""
+
+    def __init__(self, app=None):
+        self.cache = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.cache = CacheMemoria(app.config['USER_CONTEXTS_CACHE_MAX_ITEMS'], app.config['USER_CONTEXTS_CACHE_TTL'])
+        app.extensions['contextos'] = self
+
+    def obter(self, user_id):
+        contextos = self.cache.obter(user_id)
+        if contextos is None:
+            contextos = _montar_contextos(user_id)
+            self.cache.guardar(user_id, contextos)
+        return contextos
+
+    def invalidar(self):
+        if self.cache is not None:
+            self.cache.limpar()
+
+
+contextos = ContextosUsuario()
+
+
+def _muda_contextos(obj):
+    if isinstance(obj, (Subject, Folder, Course)):
+        return True
+    # user.courses.append(...) / remove(...) sem passar pela turma
+    return isinstance(obj, User) and inspect(obj).attrs.courses.history.has_changes()
+
+
+invalidar_apos_commit('contextos', _muda_contextos, contextos.invalidar)
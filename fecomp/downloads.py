@@ -0,0 +1,126 @@
+import os
+import time
+import zipfile
+import mimetypes
+from urllib.parse import quote
+from flask import current_app, request, Response, stream_with_context
+from werkzeug.utils import send_file
+from .armazenamento import caminho_upload, BLOCO
+
+# --- ENTREGA DOS FICHEIROS ENVIADOS (/uploads/...) ---
+# O Flask só autoriza; quem copia os bytes depende de FILE_DELIVERY:
+#   'flask'      -> o próprio worker envia (com ETag, GET condicional e Range/206)
+#   'x-sendfile' -> cabeçalho X-Sendfile com o caminho absoluto (Apache mod_xsendfile, lighttpd)
+#   'x-accel'    -> cabeçalho X-Accel-Redirect para um location interno do nginx, ex:
+#                      location /_uploads/ {
+#                          internal;
+#                          alias /caminho/do/projeto/fecomp/uploads/;
+#                      }
+#                   O nginx trata sozinho ETag, If-None-Match e Range (ele ignora o ETag do Flask).
+# Nos dois modos de proxy o worker fica livre logo após a verificação de permissão.
+
+
+def servir_upload(nome, nome_original, content_hash=None):
+    """
+    Resposta com o ficheiro `nome` da pasta de uploads (ver armazenamento.nome_armazenado), já
+    autorizado. Lança FileNotFoundError se ele não existir no disco. `content_hash` (SHA-256) vira
+    o ETag forte quando conhecido.
+    """
+    caminho = caminho_upload(nome)
+    if not os.path.isfile(caminho):
+        raise FileNotFoundError(caminho)
+
+    modo = current_app.config['FILE_DELIVERY']
+    if modo == 'x-accel':
+        mimetype = mimetypes.guess_type(nome_original)[0] or 'application/octet-stream'
+        resposta = Response(mimetype=mimetype)
+        resposta.headers['X-Accel-Redirect'] = current_app.config['X_ACCEL_PREFIX'].rstrip('/') + '/' + quote(nome)
+        resposta.headers.set('Content-Disposition', 'inline', filename=nome_original)
+    else:
+        # O werkzeug responde 304 a If-None-Match/If-Modified-Since e 206 a Range (conditional=True)
+        resposta = send_file(caminho, request.environ,
+                             download_name=nome_original,
+                             conditional=True,
+                             etag=content_hash or True,
+                             max_age=0,
+                             use_x_sendfile=(modo == 'x-sendfile'))
+    # Conteúdo privado: o navegador guarda, mas revalida (barato com o ETag)
+    resposta.cache_control.private = True
+    resposta.cache_control.no_cache = True
+    return resposta
+
+
+# --- ZIP EM FLUXO (pasta inteira, entregas de uma tarefa) ---
+# O ZIP é montado enquanto é enviado: cada ficheiro é lido em blocos de BLOCO bytes e cada bloco
+# sai logo para o cliente. Sem ficheiro temporário e com memória constante, por isso uma
+# exportação de vários GB começa a descarregar de imediato. Como a saída não permite seek, o
+# zipfile escreve o CRC e os tamanhos depois de cada ficheiro (data descriptor), com ZIP64.
+# Os ficheiros vão sem compressão (ZIP_STORED): PDFs, imagens e .docx já vêm comprimidos.
+
+class _SaidaZip:
+    """Destino do zipfile: guarda o que foi escrito até ser retirado para a resposta."""
+
+    def __init__(self):
+        self._pedacos = []
+
+    def write(self, dados):
+        self._pedacos.append(bytes(dados))
+        return len(dados)
+
+    def flush(self):
+        pass
+
+    def retirar(self):
+        dados = b''.join(self._pedacos)
+        self._pedacos = []
+        return dados
+
+
+def _nome_no_zip(nome, usados):
+    """Nome plano (sem pastas) e único dentro do ZIP: 'a.pdf', 'a (2).pdf', ..."""
+    nome = nome.replace('/', '_').replace('\\', '_').strip() or 'ficheiro'
+    base, extensao = os.path.splitext(nome)
+    candidato, n = nome, 1
+    while candidato.lower() in usados:
+        n += 1
+        candidato = f"{base} ({n}){extensao}"
+    usados.add(candidato.lower())
+    return candidato
+
+
+def _gerar_zip(itens):
+    saida = _SaidaZip()
+    usados = set()
+    with zipfile.ZipFile(saida, mode='w', compression=zipfile.ZIP_STORED, allowZip64=True) as pacote:
+        for nome, caminho in itens:
+            try:
+                origem = open(caminho, 'rb')
+            except FileNotFoundError:
+                print(f"ZIP: ficheiro em falta no disco, ignorado: {caminho}")
+                continue
+            with origem:
+                data = time.localtime(max(os.fstat(origem.fileno()).st_mtime, 315532800))[:6] # >= 1980
+                info = zipfile.ZipInfo(_nome_no_zip(nome, usados), date_time=data)
+                with pacote.open(info, mode='w', force_zip64=True) as destino:
+                    while True:
+                        bloco = origem.read(BLOCO)
+                        if not bloco:
+                            break
+                        destino.write(bloco)
+                        yield saida.retirar()
+            yield saida.retirar() # Data descriptor do ficheiro
+    yield saida.retirar() # Diretório central
+
+
+def servir_zip(itens, nome_zip):
+    """
+    Resposta que envia em fluxo um ZIP com `itens`, pares (nome dentro do ZIP, caminho absoluto),
+    já autorizados. Ficheiros em falta no disco ficam de fora. `itens` pode ser um gerador: é
+    consumido durante o envio, dentro do contexto do pedido.
+    """
+    resposta = Response(stream_with_context(_gerar_zip(itens)), mimetype='application/zip')
+    resposta.headers.set('Content-Disposition', 'attachment', filename=nome_zip)
+    resposta.headers['X-Accel-Buffering'] = 'no' # nginx: repassa cada bloco sem juntar a resposta
+    resposta.cache_control.private = True
+    resposta.cache_control.no_store = True
+    return resposta
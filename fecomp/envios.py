@@ -0,0 +1,257 @@
+import os
+import base64
+import hashlib
+import secrets
+from contextlib import contextmanager, ExitStack
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from .extensions import db
+from .models import File, Blob, UploadSession, UploadChunk
+from .armazenamento import caminho_upload, pasta_uploads, garantir_blob, ligar_no_lugar, nome_unico, BLOCO
+
+# --- ENVIO EM PARTES (RETOMÁVEL) ---
+# Parecido com o tus: o cliente abre um envio com o tamanho total, manda as partes em PUTs
+# independentes (em qualquer ordem, várias ao mesmo tempo) e fecha o envio no fim.
+#   POST   /api/uploads                 -> abre (folder_id, filename, size)
+#   GET    /api/uploads/<id>            -> partes já recebidas (para retomar depois de uma queda)
+#   PUT    /api/uploads/<id>/<parte>    -> corpo = bytes da parte; Upload-Checksum: sha256 <base64>
+#   POST   /api/uploads/complete        -> conclui um ou mais envios num único commit
+#   DELETE /api/uploads/<id>            -> cancela
+# O corpo do PUT é lido direto de request.stream (sem multipart, o Werkzeug não guarda nada) e
+# escrito na posição da parte dentro de um ficheiro parcial já na pasta de uploads. Concluir é
+# só calcular o hash do ficheiro e ligá-lo ao nome do conteúdo (ver armazenamento.py).
+#
+# As partes escrevem com um bloqueio partilhado (flock) no ficheiro parcial e a conclusão com um
+# exclusivo: o parcial só é apagado (e o bloqueio solto) depois do commit, por isso um PUT atrasado
+# encontra o envio já removido e nunca altera o conteúdo ligado ao hash.
+
+try:
+    import fcntl
+except ImportError: # Windows: sem bloqueio entre partes e conclusão
+    fcntl = None
+
+
+class EnvioInvalido(Exception):
+    def __init__(self, mensagem, status=400):
+        super().__init__(mensagem)
+        self.mensagem = mensagem
+        self.status = status
+
+
+def caminho_parcial(upload_id):
+    return caminho_upload(f".parcial-{upload_id}")
+
+
+@contextmanager
+def _parcial_aberto(upload_id, exclusivo=False):
+    caminho = caminho_parcial(upload_id)
+    try:
+        parcial = open(caminho, 'r+b')
+    except FileNotFoundError:
+        raise EnvioInvalido("O envio já não existe no servidor.", 410)
+    with parcial:
+        if fcntl is not None:
+            fcntl.flock(parcial.fileno(), fcntl.LOCK_EX if exclusivo else fcntl.LOCK_SH)
+        # Entre abrir e obter o bloqueio, uma conclusão pode ter renomeado o ficheiro
+        try:
+            mesmo = os.path.samestat(os.fstat(parcial.fileno()), os.stat(caminho))
+        except FileNotFoundError:
+            mesmo = False
+        if not mesmo:
+            raise EnvioInvalido("O envio já não existe no servidor.", 410)
+        yield parcial
+
+
+def total_partes(envio):
+    return -(-envio.size // envio.chunk_size) # Divisão arredondada para cima
+
+
+def tamanho_parte(envio, indice):
+    return min(envio.chunk_size, envio.size - indice * envio.chunk_size)
+
+
+def estado_envio(envio):
+    recebidas = db.session.scalars(
+        db.select(UploadChunk.index).where(UploadChunk.upload_id == envio.id).order_by(UploadChunk.index)).all()
+    return {'id': envio.id, 'filename': envio.original_filename, 'size': envio.size,
+            'chunk_size': envio.chunk_size, 'chunks': total_partes(envio), 'received': recebidas}
+
+
+def criar_envio(user_id, folder_id, original_filename, tamanho):
+    if tamanho < 0 or tamanho > current_app.config['UPLOAD_MAX_SIZE']:
+        raise EnvioInvalido("Tamanho de ficheiro inválido ou acima do limite.", 413 if tamanho > 0 else 400)
+    limpar_envios_expirados()
+    abertos = db.session.scalar(
+        db.select(db.func.count()).select_from(UploadSession).where(UploadSession.user_id == user_id))
+    if abertos >= current_app.config['UPLOAD_MAX_OPEN']:
+        raise EnvioInvalido("Há envios demais por concluir. Conclua ou cancele algum antes de começar outro.", 429)
+
+    envio = UploadSession(id=secrets.token_hex(16), user_id=user_id, folder_id=folder_id,
+                          original_filename=original_filename, size=tamanho,
+                          chunk_size=current_app.config['UPLOAD_CHUNK_SIZE'])
+    os.makedirs(pasta_uploads(), exist_ok=True)
+    # Começa vazio: cada parte é escrita na sua posição (o ficheiro cresce com os PUTs, em qualquer
+    # ordem), assim o disco só é ocupado pelo que chega de facto
+    open(caminho_parcial(envio.id), 'wb').close()
+    db.session.add(envio)
+    db.session.commit()
+    return envio
+
+
+def _checksum_esperado(cabecalho):
+    """Upload-Checksum no formato do tus ("sha256 <base64>"); devolve o hash em hexadecimal."""
+    try:
+        algoritmo, valor = (cabecalho or '').split(' ', 1)
+        if algoritmo.lower() != 'sha256':
+            raise ValueError(algoritmo)
+        digest = base64.b64decode(valor.strip(), validate=True)
+    except ValueError:
+        raise EnvioInvalido("Cabeçalho Upload-Checksum ausente ou inválido (use 'sha256 <base64>').")
+    if len(digest) != 32:
+        raise EnvioInvalido("Cabeçalho Upload-Checksum ausente ou inválido (use 'sha256 <base64>').")
+    return digest.hex()
+
+
+def receber_parte(envio, indice, stream, checksum):
+    """Escreve a parte `indice` lida de `stream` e regista-a se o SHA-256 bater com `checksum`."""
+    if not 0 <= indice < total_partes(envio):
+        raise EnvioInvalido("Número de parte fora do envio.", 416)
+    esperado = _checksum_esperado(checksum)
+    tamanho = tamanho_parte(envio, indice)
+
+    sha256 = hashlib.sha256()
+    recebidos = 0
+    with _parcial_aberto(envio.id) as parcial:
+        parcial.seek(indice * envio.chunk_size)
+        while recebidos < tamanho:
+            bloco = stream.read(min(BLOCO, tamanho - recebidos))
+            if not bloco:
+                break
+            sha256.update(bloco)
+            parcial.write(bloco)
+            recebidos += len(bloco)
+        if recebidos != tamanho or stream.read(1):
+            raise EnvioInvalido(f"A parte {indice} deve ter exatamente {tamanho} bytes.")
+        # Uma parte corrompida fica no disco, mas só conta como recebida depois de reenviada certa
+        if sha256.hexdigest() != esperado:
+            raise EnvioInvalido("O checksum da parte não confere.", 460)
+
+        # Ainda com o bloqueio partilhado (a conclusão espera por ele) e, na mesma transação, a
+        # confirmação de que o envio existe: um cancelamento a meio não deixa partes sem envio
+        try:
+            db.session.merge(UploadChunk(upload_id=envio.id, index=indice, sha256=esperado))
+            db.session.flush()
+            existe = db.session.scalar(db.select(db.exists().where(UploadSession.id == envio.id)))
+        except IntegrityError:
+            existe = False
+        if not existe:
+            db.session.rollback() # Cancelado ou expirado enquanto a parte chegava
+            raise EnvioInvalido("O envio já não existe no servidor.", 410)
+        db.session.commit()
+
+
+def _verificar_conteudo(parcial, envio, esperados):
+    """
+    Lê o ficheiro parcial uma vez: devolve o SHA-256 do todo e as partes cujo conteúdo já não bate
+    com o hash registado (ex: reescritas por um PUT com erro depois de aceites).
+    """
+    total = hashlib.sha256()
+    corrompidas = []
+    parcial.seek(0)
+    for indice in range(total_partes(envio)):
+        sha256 = hashlib.sha256()
+        faltam = tamanho_parte(envio, indice)
+        while faltam > 0:
+            bloco = parcial.read(min(BLOCO, faltam))
+            if not bloco:
+                break
+            sha256.update(bloco)
+            total.update(bloco)
+            faltam -= len(bloco)
+        if faltam or sha256.hexdigest() != esperados.get(indice):
+            corrompidas.append(indice)
+    return total.hexdigest(), corrompidas
+
+
+def concluir_envios(envios):
+    """
+    Transforma envios completos em File (um por envio), com um só commit para todos os ficheiros e a
+    remoção dos envios. O conteúdo é ligado ao nome do hash antes do commit (um processo que morra
+    logo depois não deixa linhas sem ficheiro) e os parciais só saem depois dele; se o commit falhar,
+    os envios continuam abertos e podem ser concluídos de novo. Lança EnvioInvalido (409) se faltar
+    alguma parte; as que estiverem corrompidas deixam de contar como recebidas.
+    """
+    with ExitStack() as bloqueios:
+        verificados = []
+        for envio in envios:
+            esperados = dict(db.session.execute(
+                db.select(UploadChunk.index, UploadChunk.sha256).where(UploadChunk.upload_id == envio.id)).all())
+            if len(esperados) != total_partes(envio):
+                raise EnvioInvalido(f"Faltam partes de '{envio.original_filename}'.", 409)
+            parcial = bloqueios.enter_context(_parcial_aberto(envio.id, exclusivo=True))
+            conteudo_hash, corrompidas = _verificar_conteudo(parcial, envio, esperados)
+            if corrompidas:
+                db.session.execute(db.delete(UploadChunk).where(UploadChunk.upload_id == envio.id,
+                                                                UploadChunk.index.in_(corrompidas)))
+                db.session.commit()
+                raise EnvioInvalido(f"Reenvie as partes {corrompidas} de '{envio.original_filename}'.", 409)
+            verificados.append((envio, conteudo_hash))
+
+        novos = []
+        parciais = []
+        criados = [] # (hash, caminho) das ligações feitas por este pedido
+        for envio, conteudo_hash in verificados:
+            # Ainda com o bloqueio exclusivo: nenhum PUT atrasado altera o conteúdo depois de verificado
+            parciais.append(caminho_parcial(envio.id))
+            db.session.execute(db.delete(UploadChunk).where(UploadChunk.upload_id == envio.id))
+            db.session.delete(envio)
+            garantir_blob(conteudo_hash, envio.size)
+            criado = ligar_no_lugar(parciais[-1], conteudo_hash)
+            if criado:
+                criados.append((conteudo_hash, criado))
+            novo = File(filename=nome_unico(f"user_{envio.user_id}_folder_{envio.folder_id}", envio.original_filename),
+                        original_filename=envio.original_filename, folder_id=envio.folder_id,
+                        blob_hash=conteudo_hash, content_hash=conteudo_hash)
+            db.session.add(novo)
+            novos.append(novo)
+        try:
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            # As ligações só saem se nenhum Blob (ex: um upload igual confirmado entretanto) as usar
+            for conteudo_hash, criado in criados:
+                if db.session.get(Blob, conteudo_hash) is None and os.path.exists(criado):
+                    os.remove(criado)
+            raise
+
+        for parcial in parciais:
+            if os.path.exists(parcial):
+                os.remove(parcial)
+    return novos
+
+
+def cancelar_envio(envio):
+    caminho = caminho_parcial(envio.id)
+    # As partes à mão: o SQLite não aplica o ON DELETE CASCADE (passive_deletes em UploadSession.chunks)
+    db.session.execute(db.delete(UploadChunk).where(UploadChunk.upload_id == envio.id))
+    db.session.delete(envio)
+    db.session.commit()
+    if os.path.exists(caminho):
+        os.remove(caminho)
+
+
+def limpar_envios_expirados():
+    """Descarta os envios abertos há mais de UPLOAD_SESSION_TTL segundos (e os seus ficheiros parciais)."""
+    limite = datetime.utcnow() - timedelta(seconds=current_app.config['UPLOAD_SESSION_TTL'])
+    expirados = db.session.scalars(db.select(UploadSession.id).where(UploadSession.created_at < limite)).all()
+    if not expirados:
+        return 0
+    db.session.execute(db.delete(UploadChunk).where(UploadChunk.upload_id.in_(expirados)))
+    db.session.execute(db.delete(UploadSession).where(UploadSession.id.in_(expirados)))
+    db.session.commit()
+    for upload_id in expirados:
+        caminho = caminho_parcial(upload_id)
+        if os.path.exists(caminho):
+            os.remove(caminho)
+    return len(expirados)
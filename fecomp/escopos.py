@@ -0,0 +1,45 @@
+from .extensions import db
+from .models import User, Folder, File, Subject, Course, Submission, membership
+
+# --- ESCOPOS DE BUSCA DO CHAT CONTEXTUAL ---
+# Uma pergunta pode ser sobre uma pasta, uma matéria, uma turma inteira ou tudo o que o aluno vê.
+# As regras de leitura viram condições SQL, para o índice só enxergar o que o usuário pode ler.
+# As pastas de entrega ("Entrega - <aluno>", ver visoes.submit_task) ficam numa matéria da turma,
+# mas só o próprio aluno, professores e admins as consultam pelo chat e pela busca.
+
+ESCOPOS = ('folder', 'subject', 'course', 'all')
+
+
+def materias_legiveis(user_id):
+    """
+    Condição sobre Subject com as matérias que o usuário pode ler: as pessoais, as das turmas de que
+    é membro e as das turmas que administra (a mesma regra de permissoes.can_view).
+    """
+    turmas_membro = db.select(membership.c.course_id).where(membership.c.user_id == user_id)
+    turmas_admin = db.select(Course.id).where(Course.admin_id == user_id)
+    return db.or_(Subject.user_id == user_id,
+                  Subject.course_id.in_(turmas_membro),
+                  Subject.course_id.in_(turmas_admin))
+
+
+def sem_entregas_alheias(user_id):
+    """Condição sobre Folder: fora as pastas com entregas de outros alunos, exceto para professores e admins."""
+    privilegiado = db.select(User.id).where(User.id == user_id, User.role.in_(('professor', 'admin'))).exists()
+    entregas_alheias = db.select(File.folder_id).join(Submission, Submission.file_id == File.id) \
+                                                .where(Submission.student_id != user_id)
+    return db.or_(privilegiado, Folder.id.not_in(entregas_alheias))
+
+
+def pastas_do_escopo(user_id, escopo, escopo_id=None):
+    """SELECT dos ids das pastas do escopo que o usuário pode ler (para usar como subconsulta)."""
+    consulta = db.select(Folder.id).join(Subject, Subject.id == Folder.subject_id) \
+                                   .where(materias_legiveis(user_id), sem_entregas_alheias(user_id))
+    if escopo == 'folder':
+        consulta = consulta.where(Folder.id == escopo_id)
+    elif escopo == 'subject':
+        consulta = consulta.where(Subject.id == escopo_id)
+    elif escopo == 'course':
+        consulta = consulta.where(Subject.course_id == escopo_id)
+    elif escopo != 'all':
+        raise ValueError(f"Escopo desconhecido: {escopo}")
+    return consulta
@@ -0,0 +1,207 @@
+import os
+import mmap
+import hashlib
+import threading
+from contextlib import contextmanager
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import PyPDF2
+import docx
+from flask import current_app
+from .models import File, ExtractedText
+from .extensions import db
+
+# Tipos de ficheiro que a IA consegue ler
+EXTENSOES_TEXTO = ('.pdf', '.docx', '.txt')
+
+
+def calcular_hash_arquivo(file_path, block_size=1024 * 1024):
+    """Calcula o SHA-256 do ficheiro lendo em blocos (não carrega tudo na memória)."""
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for bloco in iter(lambda: f.read(block_size), b''):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+@contextmanager
+def _abrir_pdf(file_path):
+    """PdfReader sobre o ficheiro mapeado em memória: as páginas são lidas sob demanda, sem cópia do PDF inteiro."""
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError("PDF vazio")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+            yield PyPDF2.PdfReader(mapa)
+
+
+def _pedacos_texto(file_path, original_filename, reader=None):
+    """Gera o texto do ficheiro aos pedaços: uma página de PDF, um parágrafo de .docx ou um bloco de .txt."""
+    nome = original_filename.lower()
+    if nome.endswith('.pdf'):
+        for page in reader.pages:
+            yield (page.extract_text() or "") + "\n"
+    elif nome.endswith('.docx'):
+        doc = docx.Document(file_path)
+        for para in doc.paragraphs:
+            yield para.text + "\n"
+    elif nome.endswith('.txt'):
+        with open(file_path, 'r', encoding='utf-8') as f:
+            yield from iter(lambda: f.read(64 * 1024), '')
+
+
+def _juntar_ate(pedacos, limite):
+    """Junta os pedaços (sem += repetido) até `limite` caracteres. Retorna (texto, truncado)."""
+    partes = []
+    tamanho = 0
+    for pedaco in pedacos:
+        if limite is not None and tamanho + len(pedaco) > limite:
+            partes.append(pedaco[:limite - tamanho])
+            return ''.join(partes), True
+        partes.append(pedaco)
+        tamanho += len(pedaco)
+    return ''.join(partes), False
+
+
+def _extrair_texto(file_path, original_filename, limite=None):
+    """
+    Retorna (texto, paginas, truncado). A leitura para quando o texto chega a `limite` caracteres,
+    então um PDF de 100 MB não precisa ser lido inteiro. `paginas` é o total de páginas do PDF
+    (None para os outros formatos), mesmo quando nem todas foram lidas.
+    """
+    if original_filename.lower().endswith('.pdf'):
+        with _abrir_pdf(file_path) as reader:
+            texto, truncado = _juntar_ate(_pedacos_texto(file_path, original_filename, reader), limite)
+            return texto, len(reader.pages), truncado
+    texto, truncado = _juntar_ate(_pedacos_texto(file_path, original_filename), limite)
+    return texto, None, truncado
+
+
+# --- CACHE DE TEXTO EXTRAÍDO ---
+def obter_texto_arquivo(file_db, file_path):
+    """
+    Retorna o texto de um File, reaproveitando a extração já feita (None se a leitura falhar).
+    O texto fica guardado em ExtractedText pelo hash do conteúdo; quem chama faz o commit.
+    """
+    if not file_db.original_filename.lower().endswith(EXTENSOES_TEXTO):
+        return ""
+
+    if not file_db.content_hash:
+        file_db.content_hash = calcular_hash_arquivo(file_path)
+
+    cached = ExtractedText.query.get(file_db.content_hash)
+    if cached:
+        return cached.text
+
+    try:
+        text, paginas, truncado = _extrair_texto(file_path, file_db.original_filename,
+                                                 current_app.config['EXTRACTION_MAX_CHARS'])
+    except Exception as e:
+        # Erros não vão para o cache, assim a próxima conversa tenta de novo
+        print(f"Erro ao extrair texto do arquivo {file_db.original_filename}: {e}")
+        return None
+
+    _guardar_extracao(file_db.content_hash, file_db.original_filename, text, paginas, truncado)
+    return text
+
+
+def _guardar_extracao(content_hash, original_filename, text, paginas, truncado):
+    if truncado:
+        print(f"Texto de {original_filename} cortado em {len(text)} caracteres ({paginas or '?'} páginas no total)")
+    valores = dict(content_hash=content_hash, text=text, page_count=paginas, truncated=truncado)
+    # Dois workers (ou um pedido e o indexador) podem extrair o mesmo conteúdo ao mesmo tempo:
+    # quem chega depois encontra a linha já gravada e não faz nada, em vez de falhar no commit
+    dialeto = db.session.get_bind().dialect.name
+    if dialeto == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialeto == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        if db.session.get(ExtractedText, content_hash) is None:
+            db.session.add(ExtractedText(**valores))
+        return
+    db.session.execute(insert(ExtractedText).values(**valores)
+                       .on_conflict_do_nothing(index_elements=['content_hash']))
+
+
+# --- EXTRAÇÃO EM PARALELO (PASTAS "FRIAS") ---
+# O PyPDF2 é Python puro e preso ao GIL: threads não ajudam, processos sim.
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _obter_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # 'spawn' evita copiar as threads e conexões do servidor para os processos filhos
+            _pool = ProcessPoolExecutor(max_workers=current_app.config['EXTRACTION_PROCESSES'],
+                                        mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _extrair_em_processo(file_path, original_filename, limite):
+    try:
+        return _extrair_texto(file_path, original_filename, limite), None
+    except Exception as e:
+        return None, str(e)
+
+
+def obter_textos_arquivos(itens):
+    """
+    Versão em lote de obter_texto_arquivo: recebe [(file_db, file_path)] e devolve os textos na
+    mesma ordem. Os ficheiros fora do cache são extraídos ao mesmo tempo num pool de processos.
+    """
+    textos = [None] * len(itens)
+    faltando = {} # hash -> (file_path, original_filename, [posições na lista])
+    for posicao, (file_db, file_path) in enumerate(itens):
+        if not file_db.original_filename.lower().endswith(EXTENSOES_TEXTO):
+            textos[posicao] = ""
+            continue
+        if not file_db.content_hash:
+            file_db.content_hash = calcular_hash_arquivo(file_path)
+        cached = ExtractedText.query.get(file_db.content_hash)
+        if cached:
+            textos[posicao] = cached.text
+        elif file_db.content_hash in faltando:
+            faltando[file_db.content_hash][2].append(posicao) # Mesmo conteúdo: extrai uma vez só
+        else:
+            faltando[file_db.content_hash] = (file_path, file_db.original_filename, [posicao])
+
+    limite = current_app.config['EXTRACTION_MAX_CHARS']
+    if len(faltando) == 1:
+        (file_path, original_filename, _), = faltando.values()
+        resultados = [_extrair_em_processo(file_path, original_filename, limite)]
+    elif faltando:
+        pool = _obter_pool()
+        futures = [pool.submit(_extrair_em_processo, file_path, original_filename, limite)
+                   for file_path, original_filename, _ in faltando.values()]
+        resultados = [future.result() for future in futures]
+    else:
+        resultados = []
+
+    for (content_hash, (_, original_filename, posicoes)), (extraido, erro) in zip(faltando.items(), resultados):
+        if erro is not None:
+            print(f"Erro ao extrair texto do arquivo {original_filename}: {erro}")
+            continue
+        text, paginas, truncado = extraido
+        _guardar_extracao(content_hash, original_filename, text, paginas, truncado)
+        for posicao in posicoes:
+            textos[posicao] = text
+    return textos
+
+
+def descartar_textos(content_hashes=None):
+    """
+    Apaga os textos em cache que já nenhum File usa: os de `content_hashes`, ou todos (reconciliador).
+    Chamar depois do flush das exclusões, para que os File apagados na mesma transação (ex: vários
+    ficheiros iguais na pasta excluída) já não contem. Devolve quantos foram apagados.
+    """
+    condicao = ~db.exists().where(File.content_hash == ExtractedText.content_hash)
+    if content_hashes is not None:
+        content_hashes = [h for h in content_hashes if h]
+        if not content_hashes:
+            return 0
+        condicao = db.and_(ExtractedText.content_hash.in_(content_hashes), condicao)
+    return db.session.execute(db.delete(ExtractedText).where(condicao)
+                              .execution_options(synchronize_session=False)).rowcount
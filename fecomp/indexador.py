@@ -0,0 +1,56 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from .models import File
+from .extensions import db
+from .indice import indexar_arquivo
+from .armazenamento import caminho_arquivo
+
+
+class Indexador:
+    """
+    Fila de indexação em segundo plano: extrai, divide e indexa cada ficheiro logo depois do upload.
+    O estado fica em File.index_status: 'pending' -> 'ready' ou 'failed'.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.executor = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.executor = ThreadPoolExecutor(max_workers=app.config['INDEXER_WORKERS'],
+                                           thread_name_prefix='indexador')
+        app.extensions['indexador'] = self
+
+    def enfileirar(self, file_ids):
+        """Chamar depois do commit que criou os ficheiros (a thread lê as linhas do banco)."""
+        for file_id in file_ids:
+            self.executor.submit(self._processar, file_id)
+
+    def _processar(self, file_id):
+        with self.app.app_context():
+            try:
+                file_db = File.query.get(file_id)
+                if not file_db:
+                    return # Apagado antes de chegar a vez dele
+                file_path = caminho_arquivo(file_db)
+                if os.path.exists(file_path):
+                    indexar_arquivo(file_db, file_path)
+                else:
+                    file_db.index_status = 'failed'
+                db.session.commit()
+            except Exception as e:
+                print(f"Erro ao indexar o arquivo {file_id} em segundo plano: {e}")
+                db.session.rollback()
+                try:
+                    File.query.filter_by(id=file_id).update({'index_status': 'failed'})
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+            finally:
+                db.session.remove()
+
+
+indexador = Indexador()
@@ -0,0 +1,300 @@
+import os
+import math
+import heapq
+from collections import Counter
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import func, event
+from sqlalchemy.orm import Session
+from .models import TextChunk, ChunkTerm, Folder, Subject
+from .extensions import db
+from .extracao import obter_texto_arquivo, obter_textos_arquivos
+from .armazenamento import caminho_arquivo
+from .texto import tokenizar, dividir_em_trechos
+from . import vetores
+
+# Parâmetros padrão do BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Constante da fusão de rankings (Reciprocal Rank Fusion)
+RRF_K = 60
+
+
+# --- ATUALIZAÇÃO DO ÍNDICE ---
+# Os vetores (vetores.py) ficam em ficheiros fora do banco e referem os ids dos trechos: só são
+# alterados depois do commit dos trechos, para um rollback não deixar no disco vetores de trechos que
+# não existem (ou que perderam as suas linhas). Até lá as alterações esperam em session.info.
+
+def _depois_do_commit(descricao, funcao):
+    db.session.info.setdefault('vetores_pendentes', []).append((descricao, funcao))
+
+
+@event.listens_for(Session, 'after_commit')
+def _gravar_vetores(sessao):
+    for descricao, funcao in sessao.info.pop('vetores_pendentes', ()):
+        try:
+            funcao()
+        except Exception as e:
+            print(f"Erro ao atualizar os vetores ({descricao}): {e}")
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_vetores(sessao):
+    sessao.info.pop('vetores_pendentes', None)
+
+
+def _remover_trechos_arquivo(file_id):
+    chunk_ids = db.session.query(TextChunk.id).filter(TextChunk.file_id == file_id)
+    ChunkTerm.query.filter(ChunkTerm.chunk_id.in_(chunk_ids)).delete(synchronize_session=False)
+    TextChunk.query.filter_by(file_id=file_id).delete(synchronize_session=False)
+
+
+def remover_arquivo_do_indice(file_db):
+    _remover_trechos_arquivo(file_db.id)
+    folder_id, file_id = file_db.folder_id, file_db.id
+    _depois_do_commit(f"arquivo {file_id}", lambda: vetores.remover_vetores_arquivo(folder_id, file_id))
+
+
+def remover_pasta_do_indice(folder_id):
+    chunk_ids = db.session.query(TextChunk.id).filter(TextChunk.folder_id == folder_id)
+    ChunkTerm.query.filter(ChunkTerm.chunk_id.in_(chunk_ids)).delete(synchronize_session=False)
+    TextChunk.query.filter_by(folder_id=folder_id).delete(synchronize_session=False)
+    _depois_do_commit(f"pasta {folder_id}", lambda: vetores.remover_vetores_pasta(folder_id))
+
+
+def pastas_do_utilizador(user_id):
+    """Ids das pastas das matérias pessoais de um utilizador (para limpar o índice antes de o excluir)."""
+    return db.session.scalars(
+        db.select(Folder.id).join(Subject, Subject.id == Folder.subject_id).where(Subject.user_id == user_id)).all()
+
+
+def indexar_arquivo(file_db, file_path, texto=None):
+    """
+    (Re)indexa um ficheiro: extrai o texto (com cache), divide em trechos e grava o índice invertido.
+    O texto pode vir já extraído (ver indexar_pendentes). Retorna False se a leitura falhar.
+    Quem chama faz o commit; os vetores só são gravados depois dele.
+    """
+    if texto is None:
+        texto = obter_texto_arquivo(file_db, file_path)
+    if texto is None:
+        file_db.index_status = 'failed'
+        return False
+
+    _remover_trechos_arquivo(file_db.id)
+
+    trechos = dividir_em_trechos(texto,
+                                 current_app.config['RAG_CHUNK_WORDS'],
+                                 current_app.config['RAG_CHUNK_OVERLAP'])
+    chunks = []
+    for posicao, trecho in enumerate(trechos):
+        termos = Counter(tokenizar(trecho))
+        chunk = TextChunk(file_id=file_db.id, folder_id=file_db.folder_id, position=posicao,
+                          text=trecho, token_count=sum(termos.values()))
+        chunks.append((chunk, termos))
+    db.session.add_all([chunk for chunk, _ in chunks])
+    db.session.flush() # Gera os ids dos trechos
+
+    linhas = [{'chunk_id': chunk.id, 'term': termo, 'tf': tf}
+              for chunk, termos in chunks for termo, tf in termos.items()]
+    if linhas:
+        db.session.execute(ChunkTerm.__table__.insert(), linhas)
+
+    # Índice semântico: uma falha do provedor de embeddings não impede a busca lexical
+    folder_id, file_id, nome = file_db.folder_id, file_db.id, file_db.original_filename
+    chunk_ids, textos = [chunk.id for chunk, _ in chunks], [chunk.text for chunk, _ in chunks]
+
+    def gravar_vetores():
+        try:
+            vetores.adicionar_vetores(folder_id, file_id, chunk_ids, textos)
+        except Exception as e:
+            print(f"Erro ao gerar embeddings do arquivo {nome}: {e}")
+            # Sem os vetores antigos (de trechos que já não existem): garantir_vetores_pasta refaz a pasta
+            vetores.remover_vetores_arquivo(folder_id, file_id)
+
+    _depois_do_commit(f"arquivo {nome}", gravar_vetores)
+
+    file_db.indexed_at = datetime.utcnow()
+    file_db.index_status = 'ready'
+    return True
+
+
+def indexar_pendentes(files):
+    """Indexa os ficheiros que ainda não estão no índice (ex: enviados antes do índice existir)."""
+    itens = []
+    for file_db in files:
+        if file_db.indexed_at:
+            continue
+        file_path = caminho_arquivo(file_db)
+        if os.path.exists(file_path):
+            itens.append((file_db, file_path))
+
+    # A extração (parte cara) roda em paralelo; a gravação do índice continua na ordem da pasta
+    textos = obter_textos_arquivos(itens)
+    for (file_db, file_path), texto in zip(itens, textos):
+        if texto is None:
+            file_db.index_status = 'failed'
+        else:
+            indexar_arquivo(file_db, file_path, texto)
+
+
+def garantir_vetores_pasta(folder_id):
+    """
+    Recria o índice vetorial de uma pasta que só tem o índice lexical (ex: troca de provedor) ou a
+    quem faltam os vetores de algum ficheiro (ex: o provedor de embeddings falhou na indexação).
+    """
+    com_trechos = set(db.session.scalars(
+        db.select(TextChunk.file_id).where(TextChunk.folder_id == folder_id).distinct()))
+    indexados = vetores.arquivos_indexados(folder_id)
+    if not com_trechos or (indexados is not None and com_trechos <= indexados):
+        return
+    chunks = TextChunk.query.filter_by(folder_id=folder_id).all()
+    if chunks:
+        try:
+            vetores.reconstruir_pasta(folder_id, chunks)
+        except Exception as e:
+            print(f"Erro ao gerar embeddings da pasta {folder_id}: {e}")
+
+
+# --- BUSCA (BM25) ---
+
+def buscar_trechos(pergunta, filtro, k=8):
+    """
+    Retorna os k trechos mais relevantes para a pergunta, entre os trechos que passam no filtro
+    (uma condição SQLAlchemy sobre TextChunk, ex: TextChunk.folder_id == 3).
+    O filtro é aplicado dentro das consultas, então o BM25 só vê trechos do escopo.
+    """
+    termos = set(tokenizar(pergunta))
+    if not termos:
+        return []
+
+    total, media = db.session.query(func.count(TextChunk.id), func.avg(TextChunk.token_count)) \
+                             .filter(filtro).one()
+    if not total:
+        return []
+    media = float(media or 1) or 1.0
+
+    base = db.session.query(ChunkTerm).join(TextChunk, TextChunk.id == ChunkTerm.chunk_id) \
+                     .filter(filtro, ChunkTerm.term.in_(termos))
+
+    df = dict(base.with_entities(ChunkTerm.term, func.count(ChunkTerm.chunk_id))
+                  .group_by(ChunkTerm.term).all())
+    idf = {t: math.log(1 + (total - n + 0.5) / (n + 0.5)) for t, n in df.items()}
+
+    scores = Counter()
+    for chunk_id, termo, tf, tamanho in base.with_entities(ChunkTerm.chunk_id, ChunkTerm.term,
+                                                           ChunkTerm.tf, TextChunk.token_count):
+        norma = BM25_K1 * (1 - BM25_B + BM25_B * tamanho / media)
+        scores[chunk_id] += idf[termo] * tf * (BM25_K1 + 1) / (tf + norma)
+
+    melhores = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+    if not melhores:
+        return []
+
+    chunks = {c.id: c for c in TextChunk.query.filter(TextChunk.id.in_([cid for cid, _ in melhores])).all()}
+    return [chunks[cid] for cid, _ in melhores if cid in chunks]
+
+
+def primeiros_trechos(filtro, k=8):
+    """Usado quando a pergunta não casa com nenhum termo (ex: "resuma a pasta")."""
+    return TextChunk.query.filter(filtro) \
+                          .order_by(TextChunk.position, TextChunk.file_id).limit(k).all()
+
+
+def fundir_rankings(rankings, k):
+    """Reciprocal Rank Fusion: junta listas de ids ordenadas sem precisar comparar as pontuações."""
+    pontos = Counter()
+    for ranking in rankings:
+        for posicao, chunk_id in enumerate(ranking):
+            pontos[chunk_id] += 1.0 / (RRF_K + posicao + 1)
+    return [chunk_id for chunk_id, _ in pontos.most_common(k)]
+
+
+def recuperar_trechos(pergunta, pastas, k=8):
+    """
+    Busca híbrida: BM25 (termos exatos) + vetores (significado), fundidas por RRF.
+    `pastas` é o SELECT dos ids das pastas do escopo (ver escopos.py): entra como subconsulta
+    no BM25, então a permissão é aplicada pelo próprio banco.
+    Se nada casar, devolve o começo dos documentos.
+    """
+    filtro = TextChunk.folder_id.in_(pastas)
+    folder_ids = db.session.scalars(pastas).all()
+    lexicais = [c.id for c in buscar_trechos(pergunta, filtro, k)]
+    try:
+        semanticos = [chunk_id for chunk_id, _ in vetores.buscar_vetores(pergunta, folder_ids, k)]
+    except Exception as e:
+        print(f"Erro na busca vetorial: {e}")
+        semanticos = []
+
+    ids = fundir_rankings([lexicais, semanticos], k)
+    if not ids:
+        return primeiros_trechos(filtro, k)
+    chunks = {c.id: c for c in TextChunk.query.filter(TextChunk.id.in_(ids), filtro).all()}
+    return [chunks[chunk_id] for chunk_id in ids if chunk_id in chunks]
+
+
+# --- EMPACOTAMENTO DO CONTEXTO (ORÇAMENTO DE TOKENS) ---
+
+MIN_TOKENS_TRECHO = 50 # Abaixo disso não vale a pena mandar um pedaço de trecho
+
+
+def _cortar_texto(texto, orcamento, contar):
+    """Maior prefixo (em palavras) de `texto` com até `orcamento` tokens."""
+    palavras = texto.split()
+    fim = max(1, int(len(palavras) * orcamento / max(contar(texto), 1)))
+    while fim > 0 and contar(' '.join(palavras[:fim]) + ' [...]') > orcamento:
+        fim = int(fim * 0.9)
+    return ' '.join(palavras[:fim]) + ' [...]' if fim else ''
+
+
+def empacotar_contexto(trechos, orcamento, contar):
+    """
+    Preenche `orcamento` tokens com os trechos na ordem de relevância recebida (o primeiro é o melhor).
+    O trecho que não cabe inteiro é cortado, os seguintes ficam de fora.
+    Retorna (contexto, relatorio) com o que foi incluído, cortado e descartado.
+    """
+    escolhidos = {} # file_id -> [(chunk, texto)]
+    usados = 0
+    truncados = 0
+    for chunk in trechos:
+        nome = chunk.file.original_filename
+        custo_documento = 0 if chunk.file_id in escolhidos else \
+            contar(f"--- Início do Documento: {nome} ---\n--- Fim do Documento: {nome} ---\n\n")
+        prefixo = f"[Trecho {chunk.position + 1}] "
+        restante = orcamento - usados - custo_documento - contar(prefixo)
+        if restante < MIN_TOKENS_TRECHO:
+            break
+
+        texto = chunk.text
+        custo = contar(texto)
+        if custo > restante:
+            texto = _cortar_texto(texto, restante, contar)
+            if not texto:
+                break
+            custo = contar(texto)
+            truncados += 1
+        escolhidos.setdefault(chunk.file_id, []).append((chunk, texto))
+        usados += custo_documento + contar(prefixo) + custo
+        if truncados:
+            break # O orçamento acabou neste trecho
+
+    partes = []
+    for itens in escolhidos.values():
+        nome = itens[0][0].file.original_filename
+        partes.append(f"--- Início do Documento: {nome} ---\n")
+        for chunk, texto in sorted(itens, key=lambda item: item[0].position):
+            partes.append(f"[Trecho {chunk.position + 1}] {texto}\n")
+        partes.append(f"--- Fim do Documento: {nome} ---\n\n")
+    contexto = ''.join(partes)
+
+    incluidos = sum(len(itens) for itens in escolhidos.values())
+    relatorio = {
+        "tokens": contar(contexto),
+        "orcamento": orcamento,
+        "documentos": len(escolhidos),
+        "documentos_descartados": len({c.file_id for c in trechos} - set(escolhidos)),
+        "trechos": incluidos,
+        "trechos_truncados": truncados,
+        "trechos_descartados": len(trechos) - incluidos,
+    }
+    return contexto, relatorio
@@ -0,0 +1,178 @@
+import time
+import threading
+from collections import OrderedDict, deque
+
+# --- LIMITES DE USO DO GPT ---
+# 1. Balde de tokens por aluno: quem dispara perguntas sem parar recebe 429 sem gastar a cota da escola.
+#    É conferido à entrada de cada pedido (verificar_usuario).
+# 2. Balde global: o ritmo do plano contratado no provedor. Quando esvazia, os pedidos esperam na fila.
+# 3. Fila justa e limitada: no máximo LLM_MAX_CONCURRENT chamadas ao mesmo tempo, e a vez roda entre
+#    os alunos (um aluno com 5 pedidos na fila não passa à frente de 5 alunos com 1 pedido cada).
+# 2 e 3 (entrar) só valem para as chamadas que vão mesmo ao provedor: os pedidos idênticos que se
+# juntam a uma chamada em curso (voo_unico.py) não gastam o balde global nem ocupam vaga.
+
+
+class LimiteExcedido(Exception):
+    def __init__(self, motivo, mensagem, retry_after):
+        super().__init__(mensagem)
+        self.motivo = motivo
+        self.mensagem = mensagem
+        self.retry_after = retry_after
+
+
+class BaldeTokens:
+    def __init__(self, por_minuto, capacidade):
+        self.taxa = por_minuto / 60.0
+        self.capacidade = capacidade
+        self._tokens = float(capacidade)
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _repor(self, agora):
+        self._tokens = min(self.capacidade, self._tokens + (agora - self._ultimo) * self.taxa)
+        self._ultimo = agora
+
+    def retirar(self):
+        """Retira um token. Retorna 0 se conseguiu, ou os segundos até haver um disponível."""
+        with self._lock:
+            self._repor(time.monotonic())
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.taxa
+
+    def esvaziar(self, segundos):
+        """Depois de um 429 do provedor: nada sai do balde durante `segundos`."""
+        with self._lock:
+            self._repor(time.monotonic())
+            self._tokens = min(self._tokens, -segundos * self.taxa)
+
+
+class Vaga:
+    """Vaga de chamada ao GPT; liberar() pode ser chamado mais de uma vez."""
+
+    def __init__(self, limitador):
+        self._limitador = limitador
+        self._liberada = False
+
+    def liberar(self):
+        if not self._liberada:
+            self._liberada = True
+            self._limitador._sair()
+
+
+class LimitadorLLM:
+    def __init__(self, app=None):
+        self._cond = threading.Condition()
+        self._filas = OrderedDict() # user_id -> deque de bilhetes, na ordem em que os alunos serão atendidos
+        self._baldes_usuarios = {}
+        self._ativos = 0
+        self._na_fila = 0
+        self._esperas = deque(maxlen=1000) # Últimos tempos de espera (s), para os percentis
+        self._contadores = {'atendidos': 0, 'limite_usuario': 0, 'fila_cheia': 0, 'tempo_esgotado': 0,
+                            'rate_limit_provedor': 0}
+        self._fila_maxima_vista = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        self.vagas = config['LLM_MAX_CONCURRENT']
+        self.max_fila = config['LLM_QUEUE_MAX']
+        self.espera_max = config['LLM_QUEUE_TIMEOUT']
+        self.taxa_usuario = config['LLM_USER_RATE']
+        self.rajada_usuario = config['LLM_USER_BURST']
+        self.balde_global = BaldeTokens(config['LLM_GLOBAL_RATE'], config['LLM_GLOBAL_BURST'])
+        app.extensions['limitador_llm'] = self
+
+    def _balde_usuario(self, user_id):
+        with self._cond:
+            balde = self._baldes_usuarios.get(user_id)
+            if balde is None:
+                balde = self._baldes_usuarios[user_id] = BaldeTokens(self.taxa_usuario, self.rajada_usuario)
+            return balde
+
+    def _vez_de(self, user_id, bilhete):
+        primeiro = next(iter(self._filas))
+        return primeiro == user_id and self._filas[user_id][0] is bilhete
+
+    def verificar_usuario(self, user_id):
+        """Retira um token do balde do aluno. Levanta LimiteExcedido se ele está a perguntar depressa demais."""
+        espera_usuario = self._balde_usuario(user_id).retirar()
+        if espera_usuario:
+            self._contar('limite_usuario')
+            raise LimiteExcedido('limite_usuario', "Você fez muitas perguntas seguidas. Aguarde alguns segundos.",
+                                 espera_usuario)
+
+    def entrar(self, user_id):
+        """Espera a vez do aluno e devolve uma Vaga. Levanta LimiteExcedido se não der para atender."""
+        inicio = time.monotonic()
+        prazo = inicio + self.espera_max
+        bilhete = object()
+        with self._cond:
+            if self._na_fila >= self.max_fila:
+                self._contadores['fila_cheia'] += 1
+                raise LimiteExcedido('fila_cheia', "A IA está muito ocupada agora. Tente novamente em instantes.", 5)
+            self._filas.setdefault(user_id, deque()).append(bilhete)
+            self._na_fila += 1
+            self._fila_maxima_vista = max(self._fila_maxima_vista, self._na_fila)
+            try:
+                while True:
+                    restante = prazo - time.monotonic()
+                    espera = restante
+                    if self._vez_de(user_id, bilhete) and self._ativos < self.vagas:
+                        espera_global = self.balde_global.retirar()
+                        if not espera_global:
+                            break
+                        espera = min(espera_global, restante)
+                    if restante <= 0:
+                        self._contadores['tempo_esgotado'] += 1
+                        raise LimiteExcedido('tempo_esgotado',
+                                             "A IA está muito ocupada agora. Tente novamente em instantes.", 5)
+                    self._cond.wait(espera)
+            finally:
+                fila = self._filas[user_id]
+                fila.remove(bilhete)
+                self._na_fila -= 1
+                if fila:
+                    self._filas.move_to_end(user_id) # Próximo pedido deste aluno vai para o fim da roda
+                else:
+                    del self._filas[user_id]
+                self._cond.notify_all()
+
+            self._ativos += 1
+            self._contadores['atendidos'] += 1
+            self._esperas.append(time.monotonic() - inicio)
+        return Vaga(self)
+
+    def _sair(self):
+        with self._cond:
+            self._ativos -= 1
+            self._cond.notify_all()
+
+    def _contar(self, chave):
+        with self._cond:
+            self._contadores[chave] += 1
+
+    def rate_limit_provedor(self, segundos=10):
+        """O provedor respondeu 429 mesmo assim: segura a fila inteira por uns segundos."""
+        self._contar('rate_limit_provedor')
+        self.balde_global.esvaziar(segundos)
+
+    def estatisticas(self):
+        with self._cond:
+            esperas = sorted(self._esperas)
+            percentil = lambda p: round(esperas[min(len(esperas) - 1, int(len(esperas) * p))] * 1000) if esperas else 0
+            return dict(self._contadores,
+                        ativos=self._ativos,
+                        vagas=self.vagas,
+                        na_fila=self._na_fila,
+                        alunos_na_fila=len(self._filas),
+                        fila_maxima=self.max_fila,
+                        fila_maxima_vista=self._fila_maxima_vista,
+                        espera_p50_ms=percentil(0.5),
+                        espera_p95_ms=percentil(0.95),
+                        espera_max_ms=round(esperas[-1] * 1000) if esperas else 0)
+
+
+limitador = LimitadorLLM()
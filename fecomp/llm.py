@@ -0,0 +1,164 @@
+import os
+import json
+import math
+import hashlib
+import threading
+import openai
+
+try:
+    import tiktoken # Opcional: contagem exata de tokens. Sem ele usamos uma estimativa por caracteres
+except ImportError:
+    tiktoken = None
+from .voo_unico import voo_unico
+
+# --- PERSONALIDADES (SYSTEM PROMPTS) ---
+# Único lugar onde os prompts de sistema são definidos.
+PROMPTS = {
+    'geral': (
+        "Você é o 'Educa AI', um assistente de estudos inteligente e amigável. "
+        "Seu público são estudantes de pré-vestibular (ENEM e SSA). "
+        "Responda às suas dúvidas de forma didática, clara e encorajadora. "
+        "Use formatação markdown (como **negrito** e *itálico*) para organizar a resposta. "
+        "Seja direto e foque no conteúdo acadêmico."
+    ),
+    'contextual': (
+        "Você é um assistente de estudos focado. Responda à pergunta do aluno usando **única e exclusivamente** as informações fornecidas no 'CONTEXTO' abaixo. "
+        "Não use nenhum conhecimento externo."
+        "Se a resposta não estiver no contexto, diga: 'Não encontrei essa informação nos documentos desta pasta.' "
+        "Seja direto e organize a resposta com markdown."
+    ),
+}
+
+
+class PromptGrandeDemais(ValueError):
+    """O pedido não cabe na janela de contexto do modelo (já descontada a reserva da resposta)."""
+
+    def __init__(self, tokens, limite):
+        super().__init__(f"Prompt com ~{tokens} tokens excede o limite de {limite}.")
+        self.tokens = tokens
+        self.limite = limite
+
+
+class LLMGateway:
+    """
+    Ponto único de acesso ao GPT. Mantém um cliente OpenAI por processo, reaproveitado por
+    todos os pedidos: o pool de conexões HTTP (keep-alive) e o TLS já abertos continuam valendo.
+    Modelo, timeout e novas tentativas vêm da config (LLM_*).
+    """
+
+    def __init__(self, app=None):
+        self.api_key = None
+        self.model = None
+        self.timeout = None
+        self.max_retries = None
+        self.janela = None
+        self.max_resposta = None
+        self._codificador = None
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.api_key = app.config['OPENAI_API_KEY']
+        self.model = app.config['LLM_MODEL']
+        self.timeout = app.config['LLM_TIMEOUT']
+        self.max_retries = app.config['LLM_MAX_RETRIES']
+        self.janela = app.config['LLM_CONTEXT_TOKENS']
+        self.max_resposta = app.config['LLM_MAX_OUTPUT_TOKENS']
+        self._codificador = None
+        if tiktoken is not None:
+            try:
+                self._codificador = tiktoken.encoding_for_model(self.model)
+            except KeyError:
+                self._codificador = tiktoken.get_encoding('cl100k_base')
+        app.extensions['llm'] = self
+
+    @property
+    def configurado(self):
+        return bool(self.api_key)
+
+    @property
+    def client(self):
+        # Criado na primeira utilização dentro de cada processo (workers do gunicorn fazem fork
+        # depois do create_app, e conexões abertas não podem ser partilhadas entre processos)
+        if self._client is None or self._pid != os.getpid():
+            with self._lock:
+                if self._client is None or self._pid != os.getpid():
+                    self._client = openai.OpenAI(api_key=self.api_key,
+                                                 timeout=self.timeout,
+                                                 max_retries=self.max_retries)
+                    self._pid = os.getpid()
+        return self._client
+
+    def mensagens(self, prompt, conteudo):
+        return [
+            {"role": "system", "content": PROMPTS[prompt]},
+            {"role": "user", "content": conteudo}
+        ]
+
+    # --- ORÇAMENTO DE TOKENS ---
+
+    def contar_tokens(self, texto):
+        if self._codificador is not None:
+            return len(self._codificador.encode(texto))
+        # Português com o tokenizador da OpenAI dá ~3,5 caracteres por token; arredondamos para cima
+        return math.ceil(len(texto) / 3)
+
+    def tokens_mensagens(self, messages):
+        # ~4 tokens de formatação por mensagem, mais 3 para o início da resposta
+        return sum(self.contar_tokens(m['content']) + 4 for m in messages) + 3
+
+    @property
+    def limite_prompt(self):
+        return self.janela - self.max_resposta
+
+    def _verificar_tamanho(self, messages):
+        """Última barreira: nenhum pedido maior que a janela do modelo sai do servidor."""
+        tokens = self.tokens_mensagens(messages)
+        if tokens > self.limite_prompt:
+            raise PromptGrandeDemais(tokens, self.limite_prompt)
+
+    # --- CHAMADAS (PEDIDOS IDÊNTICOS EM CURSO PARTILHAM A MESMA CHAMADA) ---
+
+    def _impressao(self, messages, stream):
+        bruto = json.dumps([self.model, self.max_resposta, stream, messages], ensure_ascii=False, sort_keys=True)
+        return 'llm:' + hashlib.sha256(bruto.encode('utf-8')).hexdigest()
+
+    # `vez()`, se dado, espera uma vaga na fila do GPT (limites.py) e devolve-a; só é chamado por quem
+    # faz a chamada ao provedor, e a vaga é liberada quando essa chamada termina ou falha.
+
+    def completar(self, messages, vez=None):
+        self._verificar_tamanho(messages)
+        return voo_unico.executar(self._impressao(messages, False), lambda: self._completar(messages, vez))
+
+    def stream(self, messages, vez=None):
+        """Gera os pedaços de texto da resposta à medida que chegam."""
+        self._verificar_tamanho(messages)
+        yield from voo_unico.transmitir(self._impressao(messages, True), lambda: self._stream(messages, vez))
+
+    def _completar(self, messages, vez=None):
+        vaga = vez() if vez else None
+        try:
+            response = self.client.chat.completions.create(model=self.model, messages=messages,
+                                                           max_tokens=self.max_resposta)
+            return response.choices[0].message.content
+        finally:
+            if vaga:
+                vaga.liberar()
+
+    def _stream(self, messages, vez=None):
+        vaga = vez() if vez else None
+        try:
+            stream = self.client.chat.completions.create(model=self.model, messages=messages,
+                                                         max_tokens=self.max_resposta, stream=True)
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            if vaga:
+                vaga.liberar() # Também quando o gerador é fechado a meio
+
+
+llm = LLMGateway()
@@ -26,6 +26,11 @@ class User(db.Model):
     
     tutorial_concluido = db.Column(db.Boolean, default=False, nullable=False)
 
+    # Índice da ordem usada nas listas paginadas de membros (ver paginacao.py)
+    __table_args__ = (
+        db.Index('ix_user_name_id', 'name', 'id'),
+    )
+
     # NÍVEL 2: Matérias Pessoais (user_id preenchido)
     # Relação original, agora representa o repositório pessoal
     subjects = db.relationship('Subject', backref='user', lazy=True, cascade="all, delete-orphan",
@@ -106,9 +111,94 @@ class File(db.Model):
     original_filename = db.Column(db.String(255), nullable=False)
     folder_id = db.Column(db.Integer, db.ForeignKey('folder.id'), nullable=False)
     
+    # Conteúdo no armazenamento por hash (ver armazenamento.py); NULL = ficheiro antigo, gravado com `filename`
+    blob_hash = db.Column(db.String(64), db.ForeignKey('blob.hash'), nullable=True, index=True)
+    # Hash SHA-256 do conteúdo (igual a blob_hash; nos antigos, preenchido na primeira extração de texto)
+    content_hash = db.Column(db.String(64), nullable=True, index=True)
+    # Quando o ficheiro entrou no índice de busca (RAG); NULL = ainda não indexado
+    indexed_at = db.Column(db.DateTime, nullable=True)
+    # Estado da indexação em segundo plano: 'pending', 'ready' ou 'failed' (NULL = ficheiro antigo)
+    index_status = db.Column(db.String(10), nullable=True, default='pending', index=True)
+    # Quando entrou na fila; um 'pending' antigo perdeu-se num reinício e volta para a fila (ver api.py)
+    index_requested_at = db.Column(db.DateTime, nullable=True, default=datetime.utcnow)
+    
     # NÍVEL 3.1: Vínculo com a entrega (Submission)
     submission = db.relationship('Submission', backref='file', lazy=True, uselist=False)
 
+    # Trechos indexados: ON DELETE CASCADE no banco, mas o SQLite não o aplica (foreign_keys desligado);
+    # as rotas de exclusão chamam remover_arquivo_do_indice / remover_pasta_do_indice
+    chunks = db.relationship('TextChunk', backref='file', lazy=True,
+                             cascade="all, delete-orphan", passive_deletes=True)
+
+    # Índice da ordem usada na lista paginada da pasta (ver paginacao.py)
+    __table_args__ = (
+        db.Index('ix_file_folder_name_id', 'folder_id', 'original_filename', 'id'),
+    )
+
+
+# CONTEÚDO DOS FICHEIROS ENVIADOS
+# Gravado uma vez na pasta de uploads com o nome igual ao hash; vários File podem apontar para ele.
+class Blob(db.Model):
+    hash = db.Column(db.String(64), primary_key=True) # SHA-256 do conteúdo
+    size = db.Column(db.BigInteger, nullable=False)
+    # Quantos File apontam para este conteúdo (mantido por armazenamento.py); 0 = pode ser apagado
+    ref_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+# ENVIO EM PARTES (RETOMÁVEL), ver envios.py
+# Os bytes vão direto para um ficheiro parcial na pasta de uploads; cada parte recebida e
+# verificada ganha uma linha em UploadChunk. A conclusão cria o File e apaga o envio.
+class UploadSession(db.Model):
+    id = db.Column(db.String(32), primary_key=True) # Token aleatório (vai na URL)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    folder_id = db.Column(db.Integer, db.ForeignKey('folder.id', ondelete='CASCADE'), nullable=False)
+    original_filename = db.Column(db.String(255), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    chunk_size = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    chunks = db.relationship('UploadChunk', backref='upload', lazy=True,
+                             cascade="all, delete-orphan", passive_deletes=True)
+
+
+class UploadChunk(db.Model):
+    upload_id = db.Column(db.String(32), db.ForeignKey('upload_session.id', ondelete='CASCADE'), primary_key=True)
+    index = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), nullable=False)
+
+
+# CACHE DE TEXTO EXTRAÍDO (RAG)
+# Chave = hash do conteúdo: o mesmo PDF enviado para várias pastas só é extraído uma vez.
+class ExtractedText(db.Model):
+    content_hash = db.Column(db.String(64), primary_key=True)
+    text = db.Column(db.Text, nullable=False)
+    # Total de páginas (só PDF) e se o texto parou no limite EXTRACTION_MAX_CHARS
+    page_count = db.Column(db.Integer, nullable=True)
+    truncated = db.Column(db.Boolean, nullable=False, default=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+# ÍNDICE DE BUSCA (RAG): trechos de tamanho fixo de cada ficheiro
+class TextChunk(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    file_id = db.Column(db.Integer, db.ForeignKey('file.id', ondelete='CASCADE'), nullable=False, index=True)
+    # Copiado do File para filtrar por pasta sem join
+    folder_id = db.Column(db.Integer, db.ForeignKey('folder.id', ondelete='CASCADE'), nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False) # Ordem do trecho dentro do ficheiro
+    text = db.Column(db.Text, nullable=False)
+    token_count = db.Column(db.Integer, nullable=False)
+
+    terms = db.relationship('ChunkTerm', backref='chunk', lazy=True,
+                            cascade="all, delete-orphan", passive_deletes=True)
+
+
+# ÍNDICE INVERTIDO: termo -> trechos onde aparece (com a frequência, para o BM25)
+class ChunkTerm(db.Model):
+    chunk_id = db.Column(db.Integer, db.ForeignKey('text_chunk.id', ondelete='CASCADE'), primary_key=True)
+    term = db.Column(db.String(64), primary_key=True, index=True)
+    tf = db.Column(db.Integer, nullable=False)
+
 
 # NÍVEL 3: MODELO TASK (TAREFA)
 class Task(db.Model):
@@ -125,6 +215,12 @@ class Task(db.Model):
     
     submissions = db.relationship('Submission', backref='task', lazy=True, cascade="all, delete-orphan")
 
+    # Índices das ordens usadas nas listas paginadas (pendentes por prazo, gestão da turma por criação)
+    __table_args__ = (
+        db.Index('ix_task_course_due_id', 'course_id', 'due_date', 'id'),
+        db.Index('ix_task_course_created_id', 'course_id', 'created_at', 'id'),
+    )
+
 
 # NÍVEL 3: MODELO SUBMISSION (ENTREGA)
 class Submission(db.Model):
@@ -144,6 +240,9 @@ class Submission(db.Model):
     # Garante que um aluno só pode enviar uma entrega por tarefa
     __table_args__ = (
         db.UniqueConstraint('task_id', 'student_id', name='uq_student_task_submission'),
+        # Listas paginadas: entregas de uma tarefa e entregas de um aluno, por data de envio
+        db.Index('ix_submission_task_sent_id', 'task_id', 'submitted_at', 'id'),
+        db.Index('ix_submission_student_sent_id', 'student_id', 'submitted_at', 'id'),
     )
 
 
@@ -154,4 +253,9 @@ class Announcement(db.Model):
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     
     course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
-    professor_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False) # Quem postou
\ No newline at end of file
+    professor_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False) # Quem postou
+
+    # Índice da ordem usada no mural paginado da turma
+    __table_args__ = (
+        db.Index('ix_announcement_course_time_id', 'course_id', 'timestamp', 'id'),
+    )
\ No newline at end of file
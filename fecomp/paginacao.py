@@ -0,0 +1,105 @@
+import json
+import base64
+from datetime import datetime
+from flask import request, current_app, url_for, jsonify, render_template
+from .extensions import db
+
+# --- PAGINAÇÃO POR CURSOR (KEYSET) ---
+# Em vez de OFFSET (que obriga o banco a contar e descartar todas as linhas anteriores), cada
+# página continua a partir dos valores da última linha da página anterior:
+#   WHERE (coluna1, coluna2, id) > (valores do cursor) ORDER BY coluna1, coluna2, id LIMIT n
+# Com um índice nessas colunas o custo de uma página não depende do tamanho da tabela.
+# A última coluna da ordem tem de ser única (normalmente o id) para a ordem ser estável.
+#
+# Páginas com mais de uma lista (ex: tarefas pendentes e concluídas) distinguem-nas por
+# ?secao=...; o cursor vai em ?cursor=... . Com ?format=json a rota devolve só o HTML dos itens
+# seguintes (para o "Carregar mais" de static/js/paginacao.js).
+
+
+class Pagina:
+    def __init__(self, itens, proximo, secao=None):
+        self.itens = itens
+        self.proximo = proximo # Cursor da página seguinte (None = acabou)
+        self.secao = secao
+
+    @property
+    def proxima_url(self):
+        if self.proximo is None:
+            return None
+        argumentos = dict(request.view_args or {})
+        return url_for(request.endpoint, **argumentos, secao=self.secao, cursor=self.proximo)
+
+
+def _codificar(valores):
+    serializaveis = [{'dt': v.isoformat()} if isinstance(v, datetime) else v for v in valores]
+    bruto = json.dumps(serializaveis, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(bruto).decode('ascii').rstrip('=')
+
+
+def _decodificar(cursor):
+    """Valores do cursor, ou None se ele for inválido (nesse caso volta-se à primeira página)."""
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        valores = json.loads(bruto)
+        return [datetime.fromisoformat(v['dt']) if isinstance(v, dict) else v for v in valores]
+    except (ValueError, TypeError, KeyError):
+        return None
+
+
+def _anulavel(coluna):
+    return getattr(coluna.expression, 'nullable', True)
+
+
+def _depois_de(colunas, valores, decrescente):
+    """
+    Condição "vem depois de `valores`" na ordem das colunas, com os NULL sempre no fim.
+    Escrita por extenso (OR de prefixos iguais) porque comparar tuplas com NULL não funciona.
+    """
+    alternativas = []
+    iguais = []
+    for coluna, valor in zip(colunas, valores):
+        if valor is None:
+            # Já estamos nos NULL desta coluna: nada vem "depois" nela, só nas seguintes
+            iguais.append(coluna.is_(None))
+            continue
+        depois = coluna < valor if decrescente else coluna > valor
+        if _anulavel(coluna):
+            depois = db.or_(depois, coluna.is_(None))
+        alternativas.append(db.and_(*iguais, depois))
+        iguais.append(coluna == valor)
+    return db.or_(*alternativas) if alternativas else db.false()
+
+
+def paginar(consulta, colunas, secao=None, decrescente=False, por_pagina=None, chave=None):
+    """
+    Executa `consulta` (um db.select sem ORDER BY) ordenada por `colunas`, a partir do cursor do pedido.
+    `chave(item)` devolve os valores das colunas para um item; por omissão lê os atributos com o mesmo nome.
+    """
+    por_pagina = por_pagina or current_app.config['PAGE_SIZE']
+    chave = chave or (lambda item: [getattr(item, coluna.key) for coluna in colunas])
+
+    cursor = request.args.get('cursor') if request.args.get('secao') == secao else None
+    valores = _decodificar(cursor) if cursor else None
+    if valores is not None and len(valores) == len(colunas):
+        consulta = consulta.where(_depois_de(colunas, valores, decrescente))
+
+    ordem = []
+    for coluna in colunas:
+        termo = coluna.desc() if decrescente else coluna.asc()
+        ordem.append(termo.nulls_last() if _anulavel(coluna) else termo)
+
+    # Um item a mais diz se existe página seguinte
+    resultado = db.session.execute(consulta.order_by(*ordem).limit(por_pagina + 1))
+    itens = resultado.scalars().all() if len(consulta.column_descriptions) == 1 else resultado.all()
+    proximo = _codificar(chave(itens[por_pagina - 1])) if len(itens) > por_pagina else None
+    return Pagina(itens[:por_pagina], proximo, secao)
+
+
+def quer_json():
+    return request.args.get('format') == 'json'
+
+
+def resposta_pagina(template, pagina, **contexto):
+    """Resposta JSON do "Carregar mais": o HTML dos itens (mesmo template parcial da página) e o próximo link."""
+    html = render_template(template, pagina=pagina, **contexto)
+    return jsonify(html=html, next_url=pagina.proxima_url)
@@ -0,0 +1,91 @@
+from sqlalchemy import inspect
+from .extensions import db
+from .models import User, Course, Subject, Task, Submission, Announcement, membership
+from .cache import CacheMemoria, invalidar_apos_commit
+
+# --- PAINEL INICIAL (/inicio) ---
+# Poucas consultas de conjunto, sem carregar turmas nem entregas para listas em Python:
+# as turmas do usuário entram como subconsulta e as tarefas pendentes saem de um NOT EXISTS
+# (anti-join) contra as entregas do aluno. O resultado são dicts simples, guardados por
+# DASHBOARD_CACHE_TTL segundos e descartados a cada commit com avisos, tarefas ou entregas.
+
+
+def _montar_painel(user_id, role, limite_destaques):
+    turmas = db.select(membership.c.course_id).where(membership.c.user_id == user_id)
+
+    has_courses = db.session.scalar(db.select(db.exists(turmas)))
+
+    announcements = [
+        {'content': content, 'timestamp': timestamp, 'professor_name': professor_name, 'course_name': course_name}
+        for content, timestamp, professor_name, course_name in db.session.execute(
+            db.select(Announcement.content, Announcement.timestamp, User.name, Course.name)
+            .join(User, User.id == Announcement.professor_id)
+            .join(Course, Course.id == Announcement.course_id)
+            .where(Announcement.course_id.in_(turmas))
+            .order_by(Announcement.timestamp.desc()).limit(5))
+    ]
+
+    # Destaques são das turmas (as pessoais não são para todos), limitados para a página não crescer sem fim
+    featured_subjects = [
+        {'id': subject_id, 'name': name, 'color': color, 'course_name': course_name}
+        for subject_id, name, color, course_name in db.session.execute(
+            db.select(Subject.id, Subject.name, Subject.color, Course.name)
+            .join(Course, Course.id == Subject.course_id)
+            .where(Subject.is_featured == True)
+            .order_by(Subject.name, Subject.id).limit(limite_destaques))
+    ]
+
+    pending_tasks = None
+    if role == 'aluno':
+        entregue = db.select(Submission.id).where(Submission.task_id == Task.id,
+                                                  Submission.student_id == user_id)
+        pending_tasks = [
+            {'title': title, 'due_date': due_date, 'course_name': course_name}
+            for title, due_date, course_name in db.session.execute(
+                db.select(Task.title, Task.due_date, Course.name)
+                .join(Course, Course.id == Task.course_id)
+                .where(Task.course_id.in_(turmas), ~db.exists(entregue))
+                .order_by(Task.due_date.asc()))
+        ]
+
+    return {'announcements': announcements, 'pending_tasks': pending_tasks,
+            'has_courses': has_courses, 'featured_subjects': featured_subjects}
+
+
+class PainelInicio:
+    """Cache curto, por usuário, dos dados da página inicial."""
+
+    def __init__(self, app=None):
+        self.cache = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.cache = CacheMemoria(app.config['DASHBOARD_CACHE_MAX_ITEMS'], app.config['DASHBOARD_CACHE_TTL'])
+        self.limite_destaques = app.config['DASHBOARD_FEATURED_LIMIT']
+        app.extensions['painel'] = self
+
+    def obter(self, user_id, role):
+        chave = (user_id, role)
+        dados = self.cache.obter(chave)
+        if dados is None:
+            dados = _montar_painel(user_id, role, self.limite_destaques)
+            self.cache.guardar(chave, dados)
+        return dados
+
+    def invalidar(self):
+        if self.cache is not None:
+            self.cache.limpar()
+
+
+painel = PainelInicio()
+
+
+def _muda_painel(obj):
+    # Turmas e matérias entram pelo nome e pelos destaques; os membros decidem o que cada um vê
+    if isinstance(obj, (Announcement, Task, Submission, Course, Subject)):
+        return True
+    return isinstance(obj, User) and inspect(obj).attrs.courses.history.has_changes()
+
+
+invalidar_apos_commit('painel', _muda_painel, painel.invalidar)
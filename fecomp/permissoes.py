@@ -0,0 +1,57 @@
+from flask import g, session
+from .extensions import db
+from .models import User, Course, membership
+
+# --- PERMISSÕES DO PEDIDO ATUAL ---
+# O papel do usuário, as turmas de que é membro e as que administra são lidos uma vez por pedido
+# (ficam em flask.g); todas as verificações seguintes respondem de memória.
+# Regras:
+#   editar -> matéria pessoal do usuário, ou matéria de turma de que é membro como admin/professor,
+#             ou matéria de turma que administra
+#   ver    -> quem edita, ou qualquer membro da turma da matéria
+
+
+class Permissoes:
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.role = db.session.scalar(db.select(User.role).where(User.id == user_id))
+        self.turmas = frozenset(db.session.scalars(
+            db.select(membership.c.course_id).where(membership.c.user_id == user_id)))
+        self.turmas_admin = frozenset(db.session.scalars(
+            db.select(Course.id).where(Course.admin_id == user_id)))
+
+    def membro(self, course_id):
+        return course_id in self.turmas
+
+    def administra(self, course_id):
+        return course_id in self.turmas_admin
+
+    def can_edit(self, subject):
+        if subject.user_id == self.user_id:
+            return True
+        if not subject.course_id:
+            return False
+        if self.role in ('admin', 'professor') and self.membro(subject.course_id):
+            return True
+        return self.role == 'admin' and self.administra(subject.course_id)
+
+    def can_view(self, subject):
+        return self.can_edit(subject) or (subject.course_id is not None and self.membro(subject.course_id))
+
+
+def permissoes_atuais():
+    """Permissoes do usuário logado, criadas no primeiro uso dentro do pedido."""
+    permissoes = g.get('permissoes')
+    if permissoes is None or permissoes.user_id != session['user_id']:
+        permissoes = g.permissoes = Permissoes(session['user_id'])
+    return permissoes
+
+
+def can_edit(subject):
+    """O usuário atual pode alterar a matéria (pastas, ficheiros, cores)?"""
+    return permissoes_atuais().can_edit(subject)
+
+
+def can_view(subject):
+    """O usuário atual pode ver a matéria e os seus ficheiros?"""
+    return permissoes_atuais().can_view(subject)
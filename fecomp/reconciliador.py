@@ -0,0 +1,246 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from .extensions import db
+from .models import File, Folder, Blob, UploadSession
+from .armazenamento import pasta_uploads, recolher_blobs, recolher_legados
+from .envios import limpar_envios_expirados
+from .extracao import descartar_textos
+from . import vetores
+
+try:
+    import fcntl
+except ImportError: # Windows: sem exclusão entre processos
+    fcntl = None
+
+
+# --- LIMPEZA DO ARMAZENAMENTO EM SEGUNDO PLANO ---
+# As rotas de exclusão (ficheiro, pasta, matéria, conta, utilizador) só apagam linhas do banco e
+# respondem logo; os eventos de armazenamento.py marcam os conteúdos que ficaram sem referências.
+# Este reconciliador, uma thread por processo, é quem mexe no disco:
+#   - a cada STORAGE_GC_INTERVAL segundos (ou logo depois de um commit que marcou algo) apaga os
+#     blobs com ref_count 0 e os ficheiros antigos sem File, em lotes; se algo foi apagado, apaga
+#     também os textos extraídos (ExtractedText) de conteúdos que já nenhum File usa;
+#   - a cada STORAGE_SCAN_INTERVAL segundos percorre a pasta de uploads: apaga ficheiros sem linha
+#     no banco (com mais de STORAGE_ORPHAN_GRACE segundos, para não apanhar um upload a meio) e
+#     conta as linhas cujo ficheiro desapareceu; apaga também os índices vetoriais de pastas que já
+#     não existem (um id de pasta reutilizado não pode herdar os vetores de outra).
+# Com vários workers, um flock em instance/reconciliador.lock deixa só um fazer a passagem de cada
+# vez (os outros saltam a vez), e a hora da última varredura fica em instance/reconciliador.varredura:
+# a pasta é percorrida uma vez por intervalo no total, não uma vez por worker.
+
+
+def _relatorio_vazio():
+    return {'ficheiros': 0, 'orfaos': 0, 'temporarios': 0, 'bytes_libertados': 0,
+            'blobs_sem_ficheiro': 0, 'files_sem_ficheiro': 0, 'vetores_orfaos': 0}
+
+
+def _ainda_conhecido(nome):
+    """Confirma no banco, no momento de apagar, que `nome` não é um conteúdo nem um ficheiro antigo."""
+    return db.session.scalar(db.select(
+        db.exists().where(Blob.hash == nome) | db.exists().where(File.filename == nome, File.blob_hash.is_(None))))
+
+
+def varrer_armazenamento(carencia, apagar=True):
+    """
+    Compara a pasta de uploads com o banco. Apaga (se `apagar`) os ficheiros sem linha mais antigos
+    que `carencia` segundos e devolve um relatório com contagens e bytes libertados.
+    """
+    relatorio = _relatorio_vazio()
+    conhecidos = set(db.session.scalars(db.select(Blob.hash)))
+    legados = set(db.session.scalars(db.select(File.filename).where(File.blob_hash.is_(None))))
+    envios = set(db.session.scalars(db.select(UploadSession.id)))
+    limite = time.time() - carencia
+
+    vistos = set()
+    for pasta, _, nomes in os.walk(pasta_uploads()):
+        for nome in nomes:
+            relatorio['ficheiros'] += 1
+            if nome in conhecidos or nome in legados:
+                vistos.add(nome)
+                continue
+            if nome.startswith('.parcial-') and nome[len('.parcial-'):] in envios:
+                continue # Envio em partes ainda aberto
+
+            caminho = os.path.join(pasta, nome)
+            try:
+                estado = os.stat(caminho)
+            except FileNotFoundError:
+                continue # Apagado ou movido (`fragmentar`) durante a varredura
+            if estado.st_mtime > limite:
+                continue # Recente: pode ser um upload cuja linha ainda não foi confirmada
+            # A lista do início pode estar velha (ex: `deduplicar` confirmou o Blob entretanto)
+            if not nome.startswith('.') and _ainda_conhecido(nome):
+                vistos.add(nome)
+                continue
+            relatorio['temporarios' if nome.startswith('.') else 'orfaos'] += 1
+            if apagar:
+                try:
+                    os.remove(caminho)
+                    relatorio['bytes_libertados'] += estado.st_size
+                except FileNotFoundError:
+                    pass
+
+    # O inverso: linhas que apontam para ficheiros que já não estão no disco
+    relatorio['blobs_sem_ficheiro'] = len(conhecidos - vistos)
+    relatorio['files_sem_ficheiro'] = len(legados - vistos)
+
+    # Lista o disco antes de ler as pastas: os vetores só são gravados depois de a pasta existir
+    com_vetores = vetores.pastas_com_vetores()
+    for folder_id in com_vetores - set(db.session.scalars(db.select(Folder.id))):
+        relatorio['vetores_orfaos'] += 1
+        if apagar:
+            vetores.remover_vetores_pasta(folder_id)
+    return relatorio
+
+
+class Reconciliador:
+    """Thread de limpeza do armazenamento (uma por processo, iniciada no primeiro pedido)."""
+
+    def __init__(self, app=None):
+        self.app = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._acordar = threading.Event()
+        self._legados = set() # Ficheiros antigos largados pelos commits deste processo
+        self._marcado = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.intervalo = app.config['STORAGE_GC_INTERVAL']
+        self.intervalo_varredura = app.config['STORAGE_SCAN_INTERVAL']
+        self.carencia = app.config['STORAGE_ORPHAN_GRACE']
+        self.lote = app.config['STORAGE_GC_BATCH']
+        app.extensions['reconciliador'] = self
+        if self.intervalo:
+            app.before_request(self._iniciar)
+
+    def _iniciar(self):
+        # No primeiro pedido (e não no create_app): comandos `flask ...` não ficam com uma thread a correr
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._executar, name='reconciliador', daemon=True)
+                self._thread.start()
+
+    def marcar(self, legados=()):
+        """Acorda a thread depois de um commit que deixou conteúdos sem referências."""
+        if not self.intervalo:
+            return # Sem thread: fica para `flask armazenamento reconciliar`
+        with self._lock:
+            self._legados.update(legados)
+            self._marcado = True
+        self._acordar.set()
+
+    @contextmanager
+    def _vez(self):
+        """Bloqueio entre processos, sem esperar: devolve False se outro worker está a fazer a passagem."""
+        os.makedirs(self.app.instance_path, exist_ok=True)
+        with open(os.path.join(self.app.instance_path, 'reconciliador.lock'), 'a') as trinco:
+            obtido = True
+            if fcntl is not None:
+                try:
+                    fcntl.flock(trinco.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    obtido = False
+            yield obtido # Fechar o ficheiro solta o bloqueio
+
+    def _varredura_devida(self):
+        """Verdadeiro uma vez por STORAGE_SCAN_INTERVAL entre todos os workers (chamar com a vez)."""
+        if not self.intervalo_varredura:
+            return False
+        marca = os.path.join(self.app.instance_path, 'reconciliador.varredura')
+        try:
+            if time.time() - os.path.getmtime(marca) < self.intervalo_varredura:
+                return False
+            devida = True
+        except FileNotFoundError:
+            devida = False # Primeira vez: o intervalo conta a partir de agora
+        with open(marca, 'a'):
+            pass
+        os.utime(marca)
+        return devida
+
+    def _executar(self):
+        while True:
+            self._acordar.wait(self.intervalo)
+            self._acordar.clear()
+            with self._vez() as obtido:
+                if not obtido:
+                    continue # Outro worker está a limpar; as marcas deste ficam para a próxima passagem
+                with self.app.app_context():
+                    try:
+                        varrer = self._varredura_devida()
+                        relatorio = self.reconciliar(varrer=varrer, textos=False)
+                        if varrer:
+                            print(f"Varredura do armazenamento: {relatorio}")
+                        elif relatorio['blobs_apagados'] or relatorio['legados_apagados'] or relatorio['textos_apagados']:
+                            print(f"Armazenamento: {relatorio['blobs_apagados']} conteúdos e "
+                                  f"{relatorio['legados_apagados']} ficheiros antigos e "
+                                  f"{relatorio['textos_apagados']} textos extraídos apagados "
+                                  f"({relatorio['bytes_libertados'] / (1024 * 1024):.1f} MB)")
+                    except Exception as e:
+                        print(f"Erro na limpeza do armazenamento: {e}")
+                        db.session.rollback()
+                    finally:
+                        db.session.remove()
+
+    def reconciliar(self, varrer=False, apagar=True, textos=True):
+        """
+        Uma passagem completa. Chamar dentro de um app context; devolve o relatório. Os textos
+        extraídos sem uso (uma consulta à tabela inteira) só são procurados com `textos`, depois de
+        um commit deste processo que marcou algo, ou se esta passagem apagou conteúdos.
+        """
+        # Os blobs marcados estão no banco (ref_count 0), venham deste ou de outro worker
+        with self._lock:
+            legados, self._legados = self._legados, set()
+            marcado, self._marcado = self._marcado, False
+
+        relatorio = _relatorio_vazio()
+        relatorio['blobs_apagados'] = relatorio['legados_apagados'] = relatorio['textos_apagados'] = 0
+        if apagar:
+            while True:
+                quantidade, libertados = recolher_blobs(limite=self.lote)
+                relatorio['blobs_apagados'] += quantidade
+                relatorio['bytes_libertados'] += libertados
+                if quantidade < self.lote:
+                    break
+            quantidade, libertados = recolher_legados(legados)
+            relatorio['legados_apagados'] = quantidade
+            relatorio['bytes_libertados'] += libertados
+            if textos or marcado or relatorio['blobs_apagados'] or relatorio['legados_apagados']:
+                relatorio['textos_apagados'] = descartar_textos()
+                db.session.commit()
+            limpar_envios_expirados()
+        else:
+            relatorio['blobs_marcados'] = db.session.scalar(
+                db.select(db.func.count()).select_from(Blob).where(Blob.ref_count <= 0))
+
+        if varrer:
+            varredura = varrer_armazenamento(self.carencia, apagar)
+            varredura['bytes_libertados'] += relatorio['bytes_libertados']
+            relatorio.update(varredura)
+        return relatorio
+
+
+reconciliador = Reconciliador()
+
+
+@event.listens_for(Session, 'after_commit')
+def _apos_commit(sessao):
+    blobs = sessao.info.pop('blobs_soltos', None)
+    legados = sessao.info.pop('legados_soltos', None)
+    if blobs or legados:
+        reconciliador.marcar(legados or ())
+
+
+@event.listens_for(Session, 'after_rollback')
+def _apos_rollback(sessao):
+    sessao.info.pop('blobs_soltos', None)
+    sessao.info.pop('legados_soltos', None)
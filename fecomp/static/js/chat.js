@@ -1,4 +1,4 @@
-ocument.addEventListener('DOMContentLoaded', () => {
+document.addEventListener('DOMContentLoaded', () => {
     const chatMessages = document.querySelector('.chat-messages');
     const messageInput = document.querySelector('.chat-input');
     const sendBtn = document.querySelector('.chat-send-btn');
@@ -16,16 +16,27 @@ ocument.addEventListener('DOMContentLoaded', () => {
             
             const data = await response.json();
             if (data.contexts && data.contexts.length > 0) {
-                const group = document.createElement('optgroup');
-                group.label = 'Analisar Documentos da Pasta';
-                
-                data.contexts.forEach(context => {
-                    const option = document.createElement('option');
-                    option.value = context.id; // ID da Pasta
-                    option.textContent = context.name; // Nome (Ex: Pessoal: Mat / Provas)
-                    group.appendChild(option);
-                });
-                contextSelect.appendChild(group);
+                // Escopos maiores: o valor é "escopo:id" (a pasta continua só com o ID)
+                const allOption = document.createElement('option');
+                allOption.value = 'all:';
+                allOption.textContent = 'Todos os meus materiais';
+                contextSelect.appendChild(allOption);
+
+                const addGroup = (label, items, prefix) => {
+                    if (!items || items.length === 0) return;
+                    const group = document.createElement('optgroup');
+                    group.label = label;
+                    items.forEach(item => {
+                        const option = document.createElement('option');
+                        option.value = prefix + item.id;
+                        option.textContent = item.name; // Nome (Ex: Pessoal: Mat / Provas)
+                        group.appendChild(option);
+                    });
+                    contextSelect.appendChild(group);
+                };
+                addGroup('Analisar a Turma Inteira', data.courses, 'course:');
+                addGroup('Analisar a Matéria Inteira', data.subjects, 'subject:');
+                addGroup('Analisar Documentos da Pasta', data.contexts, '');
             }
         } catch (error) {
             console.error("Erro ao carregar contextos:", error);
@@ -60,11 +71,16 @@ ocument.addEventListener('DOMContentLoaded', () => {
             // --- LÓGICA DE CONTEXTO (PRIORIDADE 5) ---
             const selectedContext = contextSelect.value;
             let apiUrl = '/api/chat';
-            let bodyData = { message: message };
+            let bodyData = { message: message, stream: true };
 
             if (selectedContext !== 'general') {
                 apiUrl = '/api/chat_contextual';
-                bodyData = { message: message, folder_id: selectedContext };
+                if (selectedContext.includes(':')) {
+                    const [scope, scopeId] = selectedContext.split(':');
+                    bodyData = { message: message, scope: scope, scope_id: scopeId || null, stream: true };
+                } else {
+                    bodyData = { message: message, folder_id: selectedContext, stream: true };
+                }
             }
             // --- FIM DA LÓGICA DE CONTEXTO ---
 
@@ -75,17 +91,47 @@ ocument.addEventListener('DOMContentLoaded', () => {
                     body: JSON.stringify(bodyData) // Usa o body dinâmico
                 });
 
-                chatMessages.removeChild(loadingDiv); // Remove o "digitando"
-
                 if (!response.ok) {
-                    throw new Error('Falha na resposta da API');
+                    const erro = new Error('Falha na resposta da API');
+                    // 429 (fila cheia / muitas perguntas) e 413 (mensagem grande) trazem uma mensagem para o aluno
+                    if (response.status === 429 || response.status === 413) {
+                        erro.mensagemAluno = (await response.json()).error;
+                    }
+                    throw erro;
                 }
 
-                const data = await response.json();
-                
                 const botMessageDiv = document.createElement('div');
                 botMessageDiv.classList.add('message', 'receiver');
 
+                // --- RESPOSTA EM STREAMING (token a token) ---
+                if (ehRespostaSSE(response)) {
+                    let texto = '';
+                    await lerEventosSSE(response, (evento, dados) => {
+                        if (loadingDiv.parentNode) {
+                            chatMessages.removeChild(loadingDiv); // Remove o "digitando" no primeiro evento
+                            chatMessages.appendChild(botMessageDiv);
+                        }
+                        if (evento === 'error') {
+                            botMessageDiv.textContent = dados.error;
+                        } else if (evento === 'done') {
+                            console.debug(`Primeiro token em ${dados.ttft_ms} ms`);
+                        } else if (dados.delta) {
+                            texto += dados.delta;
+                            botMessageDiv.innerHTML = converter.makeHtml(texto);
+                        }
+                        chatMessages.scrollTop = chatMessages.scrollHeight;
+                    });
+                    if (loadingDiv.parentNode) chatMessages.removeChild(loadingDiv);
+                    if (!botMessageDiv.parentNode) {
+                        botMessageDiv.textContent = 'Desculpe, não consegui gerar uma resposta.';
+                        chatMessages.appendChild(botMessageDiv);
+                    }
+                    return;
+                }
+
+                chatMessages.removeChild(loadingDiv); // Remove o "digitando"
+                const data = await response.json();
+
                 if (data.response && data.response.trim() !== "") {
                     botMessageDiv.innerHTML = converter.makeHtml(data.response);
                 } else {
@@ -96,10 +142,10 @@ ocument.addEventListener('DOMContentLoaded', () => {
 
             } catch (error) {
                 console.error("Erro no chat:", error);
-                chatMessages.removeChild(loadingDiv);
+                if (loadingDiv.parentNode) chatMessages.removeChild(loadingDiv);
                 const errorMessageDiv = document.createElement('div');
                 errorMessageDiv.classList.add('message', 'receiver');
-                errorMessageDiv.textContent = 'Ops! Ocorreu um erro ao conectar com a IA. Tente novamente.';
+                errorMessageDiv.textContent = error.mensagemAluno || 'Ops! Ocorreu um erro ao conectar com a IA. Tente novamente.';
                 chatMessages.appendChild(errorMessageDiv);
                 chatMessages.scrollTop = chatMessages.scrollHeight;
             }
@@ -0,0 +1,143 @@
+// Envio em partes retomável (ver fecomp/envios.py e as rotas /api/uploads).
+// <form data-envio-partes="ID_DA_PASTA"> : cada ficheiro é cortado em partes de chunk_size bytes,
+// enviadas PARALELO de cada vez com o SHA-256 no cabeçalho Upload-Checksum. Se a ligação cair,
+// escolher o mesmo ficheiro de novo retoma o envio de onde parou (o id fica no localStorage pela
+// pasta + nome + tamanho + data de modificação). No fim, um só pedido conclui todos os ficheiros.
+// Sem fetch/crypto.subtle (ex: página servida por HTTP fora do localhost) fica o formulário normal.
+(() => {
+    const PARALELO = 3;
+    const TENTATIVAS = 5;
+
+    const chaveLocal = (pastaId, ficheiro) =>
+        `envio:${pastaId}:${ficheiro.name}:${ficheiro.size}:${ficheiro.lastModified}`;
+
+    async function pedirJson(url, opcoes = {}) {
+        const response = await fetch(url, opcoes);
+        const dados = response.status === 204 ? {} : await response.json().catch(() => ({}));
+        if (!response.ok) {
+            const erro = new Error(dados.error || `HTTP ${response.status}`);
+            erro.status = response.status;
+            throw erro;
+        }
+        return dados;
+    }
+
+    async function abrirOuRetomar(pastaId, ficheiro) {
+        const chave = chaveLocal(pastaId, ficheiro);
+        const guardado = localStorage.getItem(chave);
+        if (guardado) {
+            try {
+                return await pedirJson(`/api/uploads/${guardado}`);
+            } catch (error) {
+                localStorage.removeItem(chave); // Expirou, foi cancelado ou já concluído
+            }
+        }
+        const estado = await pedirJson('/api/uploads', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ folder_id: Number(pastaId), filename: ficheiro.name, size: ficheiro.size })
+        });
+        localStorage.setItem(chave, estado.id);
+        return estado;
+    }
+
+    async function checksum(bytes) {
+        const digest = new Uint8Array(await crypto.subtle.digest('SHA-256', bytes));
+        return 'sha256 ' + btoa(String.fromCharCode(...digest));
+    }
+
+    async function enviarParte(estado, ficheiro, parte) {
+        const inicio = parte * estado.chunk_size;
+        const bytes = await ficheiro.slice(inicio, inicio + estado.chunk_size).arrayBuffer();
+        const cabecalho = await checksum(bytes);
+        for (let tentativa = 1; ; tentativa++) {
+            try {
+                await pedirJson(`/api/uploads/${estado.id}/${parte}`, {
+                    method: 'PUT',
+                    headers: { 'Content-Type': 'application/octet-stream', 'Upload-Checksum': cabecalho },
+                    body: bytes
+                });
+                return;
+            } catch (error) {
+                // Recusas do servidor (4xx) não mudam com nova tentativa; o checksum (460) pode ter sido a rede
+                const definitivo = error.status >= 400 && error.status < 500 && error.status !== 460;
+                if (definitivo || tentativa >= TENTATIVAS) throw error;
+                await new Promise(resolve => setTimeout(resolve, 1000 * 2 ** (tentativa - 1)));
+            }
+        }
+    }
+
+    async function enviarFicheiro(pastaId, ficheiro, aoProgredir) {
+        const estado = await abrirOuRetomar(pastaId, ficheiro);
+        const recebidas = new Set(estado.received);
+        const faltam = [];
+        for (let parte = 0; parte < estado.chunks; parte++) {
+            if (!recebidas.has(parte)) faltam.push(parte);
+        }
+
+        let feitas = estado.chunks - faltam.length;
+        aoProgredir(feitas, estado.chunks);
+        const trabalhador = async () => {
+            while (faltam.length) {
+                await enviarParte(estado, ficheiro, faltam.shift());
+                aoProgredir(++feitas, estado.chunks);
+            }
+        };
+        await Promise.all(Array.from({ length: PARALELO }, trabalhador));
+        return estado.id;
+    }
+
+    async function enviarTodos(pastaId, ficheiros, aoProgredir) {
+        const ids = [];
+        for (let i = 0; i < ficheiros.length; i++) {
+            ids.push(await enviarFicheiro(pastaId, ficheiros[i], (feitas, total) =>
+                aoProgredir(i, ficheiros.length, total ? feitas / total : 1)));
+        }
+        try {
+            await pedirJson('/api/uploads/complete', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ ids })
+            });
+        } catch (error) {
+            if (error.status !== 409) throw error;
+            // Alguma parte chegou corrompida e deixou de contar: reenvia só o que falta e tenta outra vez
+            for (const ficheiro of ficheiros) await enviarFicheiro(pastaId, ficheiro, () => {});
+            await pedirJson('/api/uploads/complete', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ ids })
+            });
+        }
+        ficheiros.forEach(ficheiro => localStorage.removeItem(chaveLocal(pastaId, ficheiro)));
+    }
+
+    document.addEventListener('DOMContentLoaded', () => {
+        const form = document.querySelector('form[data-envio-partes]');
+        if (!form || !window.fetch || !window.crypto || !crypto.subtle) return;
+
+        form.addEventListener('submit', async (event) => {
+            const input = form.querySelector('input[type="file"]');
+            const ficheiros = Array.from(input.files);
+            if (!ficheiros.length) return;
+            event.preventDefault();
+
+            const loadingCard = document.getElementById('upload-loading-card');
+            const uploadCard = document.getElementById('upload-card-container');
+            const legenda = loadingCard ? loadingCard.querySelector('.file-name') : null;
+            const aoProgredir = (indice, total, fracao) => {
+                if (legenda) legenda.textContent = `Enviando ${indice + 1}/${total}... ${Math.floor(fracao * 100)}%`;
+            };
+
+            try {
+                await enviarTodos(form.dataset.envioPartes, ficheiros, aoProgredir);
+                window.location.reload();
+            } catch (error) {
+                console.error('Erro no envio em partes:', error);
+                alert(`Não foi possível enviar: ${error.message}. Escolha os mesmos ficheiros para continuar de onde parou.`);
+                if (loadingCard) loadingCard.style.display = 'none';
+                if (uploadCard) uploadCard.style.display = '';
+            }
+        });
+    });
+})();
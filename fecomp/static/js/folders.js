@@ -2,12 +2,13 @@ document.addEventListener('DOMContentLoaded', () => {
     const modal = document.getElementById('delete-file-modal');
     const form = document.getElementById('delete-file-form');
     
-    document.querySelectorAll('.delete-file-btn').forEach(btn => {
-        btn.addEventListener('click', () => {
-            const fileId = btn.dataset.fileId;
-            form.action = `/delete_file/${fileId}`;
-            modal.classList.add('active');
-        });
+    // Delegado: os cards do "Carregar mais" chegam depois do carregamento da página
+    document.addEventListener('click', (event) => {
+        const btn = event.target.closest('.delete-file-btn');
+        if (!btn) return;
+        const fileId = btn.dataset.fileId;
+        form.action = `/delete_file/${fileId}`;
+        modal.classList.add('active');
     });
 
     modal.querySelector('.close-btn').addEventListener('click', () => {
@@ -75,16 +76,43 @@ document.addEventListener('DOMContentLoaded', () => {
             const response = await fetch('/api/chat_contextual', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ message: message, folder_id: folderId })
+                body: JSON.stringify({ message: message, folder_id: folderId, stream: true })
             });
             
-            responseArea.removeChild(loadingDiv); // Remove o "digitando"
-
-            if (!response.ok) throw new Error('Falha na resposta da API');
+            if (!response.ok) {
+                const erro = new Error('Falha na resposta da API');
+                // 429 (fila cheia / muitas perguntas) e 413 (mensagem grande) trazem uma mensagem para o aluno
+                if (response.status === 429 || response.status === 413) {
+                    erro.mensagemAluno = (await response.json()).error;
+                }
+                throw erro;
+            }
 
-            const data = await response.json();
             const botMessageDiv = document.createElement('div');
             botMessageDiv.classList.add('message', 'receiver');
+
+            if (ehRespostaSSE(response)) {
+                // Mostra os tokens conforme chegam
+                let texto = '';
+                await lerEventosSSE(response, (evento, dados) => {
+                    if (loadingDiv.parentNode) {
+                        responseArea.removeChild(loadingDiv);
+                        responseArea.appendChild(botMessageDiv);
+                    }
+                    if (evento === 'error') {
+                        botMessageDiv.textContent = dados.error;
+                    } else if (dados.delta) {
+                        texto += dados.delta;
+                        botMessageDiv.innerHTML = converter.makeHtml(texto);
+                    }
+                    responseArea.scrollTop = responseArea.scrollHeight;
+                });
+                if (loadingDiv.parentNode) responseArea.removeChild(loadingDiv);
+                return;
+            }
+
+            responseArea.removeChild(loadingDiv); // Remove o "digitando"
+            const data = await response.json();
             
             // Converte a resposta (que vem em Markdown) para HTML
             botMessageDiv.innerHTML = converter.makeHtml(data.response);
@@ -93,10 +121,10 @@ document.addEventListener('DOMContentLoaded', () => {
         
         } catch (error) {
             console.error("Erro no chat contextual:", error);
-            responseArea.removeChild(loadingDiv); // Remove o "digitando"
+            if (loadingDiv.parentNode) responseArea.removeChild(loadingDiv); // Remove o "digitando"
             const errorDiv = document.createElement('div');
             errorDiv.classList.add('message', 'receiver');
-            errorDiv.textContent = 'Ops! Ocorreu um erro ao conectar com a IA. Tente novamente.';
+            errorDiv.textContent = error.mensagemAluno || 'Ops! Ocorreu um erro ao conectar com a IA. Tente novamente.';
             responseArea.appendChild(errorDiv);
         } finally {
             input.disabled = false;
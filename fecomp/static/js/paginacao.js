@@ -0,0 +1,37 @@
+// "Carregar mais" das listas paginadas (ver fecomp/paginacao.py).
+// <a class="carregar-mais" href="...?secao=x&cursor=y" data-alvo="#lista" data-antes="#opcional">
+// Sem JavaScript o link abre a página seguinte; com ele, os itens seguintes são pedidos em JSON
+// (?format=json) e acrescentados ao fim de data-alvo (ou antes de data-antes, se existir).
+document.addEventListener('click', async (event) => {
+    const link = event.target.closest('a.carregar-mais');
+    if (!link) return;
+    event.preventDefault();
+    if (link.classList.contains('carregando')) return;
+    link.classList.add('carregando');
+
+    try {
+        const url = new URL(link.href, window.location.origin);
+        url.searchParams.set('format', 'json');
+        const response = await fetch(url, { headers: { 'Accept': 'application/json' } });
+        if (!response.ok) throw new Error(`HTTP ${response.status}`);
+        const dados = await response.json();
+
+        const alvo = document.querySelector(link.dataset.alvo);
+        const antes = link.dataset.antes ? alvo.querySelector(link.dataset.antes) : null;
+        const modelo = document.createElement('template');
+        modelo.innerHTML = dados.html;
+        alvo.insertBefore(modelo.content, antes);
+        if (window.feather) feather.replace();
+
+        if (dados.next_url) {
+            link.href = dados.next_url;
+        } else {
+            link.remove();
+        }
+    } catch (error) {
+        console.error('Erro ao carregar mais itens:', error);
+        window.location.href = link.href; // Volta ao comportamento sem JavaScript
+    } finally {
+        link.classList.remove('carregando');
+    }
+});
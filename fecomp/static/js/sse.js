@@ -0,0 +1,32 @@
+// Lê uma resposta em Server-Sent Events (text/event-stream) enviada por POST.
+// (O EventSource do navegador só faz GET, por isso a leitura é feita à mão.)
+// Chama onEvento(nome, dados) para cada evento; 'message' é o nome padrão.
+async function lerEventosSSE(response, onEvento) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let fim;
+        while ((fim = buffer.indexOf('\n\n')) !== -1) {
+            const bloco = buffer.slice(0, fim);
+            buffer = buffer.slice(fim + 2);
+
+            let evento = 'message';
+            let dados = '';
+            bloco.split('\n').forEach(linha => {
+                if (linha.startsWith('event:')) evento = linha.slice(6).trim();
+                else if (linha.startsWith('data:')) dados += linha.slice(5).trim();
+            });
+            if (dados) onEvento(evento, JSON.parse(dados));
+        }
+    }
+}
+
+function ehRespostaSSE(response) {
+    return (response.headers.get('Content-Type') || '').includes('text/event-stream');
+}
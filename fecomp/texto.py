@@ -0,0 +1,37 @@
+import re
+import unicodedata
+
+# Palavras muito comuns que não ajudam a encontrar o trecho certo
+STOPWORDS = {
+    'a', 'ao', 'aos', 'as', 'com', 'como', 'da', 'das', 'de', 'do', 'dos', 'e', 'ela', 'ele',
+    'em', 'entre', 'era', 'essa', 'esse', 'esta', 'este', 'eu', 'foi', 'ha', 'isso', 'isto',
+    'ja', 'lhe', 'mais', 'mas', 'me', 'mesmo', 'meu', 'minha', 'na', 'nas', 'nao', 'no', 'nos',
+    'o', 'os', 'ou', 'para', 'pela', 'pelas', 'pelo', 'pelos', 'por', 'qual', 'quais', 'quando',
+    'que', 'quem', 'se', 'sao', 'ser', 'seu', 'sua', 'suas', 'seus', 'so', 'sobre', 'tambem',
+    'tem', 'um', 'uma', 'umas', 'uns', 'voce',
+}
+
+_RE_PALAVRA = re.compile(r'\w+')
+
+
+def normalizar(texto):
+    """Minúsculas e sem acentos ("Função" -> "funcao")."""
+    texto = unicodedata.normalize('NFKD', texto.lower())
+    return ''.join(c for c in texto if not unicodedata.combining(c))
+
+
+def tokenizar(texto):
+    return [t[:64] for t in _RE_PALAVRA.findall(normalizar(texto))
+            if len(t) > 1 and t not in STOPWORDS]
+
+
+def dividir_em_trechos(texto, palavras_por_trecho, sobreposicao):
+    """Divide o texto em trechos de tamanho fixo (em palavras), com sobreposição entre vizinhos."""
+    palavras = texto.split()
+    passo = max(1, palavras_por_trecho - sobreposicao)
+    trechos = []
+    for inicio in range(0, len(palavras), passo):
+        trechos.append(' '.join(palavras[inicio:inicio + palavras_por_trecho]))
+        if inicio + palavras_por_trecho >= len(palavras):
+            break
+    return trechos
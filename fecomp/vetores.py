@@ -0,0 +1,198 @@
+import os
+import hashlib
+from contextlib import contextmanager
+import numpy as np
+from flask import current_app
+from .texto import tokenizar
+from .llm import llm
+
+try:
+    import fcntl
+except ImportError: # Windows: sem bloqueio entre processos
+    fcntl = None
+
+# --- EMBEDDINGS (TROCÁVEIS PELA CONFIG EMBEDDING_PROVIDER) ---
+
+class EmbedderLocal:
+    """
+    Embeddings determinísticos por hashing de termos, bigramas e trigramas de letras.
+    Não usa rede: serve para desenvolvimento, testes e para medir o índice offline.
+    """
+    nome = 'local'
+
+    def __init__(self, dim):
+        self.dim = dim
+
+    def _indice(self, feature):
+        h = int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'little')
+        return h % self.dim, (1.0 if h >> 63 else -1.0)
+
+    def embed(self, textos):
+        matriz = np.zeros((len(textos), self.dim), dtype=np.float32)
+        for linha, texto in enumerate(textos):
+            termos = tokenizar(texto)
+            features = [(t, 1.0) for t in termos]
+            features += [(f"{a}_{b}", 1.0) for a, b in zip(termos, termos[1:])]
+            # Trigramas aproximam variações da mesma palavra ("reagente" / "reagentes")
+            features += [(f"#{t[i:i + 3]}", 0.3) for t in termos for i in range(len(t) - 2)]
+            for feature, peso in features:
+                coluna, sinal = self._indice(feature)
+                matriz[linha, coluna] += sinal * peso
+        return _normalizar_linhas(matriz)
+
+
+class EmbedderOpenAI:
+    nome = 'openai'
+
+    def __init__(self, model, dim):
+        self.model = model
+        self.dim = dim
+
+    def embed(self, textos, lote=100):
+        client = llm.client # Reaproveita as conexões do gateway
+        vetores = []
+        for inicio in range(0, len(textos), lote):
+            response = client.embeddings.create(model=self.model,
+                                                input=textos[inicio:inicio + lote],
+                                                dimensions=self.dim)
+            vetores.extend(item.embedding for item in response.data)
+        return _normalizar_linhas(np.asarray(vetores, dtype=np.float32).reshape(len(textos), self.dim))
+
+
+def _normalizar_linhas(matriz):
+    normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+    normas[normas == 0] = 1.0
+    return matriz / normas
+
+
+def obter_embedder():
+    config = current_app.config
+    if config['EMBEDDING_PROVIDER'] == 'openai':
+        return EmbedderOpenAI(config['EMBEDDING_MODEL'], config['EMBEDDING_DIM'])
+    return EmbedderLocal(config['EMBEDDING_DIM'])
+
+
+# --- ARMAZENAMENTO EM DISCO (UM PAR DE .npy POR PASTA) ---
+# pasta_<id>.npy      -> matriz float32 (n_trechos x dim), lida com memory-map
+# pasta_<id>.ids.npy  -> int64 (n_trechos x 2): [chunk_id, file_id] de cada linha
+# pasta_<id>.lock     -> flock de quem escreve (vários workers podem indexar a mesma pasta)
+# Quem lê não precisa do bloqueio: os .npy são trocados de uma vez (ver _gravar).
+
+
+def _diretorio():
+    caminho = os.path.join(current_app.instance_path, current_app.config['VECTOR_STORE_FOLDER'])
+    os.makedirs(caminho, exist_ok=True)
+    return caminho
+
+
+def _caminhos(folder_id):
+    base = os.path.join(_diretorio(), f"pasta_{folder_id}")
+    return base + '.npy', base + '.ids.npy'
+
+
+@contextmanager
+def _bloqueio(folder_id):
+    with open(os.path.join(_diretorio(), f"pasta_{folder_id}.lock"), 'a') as trinco:
+        if fcntl is not None:
+            fcntl.flock(trinco.fileno(), fcntl.LOCK_EX)
+        yield # Fechar o ficheiro solta o bloqueio
+
+
+def _carregar(folder_id):
+    """Retorna (vetores, ids) em memory-map, ou (None, None) se a pasta não tem índice válido."""
+    caminho_vetores, caminho_ids = _caminhos(folder_id)
+    if not os.path.exists(caminho_vetores) or not os.path.exists(caminho_ids):
+        return None, None
+    vetores = np.load(caminho_vetores, mmap_mode='r')
+    ids = np.load(caminho_ids, mmap_mode='r')
+    if vetores.shape[1] != current_app.config['EMBEDDING_DIM'] or len(vetores) != len(ids):
+        return None, None # Índice de outro provedor/dimensão: será reconstruído
+    return vetores, ids
+
+
+def _gravar(folder_id, vetores, ids):
+    # Escreve num ficheiro temporário e troca de uma vez, para quem está lendo nunca ver meio ficheiro
+    for caminho, dados in zip(_caminhos(folder_id), (vetores, ids)):
+        temporario = caminho + '.tmp'
+        with open(temporario, 'wb') as f:
+            np.save(f, dados)
+        os.replace(temporario, caminho)
+
+
+def adicionar_vetores(folder_id, file_id, chunk_ids, textos):
+    """Substitui os vetores de um ficheiro na pasta pelos dos trechos dados (chamar depois do commit deles)."""
+    vetores_novos = obter_embedder().embed(textos) if textos else None
+    with _bloqueio(folder_id):
+        vetores, ids = _carregar(folder_id)
+        if vetores is not None:
+            manter = np.asarray(ids[:, 1]) != file_id
+            vetores, ids = np.asarray(vetores[manter]), np.asarray(ids[manter])
+        else:
+            vetores = np.zeros((0, current_app.config['EMBEDDING_DIM']), dtype=np.float32)
+            ids = np.zeros((0, 2), dtype=np.int64)
+        if vetores_novos is not None:
+            ids_novos = np.array([[chunk_id, file_id] for chunk_id in chunk_ids], dtype=np.int64)
+            vetores = np.vstack([vetores, vetores_novos])
+            ids = np.vstack([ids, ids_novos])
+        _gravar(folder_id, vetores, ids)
+
+
+def remover_vetores_arquivo(folder_id, file_id):
+    adicionar_vetores(folder_id, file_id, [], [])
+
+
+def remover_vetores_pasta(folder_id):
+    with _bloqueio(folder_id):
+        for caminho in _caminhos(folder_id):
+            if os.path.exists(caminho):
+                os.remove(caminho)
+        # A pasta já não existe: o ficheiro do bloqueio vai junto
+        os.remove(os.path.join(_diretorio(), f"pasta_{folder_id}.lock"))
+
+
+def reconstruir_pasta(folder_id, chunks):
+    """Recria o índice vetorial da pasta a partir de todos os seus trechos."""
+    vetores = obter_embedder().embed([c.text for c in chunks]) if chunks else \
+        np.zeros((0, current_app.config['EMBEDDING_DIM']), dtype=np.float32)
+    ids = np.array([[c.id, c.file_id] for c in chunks], dtype=np.int64).reshape(-1, 2)
+    with _bloqueio(folder_id):
+        _gravar(folder_id, vetores, ids)
+
+
+def pastas_com_vetores():
+    """Ids das pastas com índice vetorial no disco (ver reconciliador.varrer_armazenamento)."""
+    ids = set()
+    for nome in os.listdir(_diretorio()):
+        numero = nome[len('pasta_'):].split('.', 1)[0]
+        if nome.startswith('pasta_') and nome.endswith(('.npy', '.lock')) and numero.isdigit():
+            ids.add(int(numero))
+    return ids
+
+
+def arquivos_indexados(folder_id):
+    """Ids dos ficheiros com vetores na pasta, ou None se a pasta não tem índice válido."""
+    ids = _carregar(folder_id)[1]
+    return None if ids is None else set(np.unique(ids[:, 1]).tolist())
+
+
+# --- BUSCA (FORÇA BRUTA, PRODUTO ESCALAR ENTRE VETORES NORMALIZADOS) ---
+
+def buscar_vetores(pergunta, folder_ids, k=8):
+    """Retorna [(chunk_id, similaridade)] dos k trechos mais próximos da pergunta nas pastas dadas."""
+    consulta = obter_embedder().embed([pergunta])[0]
+    candidatos_ids, candidatos_scores = [], []
+    for folder_id in folder_ids:
+        vetores, ids = _carregar(folder_id)
+        if vetores is None or not len(vetores):
+            continue
+        scores = vetores @ consulta
+        topo = np.argpartition(-scores, min(k, len(scores) - 1))[:k]
+        candidatos_ids.append(np.asarray(ids[topo, 0]))
+        candidatos_scores.append(scores[topo])
+    if not candidatos_ids:
+        return []
+
+    ids = np.concatenate(candidatos_ids)
+    scores = np.concatenate(candidatos_scores)
+    ordem = np.argsort(-scores)[:k]
+    return [(int(ids[i]), float(scores[i])) for i in ordem]
@@ -1,14 +1,22 @@
 import os
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, send_from_directory, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, current_app
 from werkzeug.utils import secure_filename
 from werkzeug.security import check_password_hash, generate_password_hash
 from functools import wraps
 
 # --- models atualizados ---
-from .models import User, Subject, Folder, File, Task, Submission, Announcement, Course
+from .models import User, Subject, Folder, File, Task, Submission, Announcement, Course, membership
 # --- csrf ACRESCENTADO AQUI ---
 from .extensions import db, csrf
 from .forms import EmptyForm
+from .extracao import descartar_textos
+from .indice import remover_arquivo_do_indice, remover_pasta_do_indice, pastas_do_utilizador
+from .indexador import indexador
+from .permissoes import permissoes_atuais, can_view, can_edit
+from .painel import painel
+from .paginacao import paginar, quer_json, resposta_pagina
+from .downloads import servir_upload, servir_zip
+from .armazenamento import guardar_upload, nome_unico, nome_armazenado, caminho_upload
 
 views_bp = Blueprint('visoes', __name__)
 
@@ -52,72 +60,20 @@ def role_required(roles_list):
     return role_decorator # retorna a função renomeada
 
 
-# --- NOVA FUNÇÃO DE VERIFICAÇÃO DE PERMISSÃO ---
-def check_permission(subject):
-    """Verifica se o usuário atual tem permissão de edição (pessoal ou privilegiada) para uma matéria."""
-    user = User.query.get(session['user_id'])
-    
-    is_personal = (subject.user_id == user.id)
-    is_privileged = False
-    
-    if subject.course_id:
-        is_member = user.courses.filter_by(id=subject.course_id).first() is not None
-        if user.role in ['admin', 'professor'] and is_member:
-            is_privileged = True
-        if user.role == 'admin' and subject.course and subject.course.admin_id == user.id:
-            is_privileged = True
-            
-    return is_personal or is_privileged
-
 # --- rotas principais (get) ---
 
 # nível 4.2: rota 'pagina_inicio' atualizada (hub dinâmico + redirecionamento admin)
 @views_bp.route('/inicio')
 @login_required
 def pagina_inicio():
-    user_id = session['user_id']
     user_role = session.get('user_role', 'aluno')
-    user = User.query.get(user_id)
     
     if user_role == 'admin':
         return redirect(url_for('admin_bp.index')) 
 
-    user_courses = user.courses.all() # type: ignore
-    course_ids = [c.id for c in user_courses]
-    
-    announcements = Announcement.query.filter(Announcement.course_id.in_(course_ids)) \
-                                    .order_by(Announcement.timestamp.desc()).limit(5).all()
-    
-    has_courses_check = bool(user_courses)
-    
-    # --- MODIFICAÇÃO (PROPOSTA 3) ---
-    # Busca matérias destacadas (apenas de cursos, já que pessoais não são para todos)
-    featured_subjects = Subject.query.filter(
-        Subject.is_featured == True,
-        Subject.course_id.isnot(None)
-    ).all()
-    # --- FIM DA MODIFICAÇÃO ---
-
-    if user_role == 'aluno':
-        submitted_task_ids = [sub.task_id for sub in Submission.query.filter_by(student_id=user_id).all()]
-        
-        pending_tasks = Task.query.filter(
-            Task.course_id.in_(course_ids),
-            ~Task.id.in_(submitted_task_ids)
-        ).order_by(Task.due_date.asc()).all()
-
-        return render_template('inicio.html', 
-                             announcements=announcements, 
-                             pending_tasks=pending_tasks,
-                             has_courses=has_courses_check,
-                             featured_subjects=featured_subjects) # Passa para o template
-    
-    else: 
-        return render_template('inicio.html', 
-                             announcements=announcements,
-                             pending_tasks=None,
-                             has_courses=has_courses_check,
-                             featured_subjects=featured_subjects) # Passa para o template
+    # Avisos, destaques e tarefas pendentes (só para alunos) vêm prontos do painel (ver painel.py)
+    dados = painel.obter(session['user_id'], user_role)
+    return render_template('inicio.html', **dados)
 
 # nível 2.2: rota 'pagina_materias'
 @views_bp.route('/materias') # type: ignore
@@ -154,16 +110,9 @@ def pastas_page(subject_id):
     form = EmptyForm()
     subject = Subject.query.get_or_404(subject_id)
     
-    can_edit = check_permission(subject)
-
-    if not can_edit:
-        user = User.query.get(session['user_id'])
-        is_member = False
-        if subject.course_id: # type: ignore
-            is_member = user.courses.filter_by(id=subject.course_id).first() is not None
-        if not is_member:
-            flash('Você não tem permissão para ver esta matéria.', 'error')
-            return redirect(url_for('visoes.pagina_materias'))
+    if not can_view(subject):
+        flash('Você não tem permissão para ver esta matéria.', 'error')
+        return redirect(url_for('visoes.pagina_materias'))
 
     folders = Folder.query.filter_by(subject_id=subject.id).order_by(Folder.name).all()
 
@@ -171,7 +120,7 @@ def pastas_page(subject_id):
                            subject=subject, 
                            folders=folders, 
                            form=form,
-                           can_edit=can_edit) 
+                           can_edit=can_edit(subject)) 
 
 # rota 'folders' (com verificação de permissão nível 2)
 @views_bp.route('/pasta/<int:folder_id>')
@@ -181,53 +130,54 @@ def folders(folder_id):
     folder = Folder.query.get_or_404(folder_id)
     subject = folder.subject
     
-    can_edit = check_permission(subject)
-    
-    if not can_edit:
-        user = User.query.get(session['user_id'])
-        is_member = False
-        if subject.course_id: # type: ignore
-            is_member = user.courses.filter_by(id=subject.course_id).first() is not None
-        if not is_member:
-            flash('Você não tem permissão para ver esta pasta.', 'error')
-            return redirect(url_for('visoes.pagina_materias'))
-
-    # --- INÍCIO DA MODIFICAÇÃO (VISUALIZAÇÃO DE ARQUIVO) ---
-    files_data = []
-    files_from_db = File.query.filter_by(folder_id=folder.id).order_by(File.original_filename).all()
-    
-    for file in files_from_db:
-        ext = file.original_filename.split('.')[-1].lower()
-        icon = 'file' # Padrão
-        file_type = 'other'
-        
-        if ext in ['png', 'jpg', 'jpeg', 'gif', 'bmp', 'svg']:
-            icon = 'image'
-            file_type = 'image'
-        elif ext == 'pdf':
-            icon = 'file-text'
-            file_type = 'pdf'
-        elif ext in ['doc', 'docx']:
-            icon = 'file-text'
-            file_type = 'word'
-        elif ext in ['txt', 'md']:
-            icon = 'file-text'
-            file_type = 'text'
-        
-        files_data.append({
-            'id': file.id,
-            'filename': file.filename,
-            'original_filename': file.original_filename,
-            'icon': icon,
-            'file_type': file_type,
-            'url': url_for('visoes.uploaded_file', filename=file.filename)
-        })
-   
+    if not can_view(subject):
+        flash('Você não tem permissão para ver esta pasta.', 'error')
+        return redirect(url_for('visoes.pagina_materias'))
+
+    # Ficheiros por ordem de nome, em páginas (ver paginacao.py)
+    pagina = paginar(db.select(File).where(File.folder_id == folder.id),
+                     [File.original_filename, File.id],
+                     por_pagina=current_app.config['PAGE_SIZE_FILES'])
+    pagina.itens = [_dados_arquivo(file) for file in pagina.itens]
+
+    if quer_json():
+        return resposta_pagina('_arquivos.html', pagina, form=form, can_edit=can_edit(subject))
+
     return render_template('folders.html', 
                            folder=folder, 
-                           files=files_data, # Passa a nova lista
+                           files=pagina.itens,
+                           pagina=pagina,
                            form=form,
-                           can_edit=can_edit) 
+                           can_edit=can_edit(subject)) 
+
+def _dados_arquivo(file):
+    """Ícone, tipo e URL de um ficheiro para os cards de folders.html."""
+    ext = file.original_filename.split('.')[-1].lower()
+    icon = 'file' # Padrão
+    file_type = 'other'
+    
+    if ext in ['png', 'jpg', 'jpeg', 'gif', 'bmp', 'svg']:
+        icon = 'image'
+        file_type = 'image'
+    elif ext == 'pdf':
+        icon = 'file-text'
+        file_type = 'pdf'
+    elif ext in ['doc', 'docx']:
+        icon = 'file-text'
+        file_type = 'word'
+    elif ext in ['txt', 'md']:
+        icon = 'file-text'
+        file_type = 'text'
+    
+    return {
+        'id': file.id,
+        'filename': file.filename,
+        'original_filename': file.original_filename,
+        'icon': icon,
+        'file_type': file_type,
+        'index_status': file.index_status,
+        'url': url_for('visoes.uploaded_file', filename=file.filename)
+    }
 
 @views_bp.route('/chat')
 @login_required
@@ -247,32 +197,39 @@ def pagina_perfil():
 @login_required
 @role_required(['aluno']) # apenas alunos
 def tasks(): # nome da função
-    user = User.query.get(session['user_id'])
-    user_course_ids = [c.id for c in user.courses]
-    
-    # Busca todas as tarefas dos cursos do aluno
-    all_tasks = Task.query.filter(Task.course_id.in_(user_course_ids)) \
-                        .order_by(Task.due_date.asc()).all()
-    
-    # Busca todas as submissões deste aluno
-    submissions = Submission.query.filter_by(student_id=user.id).all()
-    
-    # Cria um mapa de submissões para consulta rápida
-    submission_map = {sub.task_id: sub for sub in submissions}
-
-    # Separa as listas
-    pending_tasks = [task for task in all_tasks if task.id not in submission_map]
-    
-    # Passa as submissões (que contêm as tarefas e as notas)
-    completed_submissions = [submission_map[task.id] for task in all_tasks if task.id in submission_map]
-    
+    user_id = session['user_id']
+    turmas = db.select(membership.c.course_id).where(membership.c.user_id == user_id)
     form = EmptyForm() 
 
+    # "Carregar mais" de uma das listas: só essa é consultada
+    if quer_json():
+        if request.args.get('secao') == 'concluidas':
+            return resposta_pagina('_tarefas_concluidas.html', _entregas_concluidas(user_id, turmas), form=form)
+        return resposta_pagina('_tarefas_pendentes.html', _tarefas_pendentes(user_id, turmas), form=form)
+
+    pendentes = _tarefas_pendentes(user_id, turmas)
+    concluidas = _entregas_concluidas(user_id, turmas)
     return render_template('tasks.html', # nome do template
-                         pending_tasks=pending_tasks, 
-                         completed_submissions=completed_submissions,
+                         pendentes=pendentes,
+                         concluidas=concluidas,
                          form=form)
 
+def _tarefas_pendentes(user_id, turmas):
+    """Tarefas das turmas do aluno sem entrega dele (NOT EXISTS), por prazo; as sem prazo no fim."""
+    entregue = db.select(Submission.id).where(Submission.task_id == Task.id, Submission.student_id == user_id)
+    return paginar(db.select(Task).options(db.joinedload(Task.course))
+                     .where(Task.course_id.in_(turmas), ~db.exists(entregue)),
+                   [Task.due_date, Task.id], secao='pendentes')
+
+def _entregas_concluidas(user_id, turmas):
+    """Entregas do aluno nas suas turmas, da mais recente para a mais antiga."""
+    return paginar(db.select(Submission)
+                     .join(Task, Task.id == Submission.task_id)
+                     .options(db.joinedload(Submission.task).joinedload(Task.course),
+                              db.joinedload(Submission.file))
+                     .where(Submission.student_id == user_id, Task.course_id.in_(turmas)),
+                   [Submission.submitted_at, Submission.id], secao='concluidas', decrescente=True)
+
 @views_bp.route('/task/<int:task_id>/submit', methods=['POST'])
 @login_required
 @role_required(['aluno'])
@@ -281,7 +238,7 @@ def submit_task(task_id):
     task = Task.query.get_or_404(task_id)
     user = User.query.get(session['user_id'])
     
-    if task.course not in user.courses: # type: ignore
+    if not permissoes_atuais().membro(task.course_id):
          flash('Você não pertence à turma desta tarefa.', 'error')
          return redirect(url_for('visoes.tasks')) # redireciona de volta para /tasks
 
@@ -313,15 +270,14 @@ def submit_task(task_id):
             db.session.commit()
         
         original_filename = secure_filename(file.filename)
-        filename = f"user_{user.id}_task_{task.id}_{original_filename}"
-        upload_folder_path = current_app.config['UPLOAD_FOLDER']
-        os.makedirs(upload_folder_path, exist_ok=True)
-        
-        file.save(os.path.join(upload_folder_path, filename))
+        filename = nome_unico(f"user_{user.id}_task_{task.id}", original_filename)
+        conteudo_hash, _ = guardar_upload(file)
         
         new_file = File(filename=filename, 
                         original_filename=original_filename, 
-                        folder_id=submission_folder.id)
+                        folder_id=submission_folder.id,
+                        blob_hash=conteudo_hash,
+                        content_hash=conteudo_hash)
         db.session.add(new_file)
         db.session.commit()
         
@@ -330,6 +286,7 @@ def submit_task(task_id):
                                     file_id=new_file.id)
         db.session.add(new_submission)
         db.session.commit()
+        indexador.enfileirar([new_file.id])
         
         flash('Tarefa enviada com sucesso!', 'success')
 
@@ -343,7 +300,7 @@ def add_folder(subject_id):
     form = EmptyForm()
     subject = Subject.query.get_or_404(subject_id)
     
-    if not check_permission(subject):
+    if not can_edit(subject):
         flash('Você não tem permissão para adicionar pastas aqui.', 'error')
         return redirect(url_for('visoes.pastas_page', subject_id=subject_id))
     
@@ -365,7 +322,7 @@ def upload_file(folder_id):
     folder = Folder.query.get_or_404(folder_id)
     subject = folder.subject
 
-    if not check_permission(subject):
+    if not can_edit(subject):
         flash('Você não tem permissão para enviar arquivos para esta pasta.', 'error')
         return redirect(url_for('visoes.folders', folder_id=folder_id))
 
@@ -378,49 +335,56 @@ def upload_file(folder_id):
             return redirect(url_for('visoes.folders', folder_id=folder_id))
         
         files_uploaded_count = 0
+        new_files = []
         for file in files:
             if file:
                 original_filename = secure_filename(file.filename)
-                # Garante um nome único
-                filename = f"user_{session['user_id']}_folder_{folder_id}_{original_filename}"
-                upload_folder = current_app.config['UPLOAD_FOLDER']
-                os.makedirs(upload_folder, exist_ok=True)
-                file.save(os.path.join(upload_folder, filename))
+                # Garante um nome único; o conteúdo é gravado uma vez só, pelo hash
+                filename = nome_unico(f"user_{session['user_id']}_folder_{folder_id}", original_filename)
+                conteudo_hash, _ = guardar_upload(file)
                 
-                new_file = File(filename=filename, original_filename=original_filename, folder_id=folder_id)
+                new_file = File(filename=filename, original_filename=original_filename, folder_id=folder_id,
+                                blob_hash=conteudo_hash, content_hash=conteudo_hash)
                 db.session.add(new_file)
+                new_files.append(new_file)
                 files_uploaded_count += 1
         
         # Salva tudo no banco de uma vez
         db.session.commit()
+
+        # Extração e indexação ficam para a fila em segundo plano
+        indexador.enfileirar([new_file.id for new_file in new_files])
         
         # --- MODIFICAÇÃO (PROPOSTA 2) - Anúncio automático ---
         if files_uploaded_count > 0:
-            try:
-                user_role = session.get('user_role')
-                if subject.course_id and user_role in ['admin', 'professor']:
-                    user = User.query.get(session['user_id'])
-                    
-                    if files_uploaded_count == 1:
-                        anuncio_content = f"O professor {user.name} adicionou o ficheiro '{files[0].filename}' à matéria '{subject.name}'."
-                    else:
-                        anuncio_content = f"O professor {user.name} adicionou {files_uploaded_count} novos ficheiros à matéria '{subject.name}'."
-
-                    new_announcement = Announcement(
-                        content=anuncio_content,
-                        course_id=subject.course_id,
-                        professor_id=session['user_id']
-                    )
-                    db.session.add(new_announcement)
-                    db.session.commit()
-            except Exception as e:
-                print(f"Erro ao criar anúncio automático: {e}")
-                db.session.rollback()
-
+            anunciar_ficheiros(subject, [file.filename for file in files if file])
             flash(f'{files_uploaded_count} arquivo(s) enviado(s) com sucesso!', 'success')
             
     return redirect(url_for('visoes.folders', folder_id=folder_id))
 
+def anunciar_ficheiros(subject, nomes):
+    """Aviso automático na turma quando um professor/admin envia ficheiros para uma matéria dela."""
+    try:
+        user_role = session.get('user_role')
+        if subject.course_id and user_role in ['admin', 'professor']:
+            user = User.query.get(session['user_id'])
+            
+            if len(nomes) == 1:
+                anuncio_content = f"O professor {user.name} adicionou o ficheiro '{nomes[0]}' à matéria '{subject.name}'."
+            else:
+                anuncio_content = f"O professor {user.name} adicionou {len(nomes)} novos ficheiros à matéria '{subject.name}'."
+
+            new_announcement = Announcement(
+                content=anuncio_content,
+                course_id=subject.course_id,
+                professor_id=session['user_id']
+            )
+            db.session.add(new_announcement)
+            db.session.commit()
+    except Exception as e:
+        print(f"Erro ao criar anúncio automático: {e}")
+        db.session.rollback()
+
 @views_bp.route('/update_subject_color/<int:subject_id>', methods=['POST'])
 @login_required
 def update_subject_color(subject_id):
@@ -449,7 +413,10 @@ def delete_subject(subject_id):
         if not subject:
              flash('Ação não permitida.', 'error')
              return redirect(url_for('visoes.pagina_materias'))
-             
+
+        # O SQLite não aplica o ON DELETE CASCADE dos trechos: o índice é limpo à mão, como em delete_folder
+        for folder in subject.folders:
+            remover_pasta_do_indice(folder.id)
         db.session.delete(subject)
         db.session.commit()
         flash('Matéria, pastas e arquivos foram excluídos.', 'success')
@@ -501,7 +468,9 @@ def delete_account():
             if user.role == 'admin':
                 flash('Contas de administrador não podem ser excluídas por esta rota.', 'error')
                 return redirect(url_for('visoes.pagina_perfil'))
-                
+
+            for folder_id in pastas_do_utilizador(user.id):
+                remover_pasta_do_indice(folder_id)
             db.session.delete(user)
             db.session.commit()
             session.clear()
@@ -516,47 +485,50 @@ def delete_account():
 @views_bp.route('/uploads/<path:filename>')
 @login_required
 def uploaded_file(filename):
-    
-    file_db = File.query.filter_by(filename=filename).first()
-    user = User.query.get(session['user_id'])
- # type: ignore
+    # Uma consulta traz o ficheiro, o dono da matéria e o autor da entrega (se for uma)
+    file_db = db.session.execute(
+        db.select(File.filename, File.blob_hash, File.original_filename, File.content_hash,
+                  Subject.user_id, Subject.course_id, Submission.student_id)
+        .join(Folder, Folder.id == File.folder_id)
+        .join(Subject, Subject.id == Folder.subject_id)
+        .outerjoin(Submission, Submission.file_id == File.id)
+        .where(File.filename == filename)
+    ).first()
     if not file_db:
         flash('Arquivo não encontrado.', 'error')
         return redirect(request.referrer or url_for('visoes.pagina_inicio'))
 
-    subject = file_db.folder.subject
+    permissoes = permissoes_atuais()
 
-    can_view = check_permission(subject)
-    
-    is_submission_relation = hasattr(file_db, 'submission') and file_db.submission
-    can_view_submission = False
-    if is_submission_relation:
-        submission_instance = file_db.submission 
-        if submission_instance and submission_instance.student_id == user.id: 
-             can_view_submission = True
-        if can_view: # Se for admin/professor da turma
-             can_view_submission = True
-
-    if not can_view and not can_view_submission:
-        user = User.query.get(session['user_id'])
-        is_member = False
-        if subject.course_id:
-            is_member = user.courses.filter_by(id=subject.course_id).first() is not None
-        if not is_member:
-            flash('Você não tem permissão para ver este arquivo.', 'error')
-            return redirect(request.referrer or url_for('visoes.pagina_inicio'))
-    
-    upload_folder_abs = os.path.join(current_app.root_path, current_app.config['UPLOAD_FOLDER'].split('/')[-1])
+    # A entrega é sempre visível para o aluno que a enviou; o resto segue as regras da matéria
+    is_own_submission = file_db.student_id == permissoes.user_id
+
+    if not is_own_submission and not permissoes.can_view(file_db):
+        flash('Você não tem permissão para ver este arquivo.', 'error')
+        return redirect(request.referrer or url_for('visoes.pagina_inicio'))
     
     try:
-        return send_from_directory(upload_folder_abs, filename)
+        return servir_upload(nome_armazenado(file_db.blob_hash, file_db.filename),
+                             file_db.original_filename, file_db.content_hash)
     except FileNotFoundError:
-         flash('Erro interno: Arquivo não encontrado no servidor.', 'error')
-         upload_folder_rel = os.path.join('..', current_app.config['UPLOAD_FOLDER'])
-         try:
-             return send_from_directory(upload_folder_rel, filename, as_attachment=False) 
-         except Exception as e:
-            return redirect(request.referrer or url_for('visoes.pagina_inicio'))        
+        flash('Erro interno: Arquivo não encontrado no servidor.', 'error')
+        return redirect(request.referrer or url_for('visoes.pagina_inicio'))
+
+@views_bp.route('/pasta/<int:folder_id>/zip')
+@login_required
+def download_folder_zip(folder_id):
+    folder = Folder.query.get_or_404(folder_id)
+    if not can_view(folder.subject):
+        flash('Você não tem permissão para ver esta pasta.', 'error')
+        return redirect(url_for('visoes.pagina_materias'))
+
+    # Só os nomes vêm do banco agora; os bytes são lidos enquanto o ZIP é enviado (ver downloads.py)
+    linhas = db.session.execute(
+        db.select(File.original_filename, File.blob_hash, File.filename)
+        .where(File.folder_id == folder.id).order_by(File.original_filename, File.id)).all()
+    itens = ((original, caminho_upload(nome_armazenado(blob_hash, filename)))
+             for original, blob_hash, filename in linhas)
+    return servir_zip(itens, f"{secure_filename(folder.name) or 'pasta'}.zip")
 
 # --- NOVAS ROTAS PARA GERIR PASTAS E FICHEIROS ---
 
@@ -567,7 +539,7 @@ def rename_folder(folder_id):
     folder = Folder.query.get_or_404(folder_id)
     subject = folder.subject
     
-    if not check_permission(subject):
+    if not can_edit(subject):
         flash('Você não tem permissão para editar esta pasta.', 'error')
         return redirect(url_for('visoes.pastas_page', subject_id=subject.id))
         
@@ -588,7 +560,7 @@ def update_folder_color(folder_id):
     folder = Folder.query.get_or_404(folder_id)
     subject = folder.subject
 
-    if not check_permission(subject):
+    if not can_edit(subject):
         flash('Você não tem permissão para editar esta pasta.', 'error')
         return redirect(url_for('visoes.pastas_page', subject_id=subject.id))
         
@@ -610,19 +582,18 @@ def delete_folder(folder_id):
     subject = folder.subject
     subject_id = subject.id # Guarda o ID antes de apagar
 
-    if not check_permission(subject):
+    if not can_edit(subject):
         flash('Você não tem permissão para excluir esta pasta.', 'error')
         return redirect(url_for('visoes.pastas_page', subject_id=subject_id))
         
     if form.validate_on_submit():
         try:
-            upload_folder_abs = os.path.join(current_app.root_path, current_app.config['UPLOAD_FOLDER'].split('/')[-1])
-            for file in folder.files:
-                file_path = os.path.join(upload_folder_abs, file.filename)
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-            
+            # Só o banco: o disco é limpo em segundo plano (ver reconciliador.py)
+            hashes = {file.content_hash for file in folder.files}
+            remover_pasta_do_indice(folder.id)
             db.session.delete(folder)
+            db.session.flush()
+            descartar_textos(hashes)
             db.session.commit()
             flash('Pasta e todos os seus ficheiros foram excluídos.', 'success')
         except Exception as e:
@@ -639,19 +610,17 @@ def delete_file(file_id):
     folder_id = file_db.folder_id
     subject = file_db.folder.subject
 
-    if not check_permission(subject):
+    if not can_edit(subject):
         flash('Você não tem permissão para excluir este ficheiro.', 'error')
         return redirect(url_for('visoes.folders', folder_id=folder_id))
         
     if form.validate_on_submit():
         try:
-            upload_folder_abs = os.path.join(current_app.root_path, current_app.config['UPLOAD_FOLDER'].split('/')[-1])
-            file_path = os.path.join(upload_folder_abs, file_db.filename)
-            
-            if os.path.exists(file_path):
-                os.remove(file_path)
-            
+            content_hash = file_db.content_hash
+            remover_arquivo_do_indice(file_db)
             db.session.delete(file_db)
+            db.session.flush()
+            descartar_textos([content_hash])
             db.session.commit()
             flash('Ficheiro excluído com sucesso.', 'success')
         except Exception as e:
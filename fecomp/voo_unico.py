@@ -0,0 +1,97 @@
+import threading
+
+# --- VOO ÚNICO (SINGLE-FLIGHT) ---
+# Pedidos idênticos que chegam ao mesmo tempo (ex: uma turma inteira mandando a pergunta sugerida)
+# esperam uma única chamada externa e recebem o mesmo resultado. Vale dentro de cada processo.
+
+
+class _Chamada:
+    def __init__(self):
+        self.pronta = threading.Event()
+        self.resultado = None
+        self.erro = None
+
+
+class _Transmissao:
+    def __init__(self):
+        self.partes = []
+        self.fim = False
+        self.erro = None
+        self.condicao = threading.Condition()
+
+
+class VooUnico:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._chamadas = {}
+        self._transmissoes = {}
+
+    def executar(self, chave, funcao):
+        """Executa `funcao()` uma vez por `chave` em curso; quem chegar durante a chamada espera por ela."""
+        with self._lock:
+            chamada = self._chamadas.get(chave)
+            lider = chamada is None
+            if lider:
+                chamada = self._chamadas[chave] = _Chamada()
+
+        if lider:
+            try:
+                chamada.resultado = funcao()
+            except Exception as e:
+                chamada.erro = e
+            finally:
+                with self._lock:
+                    del self._chamadas[chave]
+                chamada.pronta.set()
+        else:
+            chamada.pronta.wait()
+
+        if chamada.erro is not None:
+            raise chamada.erro
+        return chamada.resultado
+
+    def transmitir(self, chave, gerador):
+        """
+        Versão para streaming: `gerador()` é consumido uma única vez numa thread própria e cada
+        pedido com a mesma chave recebe todas as partes, inclusive as que chegaram antes dele.
+        A chamada continua mesmo que o primeiro cliente desconecte.
+        """
+        with self._lock:
+            transmissao = self._transmissoes.get(chave)
+            if transmissao is None:
+                transmissao = self._transmissoes[chave] = _Transmissao()
+                threading.Thread(target=self._alimentar, args=(chave, transmissao, gerador), daemon=True).start()
+        return self._ler(transmissao)
+
+    def _alimentar(self, chave, transmissao, gerador):
+        try:
+            for parte in gerador():
+                with transmissao.condicao:
+                    transmissao.partes.append(parte)
+                    transmissao.condicao.notify_all()
+        except Exception as e:
+            transmissao.erro = e
+        finally:
+            with self._lock:
+                del self._transmissoes[chave]
+            with transmissao.condicao:
+                transmissao.fim = True
+                transmissao.condicao.notify_all()
+
+    def _ler(self, transmissao):
+        lidas = 0
+        while True:
+            with transmissao.condicao:
+                while lidas >= len(transmissao.partes) and not transmissao.fim:
+                    transmissao.condicao.wait()
+                novas = transmissao.partes[lidas:]
+                fim = transmissao.fim
+            lidas += len(novas)
+            yield from novas
+            if fim:
+                if transmissao.erro is not None:
+                    raise transmissao.erro
+                return
+
+
+voo_unico = VooUnico()
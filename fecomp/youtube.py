@@ -0,0 +1,84 @@
+import os
+import threading
+import httplib2
+from googleapiclient.discovery import build
+from .cache import CacheMemoria, normalizar_pergunta
+from .voo_unico import voo_unico
+
+
+class YouTubeBusca:
+    """
+    Busca de vídeos no YouTube com cliente reaproveitado e cache de resultados.
+    O cliente é montado uma vez por processo a partir do documento de discovery que vem com a
+    biblioteca (sem ir à rede). O httplib2 não é thread-safe, então cada thread usa a sua conexão.
+    Buscas repetidas ("função quadrática") saem do cache sem gastar cota da API.
+    """
+
+    def __init__(self, app=None):
+        self.api_key = None
+        self.cache = None
+        self._recurso = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.api_key = app.config['YOUTUBE_API_KEY']
+        self.timeout = app.config['YOUTUBE_TIMEOUT']
+        self.cache = CacheMemoria(app.config['YOUTUBE_CACHE_MAX_ITEMS'], app.config['YOUTUBE_CACHE_TTL'])
+        app.extensions['youtube'] = self
+
+    @property
+    def configurado(self):
+        return bool(self.api_key)
+
+    @property
+    def recurso(self):
+        if self._recurso is None or self._pid != os.getpid():
+            with self._lock:
+                if self._recurso is None or self._pid != os.getpid():
+                    self._recurso = build('youtube', 'v3', developerKey=self.api_key,
+                                          static_discovery=True, cache_discovery=False)
+                    self._pid = os.getpid()
+        return self._recurso
+
+    def _http(self):
+        http = getattr(self._local, 'http', None)
+        if http is None or getattr(self._local, 'pid', None) != os.getpid():
+            http = self._local.http = httplib2.Http(timeout=self.timeout)
+            self._local.pid = os.getpid()
+        return http
+
+    def _pesquisar(self, query):
+        search_response = self.recurso.search().list(
+            q=query,
+            part='snippet',
+            maxResults=3,
+            type='video',
+            relevanceLanguage='pt',
+            regionCode='BR'
+        ).execute(http=self._http())
+
+        videos = []
+        for item in search_response.get('items', []):
+            videos.append({
+                'title': item['snippet']['title'],
+                'video_id': item['id']['videoId'],
+                'thumbnail': item['snippet']['thumbnails']['medium']['url'],
+                'channel': item['snippet']['channelTitle']
+            })
+        return videos
+
+    def buscar(self, query):
+        chave = normalizar_pergunta(query)
+        videos = self.cache.obter(chave)
+        if videos is None:
+            # Buscas iguais em curso esperam a mesma resposta do YouTube
+            videos = voo_unico.executar('youtube:' + chave, lambda: self._pesquisar(query))
+            self.cache.guardar(chave, videos)
+        return videos
+
+
+youtube = YouTubeBusca()
@@ -51,6 +51,19 @@ def get_metadata():
     return target_db.metadata
 
 
+# Estruturas da busca de texto completo criadas por SQL próprio (ver fecomp/busca.py):
+# não estão nos models e o autogenerate não deve propor apagá-las
+def include_object(object, name, type_, reflected, compare_to):
+    from fecomp.busca import TABELAS_FTS, COLUNAS_BUSCA
+    if type_ == 'table' and reflected and name.startswith(TABELAS_FTS):
+        return False
+    if type_ == 'column' and reflected and name in COLUNAS_BUSCA:
+        return False
+    if type_ == 'index' and reflected and name in ('ix_text_chunk_busca', 'ix_file_busca_nome'):
+        return False
+    return True
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
 
@@ -93,6 +106,7 @@ def run_migrations_online():
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    conf_args.setdefault("include_object", include_object)
 
     connectable = get_engine()
 
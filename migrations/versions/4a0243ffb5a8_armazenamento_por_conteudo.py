@@ -0,0 +1,61 @@
+"""Armazenamento dos uploads por conteúdo (blob + referência no file)
+
+Revision ID: 4a0243ffb5a8
+Revises: f47f888fe94f
+Create Date: 2026-10-18 11:18:01.948252
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4a0243ffb5a8'
+down_revision = 'f47f888fe94f'
+branch_labels = None
+depends_on = None
+
+
+# No SQLite a FK obriga o batch a recriar a tabela file, o que apaga os triggers da busca (ver b0fa765ae5d9)
+TRIGGERS_FILE_SQLITE = [
+    "CREATE TRIGGER IF NOT EXISTS file_fts_ai AFTER INSERT ON file BEGIN "
+    "INSERT INTO file_fts(rowid, original_filename) VALUES (new.id, new.original_filename); END",
+    "CREATE TRIGGER IF NOT EXISTS file_fts_ad AFTER DELETE ON file BEGIN "
+    "INSERT INTO file_fts(file_fts, rowid, original_filename) VALUES ('delete', old.id, old.original_filename); END",
+    "CREATE TRIGGER IF NOT EXISTS file_fts_au AFTER UPDATE OF original_filename ON file BEGIN "
+    "INSERT INTO file_fts(file_fts, rowid, original_filename) VALUES ('delete', old.id, old.original_filename); "
+    "INSERT INTO file_fts(rowid, original_filename) VALUES (new.id, new.original_filename); END",
+    "INSERT INTO file_fts(file_fts) VALUES ('rebuild')",
+]
+
+
+def _recriar_triggers():
+    if op.get_bind().dialect.name == 'sqlite':
+        for comando in TRIGGERS_FILE_SQLITE:
+            op.execute(comando)
+
+
+def upgrade():
+    op.create_table('blob',
+    sa.Column('hash', sa.String(length=64), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('ref_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('hash')
+    )
+    with op.batch_alter_table('file', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('blob_hash', sa.String(length=64), nullable=True))
+        batch_op.create_index(batch_op.f('ix_file_blob_hash'), ['blob_hash'], unique=False)
+        batch_op.create_foreign_key('fk_file_blob_hash_blob', 'blob', ['blob_hash'], ['hash'])
+
+    _recriar_triggers()
+
+
+def downgrade():
+    with op.batch_alter_table('file', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_file_blob_hash_blob', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_file_blob_hash'))
+        batch_op.drop_column('blob_hash')
+
+    op.drop_table('blob')
+    _recriar_triggers()
@@ -0,0 +1,76 @@
+"""Busca de texto completo nos ficheiros
+
+Revision ID: b0fa765ae5d9
+Revises: 716714385542
+Create Date: 2026-10-18 10:54:50.403932
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b0fa765ae5d9'
+down_revision = '716714385542'
+branch_labels = None
+depends_on = None
+
+
+# Cópia do SQL de fecomp/busca.py no momento desta migração (FTS5 no SQLite, tsvector + GIN no PostgreSQL)
+DDL_BUSCA = {
+    'sqlite': [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS text_chunk_fts USING fts5("
+        "text, content='text_chunk', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        "CREATE TRIGGER IF NOT EXISTS text_chunk_fts_ai AFTER INSERT ON text_chunk BEGIN "
+        "INSERT INTO text_chunk_fts(rowid, text) VALUES (new.id, new.text); END",
+        "CREATE TRIGGER IF NOT EXISTS text_chunk_fts_ad AFTER DELETE ON text_chunk BEGIN "
+        "INSERT INTO text_chunk_fts(text_chunk_fts, rowid, text) VALUES ('delete', old.id, old.text); END",
+        "CREATE TRIGGER IF NOT EXISTS text_chunk_fts_au AFTER UPDATE OF text ON text_chunk BEGIN "
+        "INSERT INTO text_chunk_fts(text_chunk_fts, rowid, text) VALUES ('delete', old.id, old.text); "
+        "INSERT INTO text_chunk_fts(rowid, text) VALUES (new.id, new.text); END",
+        "CREATE VIRTUAL TABLE IF NOT EXISTS file_fts USING fts5("
+        "original_filename, content='file', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        "CREATE TRIGGER IF NOT EXISTS file_fts_ai AFTER INSERT ON file BEGIN "
+        "INSERT INTO file_fts(rowid, original_filename) VALUES (new.id, new.original_filename); END",
+        "CREATE TRIGGER IF NOT EXISTS file_fts_ad AFTER DELETE ON file BEGIN "
+        "INSERT INTO file_fts(file_fts, rowid, original_filename) VALUES ('delete', old.id, old.original_filename); END",
+        "CREATE TRIGGER IF NOT EXISTS file_fts_au AFTER UPDATE OF original_filename ON file BEGIN "
+        "INSERT INTO file_fts(file_fts, rowid, original_filename) VALUES ('delete', old.id, old.original_filename); "
+        "INSERT INTO file_fts(rowid, original_filename) VALUES (new.id, new.original_filename); END",
+        # Relê o conteúdo das tabelas de origem (necessário na criação e depois de recriar triggers)
+        "INSERT INTO text_chunk_fts(text_chunk_fts) VALUES ('rebuild')",
+        "INSERT INTO file_fts(file_fts) VALUES ('rebuild')",
+    ],
+    'postgresql': [
+        "ALTER TABLE text_chunk ADD COLUMN IF NOT EXISTS busca tsvector "
+        "GENERATED ALWAYS AS (to_tsvector('portuguese', coalesce(text, ''))) STORED",
+        "CREATE INDEX IF NOT EXISTS ix_text_chunk_busca ON text_chunk USING GIN (busca)",
+        "ALTER TABLE file ADD COLUMN IF NOT EXISTS busca_nome tsvector "
+        "GENERATED ALWAYS AS (to_tsvector('simple', coalesce(original_filename, ''))) STORED",
+        "CREATE INDEX IF NOT EXISTS ix_file_busca_nome ON file USING GIN (busca_nome)",
+    ],
+}
+
+DDL_REMOCAO = {
+    'sqlite': ["DROP TABLE IF EXISTS text_chunk_fts", "DROP TABLE IF EXISTS file_fts"],
+    'postgresql': [],
+}
+
+
+def upgrade():
+    for comando in DDL_BUSCA.get(op.get_bind().dialect.name, []):
+        op.execute(comando)
+
+
+def downgrade():
+    dialeto = op.get_bind().dialect.name
+    if dialeto == 'sqlite':
+        for trigger in ('text_chunk_fts_ai', 'text_chunk_fts_ad', 'text_chunk_fts_au',
+                        'file_fts_ai', 'file_fts_ad', 'file_fts_au'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    for comando in DDL_REMOCAO.get(dialeto, []):
+        op.execute(comando)
+    if dialeto == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_text_chunk_busca")
+        op.execute("DROP INDEX IF EXISTS ix_file_busca_nome")
+        op.execute("ALTER TABLE text_chunk DROP COLUMN IF EXISTS busca")
+        op.execute("ALTER TABLE file DROP COLUMN IF EXISTS busca_nome")
@@ -0,0 +1,43 @@
+"""Hora de entrada na fila de indexação
+
+Revision ID: c9abb9bbb632
+Revises: 4433a97ef099
+Create Date: 2026-10-18 11:42:31.271551
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9abb9bbb632'
+down_revision = '4433a97ef099'
+branch_labels = None
+depends_on = None
+
+
+# O drop_column do downgrade recria a tabela file no SQLite e apaga os triggers da busca (ver 4a0243ffb5a8)
+TRIGGERS_FILE_SQLITE = [
+    "CREATE TRIGGER IF NOT EXISTS file_fts_ai AFTER INSERT ON file BEGIN "
+    "INSERT INTO file_fts(rowid, original_filename) VALUES (new.id, new.original_filename); END",
+    "CREATE TRIGGER IF NOT EXISTS file_fts_ad AFTER DELETE ON file BEGIN "
+    "INSERT INTO file_fts(file_fts, rowid, original_filename) VALUES ('delete', old.id, old.original_filename); END",
+    "CREATE TRIGGER IF NOT EXISTS file_fts_au AFTER UPDATE OF original_filename ON file BEGIN "
+    "INSERT INTO file_fts(file_fts, rowid, original_filename) VALUES ('delete', old.id, old.original_filename); "
+    "INSERT INTO file_fts(rowid, original_filename) VALUES (new.id, new.original_filename); END",
+    "INSERT INTO file_fts(file_fts) VALUES ('rebuild')",
+]
+
+
+def upgrade():
+    with op.batch_alter_table('file', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('index_requested_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('file', schema=None) as batch_op:
+        batch_op.drop_column('index_requested_at')
+
+    if op.get_bind().dialect.name == 'sqlite':
+        for comando in TRIGGERS_FILE_SQLITE:
+            op.execute(comando)